@@ -7,6 +7,8 @@ WORKDIR=/workspace
 # only run if the updater succeeded
 [ -f "$FLAG" ] || exit 0
 
+# keep torch/cornac and the encoder loaded between nights; a no-op when already up
+make -C "$WORKDIR" worker ARGS="--log $WORKDIR/.logs/worker.log" || true
 make -C "$WORKDIR" all
 
 # the next pipeline run will be skipped unless a fresh update recreates the flag
@@ -0,0 +1,42 @@
+# python/cli/__main__.py
+# one entry point for every stage and tool: python -m cli <command> [args]
+# Only the chosen command's module is imported, and stages that need torch/faiss/cornac
+# import them after argument parsing, so --help and dry runs start fast
+# (scripts/check_startup.py keeps it that way).
+from __future__ import annotations
+
+import importlib
+import runpy
+import sys
+
+from cli.main import STAGES
+
+TOOLS = {
+    "run": ("cli.main", "run stages in dependency order, in parallel where possible (make all)"),
+    "telemetry": ("cli.telemetry", "compare per-stage telemetry across runs"),
+    "worker": ("cli.worker", "resident worker keeping torch/cornac and the encoder warm (start|status|stop)"),
+}
+
+def usage() -> str:
+    lines = ["usage: python -m cli <command> [args]   (<command> --help for its options)", "", "tools:"]
+    lines += [f"  {name:<20} {text}" for name, (_, text) in TOOLS.items()]
+    lines += ["", "stages:", "  " + ", ".join(STAGES)]
+    return "\n".join(lines)
+
+def main(argv: list[str] | None = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        sys.exit(0 if argv else 2)
+    cmd, rest = argv[0], argv[1:]
+    sys.argv = [f"cli {cmd}", *rest]
+    if cmd in TOOLS:
+        importlib.import_module(TOOLS[cmd][0]).main()
+    elif cmd in STAGES:
+        runpy.run_module(f"cli.{cmd}", run_name="__main__")
+    else:
+        print(f"unknown command {cmd!r}\n\n{usage()}", file=sys.stderr)
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,56 @@
 from __future__ import annotations
 from pathlib import Path
 import argparse
-import pandas as pd
 
-from pipeline.io import load_cfg
+from pipeline.config import load_cfg
+from pipeline.io import read_external, schema_problems, write_parquet
 from pipeline.articles.remove_known_bugs import (
     drop_noise_columns,
     remove_rows_all_prices_na,
 )
 from pipeline.articles.category import normalize_categories
 from pipeline.articles.brand import normalize_brands
-from pipeline.articles.price import fill_priceSEK_no_decimals
+from pipeline.articles.price import fetch_sek_rates_from_frankfurter, fill_priceSEK_no_decimals
 from pipeline.articles.audience import clean_audience
 from pipeline.articles.size import dedup_size
+from pipeline.text import map_unique
+from pipeline.fx import FX_FILE
+from pipeline.telemetry import tracked
 
-def run(cfg_path: str) -> None:
+@tracked("articles")
+def run(cfg_path: str, allow_fallback_fx: bool | None = None) -> None:
     cfg = load_cfg(cfg_path)
     external = Path(cfg["external"])
     processed = Path(cfg["processed"])
 
-    articles = pd.read_csv(external / "products.csv", dtype="string")
+    articles, report = read_external(external, "products")
+    for msg in schema_problems(report):
+        print(f"[schema] {msg}")
     articles = drop_noise_columns(articles)
     articles = remove_rows_all_prices_na(articles)
     articles = normalize_categories(articles)
     articles = normalize_brands(articles)
     articles = clean_audience(articles)
-    articles['size'] = articles['size'].map(dedup_size)
+    articles['size'] = map_unique(articles['size'], dedup_size, memo=True)
     
     overrides = {
         "270607-5254": 1310,
         "270534-03xl": 419,
     }
+    rates = fetch_sek_rates_from_frankfurter(store=Path(cfg["interim"]) / FX_FILE, allow_fallback=allow_fallback_fx)
+    print(f"articles: SEK rates as of {rates['asof']}")
     articles = fill_priceSEK_no_decimals(
         articles,
         overrides_priceSEK=overrides,
+        rates=rates,
     )
     out_dir = processed
-    articles.to_parquet(out_dir / "articles_clean.parquet", index=False)
+    write_parquet(articles, out_dir / "articles_clean.parquet")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--cfg", default="configs/base.yaml")
+    parser.add_argument("--allow-fallback-fx", action="store_true", default=None,
+                        help="price with fixed fallback rates when no exchange rate is stored or fetchable")
     args = parser.parse_args()
-    run(args.cfg)
+    run(args.cfg, args.allow_fallback_fx)
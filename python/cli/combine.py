@@ -1,36 +1,47 @@
 import argparse
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import pandas as pd
 
-from pipeline.io import load_cfg
+from pipeline.config import load_cfg
+from pipeline.io import artifact_exists, read_parquet
 from pipeline.combine.build_json import export_country_json, split_nordics, NORDICS
 from pipeline.combine.json_to_tables import build_tables_from_dir
 from pipeline.combine.analytics import run_analytics
+from pipeline.telemetry import track, tracked
 
+def _export(tx_path, country, out_dir, articles) -> None:
+    with track("combine", "export_country_json", thread_cpu=True) as rec:
+        rec["country"] = country
+        # transactions_clean is partitioned by country: read only this country's lines
+        tx = read_parquet(tx_path, filters=[("country", "==", country)])
+        df = split_nordics(tx)[country]
+        rec["rows"] = len(df)
+        if not df.empty:
+            export_country_json(df, tx, country, out_dir, articles)
+
+@tracked("combine")
 def run(cfg_path: str) -> None:
     cfg = load_cfg(cfg_path)
     processed = Path(cfg["processed"]).expanduser().resolve()
     out_dir = processed
 
-    tx = pd.read_parquet(processed / "transactions_clean.parquet")
+    tx_path = processed / "transactions_clean.parquet"
     art_path = processed / "articles_clean.parquet"
-    articles = pd.read_parquet(art_path) if art_path.exists() else None
+    articles = read_parquet(art_path) if artifact_exists(art_path) else None
 
-    by_country = split_nordics(tx)
     tasks = []
     with ThreadPoolExecutor(max_workers=4) as ex:
         for country in NORDICS:
-            df = by_country.get(country)
-            if df is not None and not df.empty:
-                tasks.append(ex.submit(
-                    export_country_json, df, tx, country, str(out_dir), articles
-                ))
+            tasks.append(ex.submit(
+                _export, tx_path, country, str(out_dir), articles
+            ))
         for f in as_completed(tasks):
             _ = f.result()
 
-    build_tables_from_dir(out_dir, out_dir)
-    run_analytics(out_dir)
+    with track("combine", "build_tables_from_dir"):
+        build_tables_from_dir(out_dir, out_dir)
+    with track("combine", "run_analytics"):
+        run_analytics(out_dir)
 
 def main() -> None:
     ap = argparse.ArgumentParser(
@@ -1,51 +1,95 @@
 # python/cli/customers.py
 from pathlib import Path
 import argparse
-import pandas as pd
 
-from pipeline.io import load_cfg, read_csv_str, write_parquet
-from pipeline.customers.name_last_name import clean_customer_name_fields
-from pipeline.customers.city_names import clean_city_series
-from pipeline.customers.shopuserid import build_id_remap, apply_id_remap
-from pipeline.customers.city_rep import enrich_and_dedup_customers
-from pipeline.customers.ssn import derive_gender_age, filter_age_range
+from pipeline.config import load_cfg
+from pipeline.io import read_external, schema_problems, write_parquet
+from pipeline.customers.shopuserid import (
+    ID_INDEX_FILE, apply_id_remap, id_index_remap, load_id_index, save_id_index, union_id_pairs, update_id_index,
+)
+from pipeline.customers.fuzzy_match import fuzzy_duplicates
+from pipeline.customers.clean import clean_rows, dedup_and_derive
+from pipeline.customers.ssn import filter_age_range
+from pipeline.customers import incremental as inc
+from pipeline.transactions import incremental as tinc
+from pipeline.aggregate import group_mode
+from pipeline.telemetry import track, tracked
 
-COUNTRY_MAP = {58: "Denmark", 205: "Sweden", 160: "Norway", 72: "Finland"}
-
-def run(cfg_path: str, fill_unknown: str | None = None) -> None:
+@tracked("customers")
+def run(cfg_path: str, fill_unknown: str | None = None, rebuild_identity: bool = False,
+        fuzzy_threshold: float | None = None, incremental: bool = False) -> None:
     cfg = load_cfg(cfg_path)
     ext = Path(cfg["external"])
     out_dir = Path(cfg["processed"])
 
-    customers = read_csv_str(ext / "customers.csv")
-    customers = clean_customer_name_fields(customers)
-    if "invoiceCity" in customers.columns:
-        customers["invoiceCity"] = clean_city_series(customers["invoiceCity"])
+    raw, report = read_external(ext, "customers")
+    for msg in schema_problems(report):
+        print(f"[schema] {msg}")
+    if incremental:
+        # reuse the cleaned columns of raw rows seen before; see pipeline.customers.incremental
+        interim = Path(cfg["interim"])
+        state = inc.load_state(interim)
+        rows, base = (state["rows"], state["base"]) if state else (None, None)
+        hashes = inc.row_hashes(raw)
+        customers, hit = inc.reuse_cleaned(raw, hashes, rows, clean_rows)
+    else:
+        customers = clean_rows(raw)
 
-    remap = build_id_remap(customers)
-    customers = apply_id_remap(customers, remap)
+    # persistent union-find: only new or changed customers are merged
+    index_path = out_dir / ID_INDEX_FILE
+    if rebuild_identity:
+        index_path.unlink(missing_ok=True)
+    index = load_id_index(index_path)
+    stats = update_id_index(index, customers)
+    print(f"identity index: {stats['ids']:,} ids, {stats['new']:,} new, {stats['changed']:,} changed, "
+          f"{stats['merged']:,} merges")
+    if fuzzy_threshold is not None:
+        # typo-level duplicates in the same zip with the same SSN, scored only against new or
+        # changed customers
+        with track("customers", "fuzzy_duplicates") as rec:
+            only = customers["shopUserId"].isin(stats["delta_ids"])
+            pairs, fz = fuzzy_duplicates(customers, threshold=fuzzy_threshold, only=only)
+            fz["merged"] = union_id_pairs(index, pairs["id_a"], pairs["id_b"])
+            rec.update(fz)
+        print(f"fuzzy duplicates: {fz['scored']:,} of {fz['candidates']:,} candidate pairs scored, "
+              f"{fz['conflicts']:,} rejected on SSN or birth date, {fz['no_ssn']:,} lacking an SSN, "
+              f"{fz['matches']:,} matches, {fz['merged']:,} merges")
+    save_id_index(index, index_path)
+    remap = id_index_remap(index)
+    cleaned, customers = customers, apply_id_remap(customers, remap)
 
-    tx = pd.read_csv(ext / "transactions.csv", dtype=str, keep_default_na=False, na_values=[])
+    tx, report = read_external(ext, "transactions")
+    for msg in schema_problems(report):
+        print(f"[schema] {msg}")
     tx = apply_id_remap(tx, remap, id_col="shopUserId")
 
-    def _mode_or_first(s: pd.Series):
-        m = s.mode(dropna=True)
-        if not m.empty:
-            return m.iat[0]
-        non_null = s.dropna()
-        return non_null.iat[0] if non_null.size else pd.NA
-
-    cust_city = customers.groupby("shopUserId")["invoiceCity"].agg(_mode_or_first)
+    cust_city = group_mode(customers, "shopUserId", "invoiceCity", dropna=True)
     tx["invoiceCity"] = tx["shopUserId"].map(cust_city).fillna("Unknown")
     write_parquet(tx, out_dir / "transactions_canonical.parquet")
 
-    customers = enrich_and_dedup_customers(customers, id_col="shopUserId", city_col="invoiceCity")
-
-    num_id = pd.to_numeric(customers["invoiceCountryId"], errors="coerce")
-    customers["Country"] = num_id.map(COUNTRY_MAP).fillna(customers["invoiceCountryId"]).astype(str)
-
-    customers = derive_gender_age(customers, ssn_col="invoiceSSN", country_col="invoiceCountryId",
-                                  gender_col="Gender", age_col="Age")
+    if incremental:
+        ids = customers["shopUserId"]
+        affected = inc.affected_ids(ids, hashes, hit, rows)
+        if base is not None:
+            # ages the scalar parser produced have no birth date to move forward
+            stale = base[inc.BIRTH_COL].isna() & base["Age"].notna()
+            affected |= set(base.loc[stale, "shopUserId"].dropna())
+            fresh = dedup_and_derive(customers[ids.isin(affected) | ids.isna()], birth_col=inc.BIRTH_COL)
+            before, base = base, inc.merge_base(base, fresh, affected, fresh.dtypes.drop("Age"))
+            # transactions of these customers need their city, age and gender again
+            tinc.record_changed_customers(interim, affected | inc.age_changed(before, base))
+        else:
+            fresh = base = dedup_and_derive(customers, birth_col=inc.BIRTH_COL)
+            tinc.record_changed_customers(interim)
+        new_rows = inc.new_rows_state(cleaned, ids, hashes)
+        if state is None or affected or not hit.all() or len(new_rows) != len(rows):
+            inc.save_state(interim, new_rows, base, prev=state, fresh=fresh, affected=affected)
+        print(f"incremental: {int((~hit).sum()):,} of {len(raw):,} rows cleaned, "
+              f"{len(affected):,} of {len(base):,} customers rebuilt")
+        customers = base.drop(columns=inc.BIRTH_COL)
+    else:
+        customers = dedup_and_derive(customers)
+        tinc.record_changed_customers(Path(cfg["interim"]))
     customers = filter_age_range(customers, age_col="Age", lo=10, hi=105)
 
     write_parquet(customers, out_dir / "customers_clean.parquet")
@@ -54,5 +98,12 @@ if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--cfg", default="configs/base.yaml")
     p.add_argument("--fill-unknown", default=None)
+    p.add_argument("--rebuild-identity", action="store_true", help="drop the identity index and rebuild it")
+    p.add_argument("--fuzzy", action="store_true",
+                   help="also merge typo duplicates (same zip, similar names, same SSN); merges are permanent")
+    p.add_argument("--fuzzy-threshold", type=float, default=0.85, help="name similarity for typo duplicates")
+    p.add_argument("--incremental", action="store_true",
+                   help="only clean new or changed customer rows, reusing the state in <interim>")
     args = p.parse_args()
-    run(args.cfg, args.fill_unknown)
\ No newline at end of file
+    run(args.cfg, args.fill_unknown, args.rebuild_identity, args.fuzzy_threshold if args.fuzzy else None,
+        args.incremental)
\ No newline at end of file
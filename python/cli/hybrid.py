@@ -6,7 +6,7 @@ from pathlib import Path
 
 import yaml
 
-from pipeline.recs.hybrid import build_hybrid, make_topk_hybrid_parquet
+from pipeline.telemetry import track
 
 
 def parse_args(argv=None):
@@ -31,21 +31,23 @@ def load_paths(cfg_path: Path) -> Path:
 
 def main(argv=None) -> int:
     args = parse_args(argv)
-    processed_dir = load_paths(Path(args.cfg))
-    weights = {"score_basket": args.w_basket, "score_pair": args.w_pair, "score_semantic": args.w_semantic}
-
-    hybrid = build_hybrid(
-        processed_dir=processed_dir,
-        weights=weights,
-        inputs=(args.basket, args.pair, args.semantic),
-    )
-
-    make_topk_hybrid_parquet(
-        df=hybrid,
-        processed_dir=processed_dir,
-        out_filename=args.out,
-        k=args.k,
-    )
+    with track("hybrid"):
+        from pipeline.recs.hybrid import build_hybrid, make_topk_hybrid_parquet  # pandas: not needed for --help
+        processed_dir = load_paths(Path(args.cfg))
+        weights = {"score_basket": args.w_basket, "score_pair": args.w_pair, "score_semantic": args.w_semantic}
+
+        hybrid = build_hybrid(
+            processed_dir=processed_dir,
+            weights=weights,
+            inputs=(args.basket, args.pair, args.semantic),
+        )
+
+        make_topk_hybrid_parquet(
+            df=hybrid,
+            processed_dir=processed_dir,
+            out_filename=args.out,
+            k=args.k,
+        )
 
     return 0
 
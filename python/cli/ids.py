@@ -0,0 +1,41 @@
+from __future__ import annotations
+from pathlib import Path
+import argparse
+
+from pipeline.config import load_cfg
+from pipeline.io import artifact_exists, read_table
+from pipeline.ids import ID_FILE, KINDS, load_ids, save_ids, update_ids
+from pipeline.telemetry import track, tracked
+
+# kind -> artifacts (and column) whose ids get a code
+SOURCES = {
+    "groupId": [("transactions_clean", "groupId"), ("articles_clean", "groupId"), ("articles_for_recs", "groupId")],
+    "shopUserId": [("transactions_clean", "shopUserId")],
+    "orderId": [("transactions_clean", "orderId")],
+}
+
+@tracked("ids")
+def run(cfg_path: str, rebuild: bool = False) -> None:
+    cfg = load_cfg(cfg_path)
+    processed = Path(cfg["processed"])
+    if rebuild:
+        (processed / ID_FILE).unlink(missing_ok=True)
+    vocab = load_ids(processed)
+
+    with track("ids", "update") as rec:
+        new = {k: 0 for k in KINDS}
+        for kind, sources in SOURCES.items():
+            for artifact, col in sources:
+                path = processed / f"{artifact}.parquet"
+                if artifact_exists(path):
+                    new[kind] += update_ids(vocab, {kind: read_table(path, columns=[col])[col]})[kind]
+        save_ids(processed, vocab)
+        rec.update(rows=sum(len(v) for v in vocab.values()), **{f"new_{k}": n for k, n in new.items()})
+    print("ids: " + ", ".join(f"{len(vocab[k]):,} {k} ({new[k]:,} new)" for k in KINDS))
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Give every groupId, shopUserId and orderId a global int32 code.")
+    p.add_argument("--cfg", default="configs/base.yaml")
+    p.add_argument("--rebuild", action="store_true", help="renumber from scratch instead of appending new ids")
+    args = p.parse_args()
+    run(args.cfg, args.rebuild)
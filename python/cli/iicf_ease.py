@@ -4,7 +4,7 @@ from __future__ import annotations
 import argparse
 from pathlib import Path
 
-from pipeline.recs.iicf_ease import run
+from pipeline.telemetry import track
 
 
 def parse_args() -> argparse.Namespace:
@@ -23,17 +23,20 @@ def parse_args() -> argparse.Namespace:
 
 def main() -> None:
     args = parse_args()
-    _ = run(
-        processed_dir=args.processed_dir,
-        out_filename=args.out_filename,
-        min_distinct_users=args.min_distinct_users,
-        require_min_items_per_user=args.require_min_items_per_user,
-        item_freq_q_low=args.item_freq_q_low,
-        item_freq_q_high=args.item_freq_q_high,
-        rel_min=args.rel_min,
-        k_min=args.k_min,
-        k_max=args.k_max,
-    )
+    with track("iicf_ease"):
+        # cornac loads only once arguments are valid (not for --help)
+        from pipeline.recs.iicf_ease import run
+        _ = run(
+            processed_dir=args.processed_dir,
+            out_filename=args.out_filename,
+            min_distinct_users=args.min_distinct_users,
+            require_min_items_per_user=args.require_min_items_per_user,
+            item_freq_q_low=args.item_freq_q_low,
+            item_freq_q_high=args.item_freq_q_high,
+            rel_min=args.rel_min,
+            k_min=args.k_min,
+            k_max=args.k_max,
+        )
 
 
 if __name__ == "__main__":
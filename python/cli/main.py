@@ -0,0 +1,494 @@
+# python/cli/main.py
+# dependency-aware pipeline runner: stages run as subprocesses as soon as their inputs
+# exist, several at a time within a CPU/memory budget
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import runpy
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pipeline.config import load_cfg
+from pipeline.snapshots import sha256_file
+from pipeline.sources import PY_ROOT, source_files
+from pipeline.telemetry import run_id
+
+#------stage graph------
+# inputs/outputs are "<cfg key>/<file>" paths; a stage depends on whichever stage
+# produces one of its inputs. cpus/mem_gb are rough peak needs used for scheduling.
+# interim/fx_rates.parquet (pipeline.fx) has no producing stage; it is an input so that
+# prices are redone once the exchange rates change.
+# warm stages (torch/cornac) run in the resident worker when it is up.
+STAGES: dict[str, dict] = {
+    "customers": {
+        "inputs": ["external/customers.csv", "external/transactions.csv"],
+        "outputs": ["processed/transactions_canonical.parquet", "processed/customers_clean.parquet",
+                    "processed/identity_index.npz"],
+        "cpus": 1, "mem_gb": 2,
+    },
+    "articles": {
+        "inputs": ["external/products.csv", "interim/fx_rates.parquet"],
+        "outputs": ["processed/articles_clean.parquet"],
+        "cpus": 1, "mem_gb": 1,
+    },
+    "articles_for_recs": {
+        "inputs": ["external/products.csv", "processed/articles_clean.parquet"],
+        "outputs": ["processed/articles_for_recs.parquet"],
+        "cpus": 1, "mem_gb": 1,
+    },
+    "semantic_similarity": {
+        "inputs": ["processed/articles_for_recs.parquet"],
+        "outputs": ["processed/semantic_similarity_recs.parquet"],
+        "cpus": 2, "mem_gb": 4, "warm": True,
+        "args": ["--cfg", "{cfg}", "--threads", "{cpus}"],
+    },
+    "transactions": {
+        "inputs": [
+            "processed/transactions_canonical.parquet",
+            "processed/articles_clean.parquet",
+            "processed/customers_clean.parquet",
+            "interim/fx_rates.parquet",
+        ],
+        "outputs": ["processed/transactions_clean.parquet"],
+        "cpus": 1, "mem_gb": 3,
+    },
+    "ids": {
+        "inputs": [
+            "processed/transactions_clean.parquet",
+            "processed/articles_clean.parquet",
+            "processed/articles_for_recs.parquet",
+        ],
+        "outputs": ["processed/id_dictionary.parquet"],
+        "cpus": 1, "mem_gb": 1,
+    },
+    "combine": {
+        "inputs": ["processed/transactions_clean.parquet", "processed/articles_clean.parquet"],
+        "outputs": [
+            "processed/Sweden.json", "processed/Denmark.json", "processed/Finland.json", "processed/Norway.json",
+            "processed/country_summary.parquet", "processed/country_customers_by_channel.parquet",
+            "processed/country_customers_by_channel_by_month.parquet", "processed/city_summary.parquet",
+            "processed/city_monthly_revenue.parquet", "processed/customer_summary.parquet",
+            "processed/orders.parquet", "processed/order_items.parquet",
+            "processed/top_categories_by_season.parquet", "processed/top_groupids_by_season.parquet",
+            "processed/top_repurchase_groupids_by_country.parquet", "processed/top_brands_by_country.parquet",
+            "processed/return_buckets_overall.parquet",
+        ],
+        "cpus": 4, "mem_gb": 3,
+    },
+    "iicf_ease": {
+        "inputs": ["processed/transactions_clean.parquet", "processed/articles_for_recs.parquet",
+                   "processed/id_dictionary.parquet"],
+        "outputs": ["processed/basket_completion.parquet"],
+        "cpus": 2, "mem_gb": 4, "warm": True,
+        "args": ["--processed-dir", "{processed}"],
+    },
+    "top_same_brand": {
+        "inputs": ["processed/transactions_clean.parquet", "processed/articles_for_recs.parquet",
+                   "processed/id_dictionary.parquet"],
+        "outputs": ["processed/top_same_brand.parquet"],
+        "cpus": 1, "mem_gb": 1,
+    },
+    "lift": {
+        "inputs": ["processed/order_items.parquet", "processed/articles_for_recs.parquet",
+                   "processed/id_dictionary.parquet"],
+        "outputs": ["processed/pair_complements.parquet"],
+        "cpus": 1, "mem_gb": 2,
+    },
+    "hybrid": {
+        "inputs": [
+            "processed/basket_completion.parquet",
+            "processed/pair_complements.parquet",
+            "processed/semantic_similarity_recs.parquet",
+            "processed/id_dictionary.parquet",
+        ],
+        "outputs": ["processed/hybrid_pairs.parquet"],
+        "cpus": 1, "mem_gb": 1,
+    },
+}
+DEFAULT_ARGS = ["--cfg", "{cfg}"]
+WORKER_SOCKET = "/tmp/itcm-pipeline-worker.sock"
+THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_MAX_THREADS")
+
+def worker_socket() -> Path:
+    return Path(os.environ.get("PIPELINE_WORKER_SOCKET", WORKER_SOCKET))
+
+def resolve(cfg: dict, artifact: str) -> Path:
+    key, _, name = artifact.partition("/")
+    return Path(cfg[key]) / name
+
+def dependencies(stages: dict[str, dict]) -> dict[str, set[str]]:
+    producer = {out: name for name, st in stages.items() for out in st["outputs"]}
+    return {
+        name: {producer[i] for i in st["inputs"] if i in producer and producer[i] != name}
+        for name, st in stages.items()
+    }
+
+def topo_order(deps: dict[str, set[str]]) -> list[str]:
+    order, done = [], set()
+    while len(order) < len(deps):
+        ready = [s for s in deps if s not in done and deps[s] <= done]
+        if not ready:
+            raise ValueError(f"Cycle in stage graph among {sorted(set(deps) - done)}")
+        for s in ready:
+            order.append(s)
+            done.add(s)
+    return order
+
+def select(deps: dict[str, set[str]], targets: list[str], upstream: bool) -> list[str]:
+    """Stages to run for `targets`, optionally with everything they depend on."""
+    unknown = [t for t in targets if t not in deps]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s) {unknown}; choose from {list(deps)}")
+    chosen = set(targets)
+    while upstream:
+        more = set().union(*(deps[s] for s in chosen)) - chosen
+        if not more:
+            break
+        chosen |= more
+    return [s for s in topo_order(deps) if s in chosen]
+
+#------critical path------
+def critical_path(deps: dict[str, set[str]], durations: dict[str, float]) -> tuple[list[str], float]:
+    """Longest chain of dependent stages by wall time among the stages that ran."""
+    finish, prev = {}, {}
+    for s in topo_order(deps):
+        if s not in durations:
+            continue
+        before = [d for d in deps[s] if d in finish]
+        p = max(before, key=finish.get, default=None)
+        prev[s] = p
+        finish[s] = durations[s] + (finish[p] if p else 0.0)
+    if not finish:
+        return [], 0.0
+    end = max(finish, key=finish.get)
+    length, path = finish[end], []
+    while end:
+        path.append(end)
+        end = prev[end]
+    return path[::-1], length
+
+#------stage cache------
+# <processed>/stage_manifest.json holds, per stage, the fingerprint of its last successful
+# run (input file contents, CLI arguments, config, and the source of every repo module it
+# imports) plus the size/mtime of what it wrote. A stage whose fingerprint matches and
+# whose outputs are untouched is skipped. File hashes are reused while size/mtime match.
+# The size/mtime of every file behind the fingerprint is kept too, so --dry-run can tell
+# which stages are up to date without walking imports or hashing anything.
+CACHE_FILE = "stage_manifest.json"
+
+def load_cache(cfg: dict) -> dict:
+    p = Path(cfg["processed"]) / CACHE_FILE
+    return json.loads(p.read_text()) if p.exists() else {"files": {}, "stages": {}}
+
+def save_cache(cfg: dict, cache: dict) -> None:
+    p = Path(cfg["processed"]) / CACHE_FILE
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(cache, indent=2, sort_keys=True))
+    tmp.replace(p)
+
+def _files(path: Path) -> list[Path]:
+    # a partitioned artifact is a directory of Parquet files
+    return sorted(f for f in path.rglob("*") if f.is_file()) if path.is_dir() else [path]
+
+def _digest(path: Path, cache: dict) -> str:
+    if path.is_dir():
+        h = hashlib.sha256()
+        for f in _files(path):
+            h.update(f"{f.relative_to(path)}:{_digest(f, cache)}\n".encode())
+        return h.hexdigest()
+    if not path.is_file():
+        return "missing"
+    st = path.stat()
+    hit = cache["files"].get(str(path))
+    if hit and hit["size"] == st.st_size and hit["mtime_ns"] == st.st_mtime_ns:
+        return hit["sha256"]
+    digest = sha256_file(path)
+    cache["files"][str(path)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+    return digest
+
+def _stat(path: Path) -> list[int]:
+    # size and newest mtime, summed over a directory's files
+    sts = [f.stat() for f in _files(path)]
+    return [sum(st.st_size for st in sts), max((st.st_mtime_ns for st in sts), default=0)]
+
+def _stamp(path: Path) -> list[int] | None:
+    return _stat(path) if path.exists() else None
+
+def _setup(name: str, cfg: dict) -> str:
+    # the part of the fingerprint that is not a file
+    parts = {"args": STAGES[name].get("args", DEFAULT_ARGS), "cfg": cfg}
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def fingerprint(name: str, cfg: dict, cache: dict, stamps: dict | None = None) -> str:
+    """Fingerprint of stage `name`; `stamps` receives the size/mtime of the files it covers."""
+    stage = STAGES[name]
+    inputs = [resolve(cfg, a) for a in stage["inputs"]]
+    code = source_files(f"cli.{name}")
+    if stamps is not None:
+        stamps.update({str(p): _stamp(p) for p in [*inputs, *code]})
+    parts = {
+        "inputs": {a: _digest(p, cache) for a, p in zip(stage["inputs"], inputs)},
+        "setup": _setup(name, cfg),
+        "code": {str(f.relative_to(PY_ROOT)): _digest(f, cache) for f in code},
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def _untouched(entry: dict) -> bool:
+    return all(Path(p).exists() and _stat(Path(p)) == st for p, st in entry["outputs"].items())
+
+def is_fresh(name: str, fp: str, cache: dict) -> bool:
+    entry = cache["stages"].get(name)
+    if not entry or entry["fingerprint"] != fp:
+        return False
+    return _untouched(entry)
+
+def looks_fresh(name: str, cfg: dict, cache: dict) -> bool:
+    """is_fresh from size/mtime alone: no file of the last run's fingerprint was touched.
+
+    A touched file with unchanged contents reads as stale here, though the run will skip it."""
+    entry = cache["stages"].get(name)
+    if not entry or "sources" not in entry or entry.get("setup") != _setup(name, cfg):
+        return False
+    if any(_stamp(Path(p)) != st for p, st in entry["sources"].items()):
+        return False
+    return _untouched(entry)
+
+def record(name: str, fp: str, cfg: dict, cache: dict, stamps: dict | None = None) -> None:
+    outputs = [resolve(cfg, a) for a in STAGES[name]["outputs"]]
+    cache["stages"][name] = {
+        "fingerprint": fp,
+        "setup": _setup(name, cfg),
+        "sources": stamps or {},
+        "outputs": {str(p): _stat(p) for p in outputs if p.exists()},
+        "finished": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+#------runner------
+def stage_args(name: str, cfg_path: str, cfg: dict, cpus: int) -> list[str]:
+    fmt = {"cfg": cfg_path, "processed": cfg["processed"], "cpus": cpus}
+    return [a.format(**fmt) for a in STAGES[name].get("args", DEFAULT_ARGS)]
+
+def _command(name: str, cfg_path: str, cfg: dict, cpus: int) -> list[str]:
+    args = stage_args(name, cfg_path, cfg, cpus)
+    # warm stages go to the resident worker when one is up (see cli.worker)
+    if STAGES[name].get("warm") and worker_socket().exists():
+        return [sys.executable, "-m", "cli.worker", "submit", name, *args]
+    return [sys.executable, "-m", f"cli.{name}", *args]
+
+def _pump(name: str, stream, lock: threading.Lock) -> None:
+    for line in stream:
+        with lock:
+            sys.stdout.write(f"[{name}] {line}")
+            sys.stdout.flush()
+
+def _launch(name: str, cfg_path: str, cfg: dict, cpus: int, lock: threading.Lock):
+    env = {**os.environ, "PYTHONUNBUFFERED": "1", **{v: str(cpus) for v in THREAD_VARS}}
+    proc = subprocess.Popen(
+        _command(name, cfg_path, cfg, cpus), env=env, text=True,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1,
+    )
+    pump = threading.Thread(target=_pump, args=(name, proc.stdout, lock), daemon=True)
+    pump.start()
+    return proc, pump
+
+def worker_mem_gb() -> float:
+    """Resident memory of the worker (0 when none answers); it counts against --mem-gb."""
+    if not worker_socket().exists():
+        return 0.0
+    from cli.worker import request  # cli.worker imports this module
+    try:
+        for reply in request({"cmd": "status"}, timeout=2.0):
+            return (reply.get("rss_mb") or 0) / 1024
+    except (OSError, ValueError):
+        pass
+    return 0.0
+
+def run(cfg_path: str, targets: list[str] | None = None, *, upstream: bool = True,
+        cpus: int = 6, mem_gb: float = 12.0, force: bool = False, dry_run: bool = False) -> int:
+    cfg = load_cfg(cfg_path)
+    deps = dependencies(STAGES)
+    plan = select(deps, targets or list(STAGES), upstream)
+    cache = load_cache(cfg)
+    if dry_run:
+        for s in plan:
+            after = ", ".join(sorted(d for d in deps[s] if d in plan)) or "-"
+            state = "up to date" if looks_fresh(s, cfg, cache) else "stale"
+            print(f"{s:<20} after {after:<40} cpus={STAGES[s]['cpus']} mem={STAGES[s]['mem_gb']}GB  {state}")
+        return 0
+
+    # stages of this run share one telemetry run id (see pipeline.telemetry)
+    os.environ.setdefault("PIPELINE_RUN_ID", run_id())
+    lock = threading.Lock()
+    pending, running, done, failed, cached, fps, stamps = list(plan), {}, {}, [], [], {}, {}
+    # the resident worker's memory (models, warm imports) is taken before any stage starts
+    reserved = worker_mem_gb()
+    if reserved:
+        print(f"[main] worker holds {reserved:.1f}GB of the {mem_gb:g}GB budget")
+    free_cpu, free_mem = cpus, mem_gb - reserved
+    t_start = time.monotonic()
+    while pending or running:
+        if not failed:
+            for s in list(pending):
+                if any(d in pending or d in running for d in deps[s] if d in plan):
+                    continue
+                if s not in fps:
+                    fps[s] = fingerprint(s, cfg, cache, stamps.setdefault(s, {}))
+                    if not force and is_fresh(s, fps[s], cache):
+                        # same contents, maybe newer mtimes: keep --dry-run in step
+                        cache["stages"][s].update(setup=_setup(s, cfg), sources=stamps[s])
+                        with lock:
+                            print(f"[main] cached {s}")
+                        cached.append(s)
+                        pending.remove(s)
+                        continue
+                need_cpu, need_mem = min(STAGES[s]["cpus"], cpus), min(STAGES[s]["mem_gb"], mem_gb)
+                # a stage bigger than what's free still starts once nothing else runs
+                if running and (need_cpu > free_cpu or need_mem > free_mem):
+                    continue
+                with lock:
+                    print(f"[main] start {s}")
+                running[s] = (*_launch(s, cfg_path, cfg, need_cpu, lock), time.monotonic(), need_cpu, need_mem)
+                pending.remove(s)
+                free_cpu -= need_cpu
+                free_mem -= need_mem
+        elif pending:
+            pending.clear()
+
+        time.sleep(0.1)
+        for s, (proc, pump, t0, c, m) in list(running.items()):
+            if proc.poll() is None:
+                continue
+            pump.join()
+            done[s] = time.monotonic() - t0
+            free_cpu += c
+            free_mem += m
+            del running[s]
+            status = "done" if proc.returncode == 0 else f"FAILED (exit {proc.returncode})"
+            with lock:
+                print(f"[main] {status} {s} in {done[s]:.1f}s")
+            if proc.returncode == 0:
+                record(s, fps[s], cfg, cache, stamps[s])
+            else:
+                cache["stages"].pop(s, None)
+                failed.append(s)
+            save_cache(cfg, cache)
+
+    if cached:
+        save_cache(cfg, cache)
+    wall = time.monotonic() - t_start
+    report(deps, {s: t for s, t in done.items() if s not in failed}, wall)
+    executed = [s for s in plan if s in done and s not in failed]
+    print(f"[main] executed: {', '.join(executed) or '-'}; cached: {', '.join(cached) or '-'}")
+    skipped = [s for s in plan if s not in done and s not in cached]
+    if failed:
+        print(f"[main] failed: {', '.join(failed)}; not run: {', '.join(skipped) or '-'}")
+        return 1
+    return 0
+
+#------in-memory mode------
+# --in-memory runs the plan one stage at a time inside this process: pandas, the pipeline
+# modules and the config are loaded once, and pipeline.io hands artifacts to later stages
+# as Arrow tables. Only checkpoints are written: every stage output except TRANSIENT ones,
+# which no one reads but the next stages. A TRANSIENT output is still written when one of
+# its readers is not in the plan, so a later run of that reader finds it. The stage cache
+# is bypassed (like --force).
+TRANSIENT = {"transactions_canonical", "customers_clean", "articles_clean"}
+
+def checkpoints(plan: list[str], extra: list[str] = ()) -> set[str]:
+    outs = {a for s in plan for a in STAGES[s]["outputs"]}
+    unplanned = {a for s in STAGES if s not in plan for a in STAGES[s]["inputs"]}
+    return {Path(a).stem for a in outs if Path(a).stem not in TRANSIENT or a in unplanned} | set(extra)
+
+def run_inline(name: str, args: list[str]) -> int:
+    """Run stage `name` with CLI `args` in this process; returns its exit code."""
+    saved = sys.argv
+    sys.argv = [f"cli.{name}", *args]
+    try:
+        runpy.run_module(f"cli.{name}", run_name="__main__", alter_sys=True)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else int(e.code is not None)
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.argv = saved
+    return 0
+
+def run_in_memory(cfg_path: str, targets: list[str] | None = None, *, upstream: bool = True,
+                  cpus: int = 6, extra_checkpoints: list[str] = ()) -> int:
+    from pipeline import io  # pandas/pyarrow: only this mode needs them in the runner
+    cfg = load_cfg(cfg_path)
+    deps = dependencies(STAGES)
+    plan = select(deps, targets or list(STAGES), upstream)
+    # an artifact is dropped from memory once every planned stage reading it has run
+    readers = {a: {s for s in plan if a in STAGES[s]["inputs"]} for s in plan for a in STAGES[s]["outputs"]}
+    io.hold_in_memory(checkpoints(plan, extra_checkpoints))
+    done, failed = {}, None
+    t_start = time.monotonic()
+    try:
+        for s in plan:
+            print(f"[main] start {s} (in memory)", flush=True)
+            t0 = time.monotonic()
+            rc = run_inline(s, stage_args(s, cfg_path, cfg, cpus))
+            done[s] = time.monotonic() - t0
+            if rc:
+                print(f"[main] FAILED (exit {rc}) {s} in {done[s]:.1f}s")
+                failed = s
+                break
+            print(f"[main] done {s} in {done[s]:.1f}s", flush=True)
+            for a, who in readers.items():
+                if who <= done.keys():
+                    io.release(resolve(cfg, a))
+    finally:
+        io.release()
+    report(deps, {s: t for s, t in done.items() if s != failed}, time.monotonic() - t_start)
+    if failed:
+        print(f"[main] failed: {failed}; not run: {', '.join(plan[plan.index(failed) + 1:]) or '-'}")
+        return 1
+    skipped = sorted({Path(a).stem for a in readers} - checkpoints(plan, extra_checkpoints))
+    print(f"[main] executed: {', '.join(plan)}; not written: {', '.join(skipped) or '-'}")
+    return 0
+
+def report(deps: dict[str, set[str]], durations: dict[str, float], wall: float) -> None:
+    if not durations:
+        return
+    path, length = critical_path(deps, durations)
+    serial = sum(durations.values())
+    print(f"[main] wall {wall:.1f}s, serial sum {serial:.1f}s ({serial / max(wall, 1e-9):.2f}x)")
+    print(f"[main] critical path {length:.1f}s: " + " -> ".join(f"{s} ({durations[s]:.1f}s)" for s in path))
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Run pipeline stages in dependency order, in parallel where possible.")
+    ap.add_argument("stages", nargs="*", help=f"stages to run (default: all of {', '.join(STAGES)})")
+    ap.add_argument("--cfg", default="configs/base.yaml")
+    ap.add_argument("--only", action="store_true", help="run just the named stages, not their upstream")
+    ap.add_argument("--cpus", type=int, default=6, help="CPU budget shared by concurrent stages")
+    ap.add_argument("--mem-gb", type=float, default=12.0, help="memory budget shared by concurrent stages")
+    ap.add_argument("--force", action="store_true", help="rerun stages even when their inputs are unchanged")
+    ap.add_argument("--dry-run", action="store_true", help="print the plan and exit")
+    ap.add_argument("--in-memory", action="store_true",
+                    help="run stages serially in this process, handing artifacts over in memory")
+    ap.add_argument("--checkpoint", action="append", default=[], metavar="ARTIFACT",
+                    help="with --in-memory, also write this transient artifact (e.g. articles_clean)")
+    ap.add_argument("--allow-fallback-fx", action="store_true",
+                    help="let articles and transactions price with fixed fallback rates when no exchange rate is available")
+    args = ap.parse_args()
+    if args.allow_fallback_fx:
+        os.environ["PIPELINE_FX_ALLOW_FALLBACK"] = "1"  # read by pipeline.fx in every stage
+    if args.in_memory and not args.dry_run:
+        sys.exit(run_in_memory(args.cfg, args.stages, upstream=not args.only, cpus=args.cpus,
+                               extra_checkpoints=args.checkpoint))
+    sys.exit(run(args.cfg, args.stages, upstream=not args.only, cpus=args.cpus,
+                 mem_gb=args.mem_gb, force=args.force, dry_run=args.dry_run))
+
+if __name__ == "__main__":
+    main()
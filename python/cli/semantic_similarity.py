@@ -1,6 +1,6 @@
 import argparse, yaml
 from pathlib import Path
-from pipeline.recs.semantic_similarity import run
+from pipeline.telemetry import track
 
 def main():
     p = argparse.ArgumentParser()
@@ -11,21 +11,24 @@ def main():
     p.add_argument("--min-price", type=float, default=1.0)
     p.add_argument("--threads", type=int, default=1)
     args, _ = p.parse_known_args()
+    with track("semantic_similarity"):
+        # torch/faiss/transformers load only once arguments are valid (not for --help)
+        from pipeline.recs.semantic_similarity import run
 
-    with Path(args.cfg).open("r") as f:
-        cfg = yaml.safe_load(f)
-    processed_dir = Path(cfg["processed"])
-    if not processed_dir.is_absolute():
-        processed_dir = Path.cwd().joinpath(processed_dir)
+        with Path(args.cfg).open("r") as f:
+            cfg = yaml.safe_load(f)
+        processed_dir = Path(cfg["processed"])
+        if not processed_dir.is_absolute():
+            processed_dir = Path.cwd().joinpath(processed_dir)
 
-    run(
-        processed_dir=processed_dir,
-        batch_size=args.batch_size,
-        k=args.k,
-        cos_min=args.cos_min,
-        min_price=args.min_price,
-        num_threads=args.threads,
-    )
+        run(
+            processed_dir=processed_dir,
+            batch_size=args.batch_size,
+            k=args.k,
+            cos_min=args.cos_min,
+            min_price=args.min_price,
+            num_threads=args.threads,
+        )
 
 if __name__ == "__main__":
     main()
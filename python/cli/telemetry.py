@@ -0,0 +1,100 @@
+# python/cli/telemetry.py
+# compare per-stage telemetry (logs/telemetry.jsonl) across the last N pipeline runs
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pipeline.telemetry import load_records, log_dir
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+METRICS = {
+    "wall_s": "wall time (s)",
+    "cpu_s": "CPU time (s)",
+    "peak_rss_mb": "peak RSS (MB)",
+    "rss_growth_mb": "RSS growth over the stage (MB)",
+    "rows_in": "rows in",
+    "rows_out": "rows out",
+    "mb_out": "artifacts written (MB)",
+}
+
+def to_frame(records: list[dict], steps: bool = False) -> pd.DataFrame:
+    import pandas as pd  # deferred so `--help` starts fast
+    df = pd.DataFrame(records)
+    if df.empty:
+        return df
+    if "step" not in df.columns:
+        df["step"] = None
+    if not steps:
+        df = df[df["step"].isna()]
+    df = df.copy()
+    df["name"] = df["stage"].where(df["step"].isna(), df["stage"] + "." + df["step"].fillna(""))
+    if "rss_start_mb" in df.columns:
+        df["rss_growth_mb"] = (df["peak_rss_mb"] - df["rss_start_mb"]).round(1)
+    if "artifacts_out" in df.columns:
+        df["mb_out"] = df["artifacts_out"].map(
+            lambda a: round(sum(e["bytes"] or 0 for e in a) / 2**20, 2) if isinstance(a, list) else None
+        )
+    return df
+
+def last_runs(df: pd.DataFrame, n: int) -> list[str]:
+    order = df.groupby("run")["ts"].min().sort_values()
+    return order.index[-n:].tolist()
+
+def summarize(df: pd.DataFrame, runs: list[str], metric: str) -> pd.DataFrame:
+    sub = df[df["run"].isin(runs)]
+    # a stage or step that ran several times in one run (e.g. per country) is summed,
+    # except peak RSS and its growth, which are maxima
+    agg = "max" if metric in ("peak_rss_mb", "rss_growth_mb") else (lambda v: v.sum(min_count=1))
+    table = sub.pivot_table(index="name", columns="run", values=metric, aggfunc=agg, dropna=False)
+    table = table.reindex(columns=runs)
+    return table.round().astype("Int64") if metric.startswith("rows") else table
+
+def add_delta(table: pd.DataFrame) -> pd.DataFrame:
+    """`table` with the change of its last run over the one before, absolute and in percent."""
+    if table.shape[1] < 2:
+        return table
+    prev, last = table.iloc[:, -2].astype("float64"), table.iloc[:, -1].astype("float64")
+    out = table.copy()
+    out["delta"] = (last - prev).round(2)
+    out["delta_%"] = ((last - prev) / prev.where(prev != 0) * 100).round(1)
+    return out
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Compare per-stage wall time, CPU, peak RSS and rows across runs.")
+    ap.add_argument("--last", type=int, default=5, help="number of most recent runs to compare")
+    ap.add_argument("--steps", action="store_true", help="include sub-step records")
+    ap.add_argument("--delta", action="store_true", help="add the change of the last run over the previous one")
+    ap.add_argument("--log-dir", type=Path, default=None, help="default: $PIPELINE_LOG_DIR or logs")
+    ap.add_argument("--mem-limit-gb", type=float, default=12.0, help="container memory limit for the headroom line")
+    args = ap.parse_args()
+
+    df = to_frame(load_records(args.log_dir), steps=args.steps)
+    if df.empty:
+        raise SystemExit(f"No telemetry under {args.log_dir or log_dir()}")
+    runs = last_runs(df, args.last)
+    import pandas as pd
+    with pd.option_context("display.width", 200, "display.max_columns", 50):
+        for metric, label in METRICS.items():
+            if metric not in df.columns:
+                continue
+            print(f"\n{label}")
+            table = summarize(df, runs, metric)
+            print((add_delta(table) if args.delta else table).to_string(na_rep="-"))
+
+    latest = df[(df["run"] == runs[-1]) & df["step"].isna()]
+    if not latest.empty:
+        top = latest.loc[latest["peak_rss_mb"].idxmax()]
+        share = top["peak_rss_mb"] / (args.mem_limit_gb * 1024)
+        slow = latest.loc[latest["wall_s"].idxmax()]
+        print(f"\nrun {runs[-1]}: highest peak RSS {top['stage']} {top['peak_rss_mb']:.0f} MB "
+              f"({share:.0%} of {args.mem_limit_gb:g} GB); slowest {slow['stage']} {slow['wall_s']:.1f}s")
+        failed = latest.loc[latest["status"] != "ok", "stage"].tolist()
+        if failed:
+            print(f"failed: {', '.join(failed)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,79 @@
 from pathlib import Path
 import argparse
-import pandas as pd
-
-from pipeline.io import load_cfg, write_parquet
-from pipeline.transactions.remove_known_bugs import (
-    prepare_article_lookup,
-    remove_known_bugs,
-)
-from pipeline.transactions.currency import (
-    fix_six_digit_prices,
-    unify_price_to_sek,
-)
-from pipeline.transactions.customer_enrich import (
-    enrich_tx_with_customers,
-    filter_tx_by_age,
-)
-from pipeline.transactions.line_totals import (
-    normalize_quantity_to_str,
-    compute_and_filter_line_total_sek,
-)
-from pipeline.transactions.country_label import label_country
-
-def run(cfg_path: str, min_created: str = "2024-06-01") -> None:
+
+from pipeline.config import load_cfg
+from pipeline.io import iter_parquet_batches, parquet_policy, read_parquet, write_parquet, write_parquet_chunks
+from pipeline.transactions.remove_known_bugs import prepare_article_lookup
+from pipeline.transactions.currency import fetch_sek_rates
+from pipeline.transactions.clean import clean_transactions
+from pipeline.transactions import incremental as tinc
+from pipeline.fx import FX_FILE
+from pipeline.telemetry import tracked
+
+@tracked("transactions")
+def run(cfg_path: str, min_created: str = "2024-06-01", fx_asof: bool = False,
+        chunk_rows: int | None = None, incremental: bool = False,
+        allow_fallback_fx: bool | None = None) -> None:
     cfg = load_cfg(cfg_path)
     processed = Path(cfg["processed"])
     out_dir = processed
+    canonical = processed / "transactions_canonical.parquet"
+    clean_path = out_dir / "transactions_clean.parquet"
 
-    tx = pd.read_parquet(processed / "transactions_canonical.parquet")
-    articles = pd.read_parquet(processed / "articles_clean.parquet",
+    articles = read_parquet(processed / "articles_clean.parquet",
                                columns=["sku","groupId","category","brand", "audience", "audienceId"])
-    customers = pd.read_parquet(processed / "customers_clean.parquet")
-
+    customers = read_parquet(processed / "customers_clean.parquet", columns=["shopUserId", "Age", "Gender"])
     a_lu = prepare_article_lookup(articles)
-    tx = remove_known_bugs(tx, a_lu, min_created=min_created)
-
-    tx = fix_six_digit_prices(tx)
-    tx = unify_price_to_sek(tx)
-
-    tx = label_country(tx, src_col="currency_country", out_col="country", drop_src=True)
+    fx_store = Path(cfg["interim"]) / FX_FILE
+    # latest rates, loaded once; --fx-asof prices each line at its own date instead
+    rates = None if fx_asof else fetch_sek_rates(store=fx_store, allow_fallback=allow_fallback_fx)
+    clean = dict(min_created=min_created, fx_store=fx_store, fx_asof=fx_asof, rates=rates,
+                 allow_fallback_fx=allow_fallback_fx)
 
-    tx = enrich_tx_with_customers(tx, customers, id_col="shopUserId", customer_cols=("Age","Gender"))
-    tx = filter_tx_by_age(tx, age_col="Age", lo=10, hi=105)
+    if incremental:
+        # only new or edited canonical lines (by row hash) and lines of changed customers are
+        # cleaned and upserted; see pipeline.transactions.incremental
+        interim = Path(cfg["interim"])
+        # without --fx-asof every line is priced at the latest rates: new rates mean a rebuild
+        expected = {"version": tinc.code_version(), "min_created": min_created, "fx_asof": fx_asof,
+                    "rates": rates, "articles": tinc.frame_digest(a_lu),
+                    "partition_by": parquet_policy("transactions_clean")["partition_by"]}
+        st = tinc.run_incremental(canonical, clean_path, interim, expected,
+                                  lambda tx: clean_transactions(tx, a_lu, customers, **clean),
+                                  batch_rows=chunk_rows or 500_000)
+        if st["rebuild"] is None:
+            print(f"incremental: {st['delta']:,} new, edited or changed-customer lines and {st['gone']:,} gone, "
+                  f"{st['replaced']:,} replaced by {st['upserted']:,} in {st['partitions']:,} partitions")
+            return
+        print(f"incremental: rebuilding transactions_clean ({st['rebuild']})")
 
-    tx = normalize_quantity_to_str(tx)
-    tx = compute_and_filter_line_total_sek(tx)
+    if chunk_rows:
+        # stream the canonical transactions: only one chunk is in memory at a time
+        chunks = iter_parquet_batches(canonical, batch_size=chunk_rows)
+        rows = write_parquet_chunks(
+            (clean_transactions(tx, a_lu, customers, **clean) for tx in chunks),
+            clean_path,
+        )
+        print(f"transactions: {rows:,} clean rows written in chunks of {chunk_rows:,}")
+    else:
+        tx = read_parquet(canonical)
+        tx = clean_transactions(tx, a_lu, customers, **clean)
+        write_parquet(tx, clean_path)
 
-    tx["price"] = pd.to_numeric(tx["price"], errors="coerce").astype("Float64")
-    write_parquet(tx, out_dir / "transactions_clean.parquet")
+    if incremental:
+        tinc.save_rebuild(canonical, interim, expected, batch_rows=chunk_rows or 500_000)
 
 
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--cfg", default="configs/base.yaml")
     p.add_argument("--min-created", default="2024-06-01")
+    p.add_argument("--fx-asof", action="store_true", help="convert each line at the rate of its created date")
+    p.add_argument("--chunk-rows", type=int, default=None,
+                   help="stream transactions in chunks of this many rows (bounded memory, sorted per chunk)")
+    p.add_argument("--incremental", action="store_true",
+                   help="only clean new or edited lines and lines of changed customers")
+    p.add_argument("--allow-fallback-fx", action="store_true", default=None,
+                   help="price with fixed fallback rates when no exchange rate is stored or fetchable")
     args = p.parse_args()
-    run(args.cfg, args.min_created)
+    run(args.cfg, args.min_created, args.fx_asof, args.chunk_rows, args.incremental, args.allow_fallback_fx)
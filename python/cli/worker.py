@@ -0,0 +1,284 @@
+# python/cli/worker.py
+# resident worker: keeps torch/faiss/cornac and the sentence encoder loaded between
+# pipeline runs and executes stage jobs sent over a Unix socket, one at a time (later jobs queue).
+#   python -m cli worker start|restart|serve|status|stop
+#   python -m cli worker submit <stage> [stage args]   (cli.main does this for warm stages)
+# submit runs the stage locally when no worker answers or the worker's code is stale.
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from cli.main import STAGES, THREAD_VARS, run_inline, worker_socket
+from pipeline.sources import source_files
+from pipeline.telemetry import peak_rss_mb, rss_mb, run_id, set_run_id
+
+# modules imported (and the encoder loaded) when the worker starts
+PRELOAD = {
+    "semantic_similarity": "pipeline.recs.semantic_similarity",
+    "iicf_ease": "pipeline.recs.iicf_ease",
+}
+STALE = 75  # EX_TEMPFAIL: repo code changed since the worker loaded it
+# caller environment a job runs under (unset in the caller = unset in the job)
+FORWARD_ENV = (*THREAD_VARS, "PIPELINE_LOG_DIR", "PIPELINE_FX_OFFLINE")
+
+#------protocol------
+# one JSON request line per connection; the worker answers with {"out": text} lines
+# while a job runs and ends with a JSON line holding the result
+def _send(wfile, msg: dict) -> None:
+    wfile.write((json.dumps(msg) + "\n").encode())
+    wfile.flush()
+
+def request(msg: dict, sock: Path | None = None, timeout: float | None = 5.0):
+    """Send `msg` to the worker and yield its reply lines (raises OSError if it is down)."""
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.settimeout(timeout)
+    conn.connect(str(sock or worker_socket()))
+    with conn, conn.makefile("rb") as rfile:
+        conn.sendall((json.dumps(msg) + "\n").encode())
+        for line in rfile:
+            yield json.loads(line)
+
+def alive(sock: Path | None = None) -> bool:
+    try:
+        return any("pid" in r for r in request({"cmd": "status"}, sock, timeout=2.0))
+    except (OSError, ValueError):
+        return False
+
+class _Stream:
+    """File-like object forwarding a job's stdout/stderr to the client."""
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text: str) -> int:
+        if text:
+            _send(self.wfile, {"out": text})
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+#------job environment------
+def _set_env(env: dict) -> None:
+    for k in FORWARD_ENV:
+        if env.get(k) is None:
+            os.environ.pop(k, None)
+        else:
+            os.environ[k] = env[k]
+
+@contextlib.contextmanager
+def _job_env(env: dict):
+    """Run under the caller's FORWARD_ENV. Thread pools already started (BLAS, torch)
+    ignore OMP_NUM_THREADS, so their size is set explicitly."""
+    saved = {k: os.environ.get(k) for k in FORWARD_ENV}
+    threads = env.get("OMP_NUM_THREADS")
+    with contextlib.ExitStack() as stack:
+        _set_env(env)
+        stack.callback(_set_env, saved)
+        if threads:
+            with contextlib.suppress(ImportError):
+                from threadpoolctl import threadpool_limits
+                stack.enter_context(threadpool_limits(int(threads)))
+            if "torch" in sys.modules:
+                torch = sys.modules["torch"]
+                stack.callback(torch.set_num_threads, torch.get_num_threads())
+                torch.set_num_threads(int(threads))
+        yield
+
+#------server------
+class Worker(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Path):
+        super().__init__(str(path), _Handler)
+        self.path = path
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.jobs = 0
+        self.current: str | None = None
+        self.loaded: dict[str, int] = {}   # repo source file -> mtime_ns when first used
+
+    def _remember(self, stage: str) -> None:
+        for f in source_files(f"cli.{stage}"):
+            self.loaded.setdefault(str(f), f.stat().st_mtime_ns)
+
+    def stale(self, stage: str) -> list[str]:
+        return [str(f) for f in source_files(f"cli.{stage}")
+                if str(f) in self.loaded and f.stat().st_mtime_ns != self.loaded[str(f)]]
+
+    def preload(self, model: bool) -> None:
+        with self.lock:  # jobs wait for it; status answers meanwhile
+            self._preload(model)
+
+    def _preload(self, model: bool) -> None:
+        for stage, module in PRELOAD.items():
+            t0 = time.perf_counter()
+            try:
+                mod = importlib.import_module(module)
+                if model and hasattr(mod, "load_encoder"):
+                    mod.load_encoder()
+            except Exception as e:  # the job would fail the same way; keep serving
+                print(f"[worker] preload {stage} failed: {e!r}", flush=True)
+                continue
+            self._remember(stage)
+            print(f"[worker] preloaded {stage} in {time.perf_counter() - t0:.1f}s", flush=True)
+
+    def status(self) -> dict:
+        return {
+            "pid": os.getpid(), "socket": str(self.path), "uptime_s": round(time.time() - self.started),
+            "jobs": self.jobs, "running": self.current, "rss_mb": rss_mb(), "peak_rss_mb": peak_rss_mb(),
+            "warm": [s for s, m in PRELOAD.items() if m in sys.modules],
+        }
+
+    def run_job(self, req: dict, wfile) -> int:
+        stage = req.get("stage")
+        if stage not in STAGES:
+            _send(wfile, {"out": f"[worker] unknown stage {stage!r}\n"})
+            return 2
+        # chdir, redirect_stdout and the environment are process-wide: never two jobs at once.
+        # A job sent meanwhile (or during preload) waits here for the running one to finish.
+        with self.lock:
+            changed = self.stale(stage)
+            if changed:
+                _send(wfile, {"out": f"[worker] code changed since load: {', '.join(changed)}\n"})
+                return STALE
+            self.current = stage
+            cwd, run = os.getcwd(), run_id()
+            out = _Stream(wfile)
+            try:
+                os.chdir(req.get("cwd") or cwd)
+                set_run_id(req.get("run_id") or run)
+                with _job_env(req.get("env", {})), contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+                    rc = run_inline(stage, req.get("args", []))
+                self._remember(stage)
+                return rc
+            finally:
+                os.chdir(cwd)
+                set_run_id(run)
+                self.current = None
+                self.jobs += 1
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        req = json.loads(self.rfile.readline() or b"{}")
+        cmd = req.get("cmd")
+        if cmd == "status":
+            _send(self.wfile, self.server.status())
+        elif cmd == "stop":
+            _send(self.wfile, {"stopping": os.getpid()})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif cmd == "run":
+            _send(self.wfile, {"rc": self.server.run_job(req, self.wfile)})
+        else:
+            _send(self.wfile, {"error": f"unknown command {cmd!r}"})
+
+def serve(sock: Path, model: bool = True) -> None:
+    if alive(sock):
+        raise SystemExit(f"A worker is already listening on {sock}")
+    sock.unlink(missing_ok=True)
+    server = Worker(sock)
+    print(f"[worker] pid {os.getpid()} listening on {sock}", flush=True)
+    try:
+        threading.Thread(target=server.preload, args=(model,), daemon=True).start()
+        server.serve_forever()
+    finally:
+        server.server_close()
+        sock.unlink(missing_ok=True)
+        print("[worker] stopped", flush=True)
+
+#------client------
+def submit(stage: str, args: list[str], sock: Path | None = None) -> int:
+    msg = {"cmd": "run", "stage": stage, "args": args, "cwd": os.getcwd(),
+           "run_id": os.environ.get("PIPELINE_RUN_ID") or run_id(),
+           "env": {k: os.environ[k] for k in FORWARD_ENV if k in os.environ}}
+    rc = None
+    try:
+        for reply in request(msg, sock, timeout=None):
+            if "out" in reply:
+                sys.stdout.write(reply["out"])
+                sys.stdout.flush()
+            elif "rc" in reply:
+                rc = reply["rc"]
+    except OSError as e:
+        if rc is None:
+            print(f"[worker] unavailable ({e.strerror or e}); running {stage} locally", flush=True)
+            return run_inline(stage, args)
+    if rc == STALE:
+        print(f"[worker] stale; running {stage} locally (`python -m cli worker restart` reloads it)", flush=True)
+        return run_inline(stage, args)
+    return 1 if rc is None else rc
+
+def start(sock: Path, model: bool, log: Path) -> None:
+    """Start a detached worker unless one is already up."""
+    if alive(sock):
+        print(f"[worker] already running on {sock}")
+        return
+    log.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [sys.executable, "-m", "cli.worker", "serve", "--socket", str(sock), *([] if model else ["--no-model"])]
+    with log.open("a") as f:
+        proc = subprocess.Popen(cmd, stdout=f, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                start_new_session=True)
+    for _ in range(100):
+        if alive(sock):
+            print(f"[worker] started pid {proc.pid} on {sock} (log {log})")
+            return
+        if proc.poll() is not None:
+            raise SystemExit(f"Worker exited with {proc.returncode}; see {log}")
+        time.sleep(0.1)
+    print(f"[worker] pid {proc.pid} still preloading; see {log}")
+
+def stop(sock: Path, wait: float = 30.0) -> bool:
+    """Ask the worker to exit once its current job is done; False if none was running."""
+    try:
+        list(request({"cmd": "stop"}, sock))
+    except OSError:
+        return False
+    deadline = time.monotonic() + wait
+    while sock.exists() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    return True
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Resident worker that keeps heavy stage imports and models warm.",
+                                 allow_abbrev=False)
+    ap.add_argument("command", choices=["serve", "start", "restart", "status", "stop", "submit"])
+    ap.add_argument("stage", nargs="?", help="stage to run (submit)")
+    ap.add_argument("--socket", type=Path, default=None, help="default: $PIPELINE_WORKER_SOCKET or /tmp/itcm-pipeline-worker.sock")
+    ap.add_argument("--no-model", action="store_true", help="don't load the sentence encoder up front")
+    ap.add_argument("--log", type=Path, default=Path(".logs/worker.log"), help="worker output (start)")
+    args, rest = ap.parse_known_args()
+    sock = args.socket or worker_socket()
+
+    if args.command == "serve":
+        serve(sock, model=not args.no_model)
+    elif args.command in ("start", "restart"):
+        if args.command == "restart" and stop(sock):
+            print(f"[worker] stopped the worker on {sock}")
+        start(sock, not args.no_model, args.log)
+    elif args.command == "stop":
+        if not stop(sock):
+            raise SystemExit(f"No worker on {sock}")
+        print(f"[worker] stopped the worker on {sock}")
+    elif args.command == "submit":
+        if not args.stage:
+            ap.error("submit needs a stage")
+        sys.exit(submit(args.stage, rest, sock))
+    else:
+        try:
+            for reply in request({"cmd": args.command}, sock):
+                print(json.dumps(reply, indent=2))
+        except OSError:
+            raise SystemExit(f"No worker on {sock}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# vectorized per-group aggregations that pandas only offers through a Python call per group
+
+#------imports------
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+#------group mode------
+def group_mode(df: pd.DataFrame, by, col: str, *, ties: str = "smallest", dropna: bool = False) -> pd.Series:
+    """Most frequent non-NA `col` in each `by` group, NA for groups without a value.
+
+    Same groups and order as df.groupby(by, dropna=dropna, sort=False)[col]; the result keeps
+    col's dtype. Ties go to the smallest value (ties="smallest", like Series.mode().iat[0];
+    category order for categoricals) or to the value seen first in the group (ties="first").
+    Counts every (group, value) pair once, sorts by group, count and tie-break key and keeps
+    the first row per group."""
+    groups = df.groupby(by, dropna=dropna, sort=False)
+    index = groups.size().index
+    gid = groups.ngroup().to_numpy()
+    vals = df[col]
+    rows = np.flatnonzero((gid >= 0) & vals.notna().to_numpy())
+    rep = np.full(len(index), -1, dtype=np.int64)
+    if len(rows):
+        vcode, uniq = pd.factorize(vals.iloc[rows], sort=ties == "smallest")
+        pair = gid[rows].astype(np.int64) * len(uniq) + vcode
+        order = np.argsort(pair, kind="stable")  # rows stay in frame order within a pair
+        pair, first_row = pair[order], rows[order]
+        starts = np.flatnonzero(np.r_[True, pair[1:] != pair[:-1]])
+        count = np.diff(np.r_[starts, len(pair)])
+        pair, first_row = pair[starts], first_row[starts]
+        g = pair // len(uniq)
+        tie = pair % len(uniq) if ties == "smallest" else first_row
+        best = np.lexsort((tie, -count, g))
+        best = best[np.r_[True, g[best][1:] != g[best][:-1]]]
+        rep[g[best]] = first_row[best]
+    return pd.Series(vals.array.take(rep, allow_fill=True), index=index, name=col)
@@ -1,6 +1,8 @@
 import re
 import pandas as pd
 
+from pipeline.text import map_unique
+
 def clean_audience(df: pd.DataFrame) -> pd.DataFrame:
     """
     Normalize/derive 'audience' and 'audienceId' from existing 'audience' and 'category' columns.
@@ -159,14 +161,14 @@ def clean_audience(df: pd.DataFrame) -> pd.DataFrame:
 
     out = df.copy()
 
-    out['audience'] = out['audience'].apply(norm_audience).astype('string')
+    out['audience'] = map_unique(out['audience'], norm_audience).astype('string')
 
     na_mask = out['audience'].isna()
-    fill = out.loc[na_mask, 'category'].apply(classify)
+    fill = map_unique(out.loc[na_mask, 'category'], classify)
     idx = fill.dropna().index
     out.loc[idx, 'audience'] = fill.loc[idx]
 
-    out['audienceId'] = out['audience'].apply(to_ids).astype('string')
+    out['audienceId'] = map_unique(out['audience'], to_ids).astype('string')
 
     out = move_after(out, ['audienceId'], 'audience')
 
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from pipeline.text import map_unique
+
 def _dedup_csv(s):
     if pd.isna(s):
         return pd.NA
@@ -19,18 +21,20 @@ def normalize_categories(articles: pd.DataFrame) -> pd.DataFrame:
         if c not in df:
             df[c] = pd.Series(pd.NA, index=df.index, dtype="string")
         df[c] = df[c].astype("string")
-    df["category"]  = df["category"].apply(_dedup_csv).astype("string")
-    df["categoryId"] = df["categoryId"].apply(_dedup_csv).astype("string")
+    df["category"]  = map_unique(df["category"], _dedup_csv, memo=True).astype("string")
+    df["categoryId"] = map_unique(df["categoryId"], _dedup_csv, memo=True).astype("string")
+    # token pairs of each distinct (category, categoryId), weighted by its row count
     pairs = []
-    for cat, cid in df[["category", "categoryId"]].dropna().itertuples(index=False):
+    combos = df[["category", "categoryId"]].dropna().value_counts(sort=False)
+    for (cat, cid), w in combos.items():
         ct, it = _toks(cat), _toks(cid)
         n = min(len(ct), len(it))
         if n:
-            pairs.extend(zip(ct[:n], it[:n]))
+            pairs.extend((c, i, w) for c, i in zip(ct[:n], it[:n]))
     if pairs:
-        dfp = pd.DataFrame(pairs, columns=["cat_tok", "id_tok"])
+        dfp = pd.DataFrame(pairs, columns=["cat_tok", "id_tok", "w"])
         token2id = (
-            dfp.groupby(["cat_tok", "id_tok"]).size()
+            dfp.groupby(["cat_tok", "id_tok"])["w"].sum()
                .reset_index(name="n")
                .sort_values(["cat_tok", "n", "id_tok"], ascending=[True, False, True])
                .drop_duplicates("cat_tok")
@@ -43,6 +47,6 @@ def normalize_categories(articles: pd.DataFrame) -> pd.DataFrame:
         ct = _toks(cat)
         mapped = [token2id.get(t) for t in ct if t in token2id]
         return ",".join(mapped) if mapped else pd.NA
-    df["categoryId"] = df["category"].apply(_rebuild_ids).astype("string")
+    df["categoryId"] = map_unique(df["category"], _rebuild_ids).astype("string")
     df["category"] = df["category"].fillna("unknown").astype("string")
     return df.reset_index(drop=True)
@@ -1,20 +1,12 @@
+from pathlib import Path
 import pandas as pd
-import requests
-
-def fetch_sek_rates_from_frankfurter(timeout: int = 8) -> dict[str, float | str]:
-    fb = {"EUR": 11.50, "NOK": 1.00, "DKK": 1.55, "asof": "fallback"}
-    try:
-        r = requests.get("https://api.frankfurter.app/latest",
-                         params={"base": "EUR", "symbols": "SEK,NOK,DKK"},
-                         timeout=timeout)
-        r.raise_for_status()
-        data = r.json()
-        eur = float(data["rates"]["SEK"])
-        nok = eur / float(data["rates"]["NOK"])
-        dkk = eur / float(data["rates"]["DKK"])
-        return {"EUR": eur, "NOK": nok, "DKK": dkk, "asof": data.get("date", "unknown")}
-    except Exception:
-        return fb
+
+from pipeline import fx
+
+def fetch_sek_rates_from_frankfurter(timeout: int = 8, store: Path | None = None,
+                                     allow_fallback: bool | None = None) -> dict[str, float | str]:
+    # latest rates from the shared store (see pipeline.fx); "asof" is "fallback" when allowed
+    return fx.sek_rates(store, timeout=timeout, allow_fallback=allow_fallback)
 
 def _to_float_series(s: pd.Series) -> pd.Series:
     if s.dtype.kind in "fi":
@@ -33,6 +25,8 @@ def fill_priceSEK_no_decimals(
     rates: dict[str, float] | None = None,
     sku_col: str = "sku",
     overrides_priceSEK: dict[str, int | str] | None = None,
+    fx_store: Path | None = None,
+    allow_fallback_fx: bool | None = None,
 ) -> pd.DataFrame:
     pSEK, pEUR, pNOK, pDKK = price_cols
     df = articles.copy()
@@ -41,7 +35,8 @@ def fill_priceSEK_no_decimals(
         if c not in df:
             df[c] = pd.NA
 
-    r = rates or fetch_sek_rates_from_frankfurter(timeout=fetch_timeout)
+    r = rates or fetch_sek_rates_from_frankfurter(timeout=fetch_timeout, store=fx_store,
+                                                  allow_fallback=allow_fallback_fx)
     R = {"EUR": float(r["EUR"]), "NOK": float(r["NOK"]), "DKK": float(r["DKK"])}
 
     cand = (_to_float_series(df[pEUR]) * R["EUR"]) \
@@ -4,6 +4,9 @@ from pathlib import Path
 import pandas as pd
 from collections.abc import Sequence
 
+from pipeline.io import read_external, read_parquet, schema_problems, write_parquet
+from pipeline.text import map_unique
+
 COLS_TO_DROP = ['priceEUR', 'priceNOK', 'priceDKK', 'forSale', 'sizeId', 'brandId', 'categoryId']
 COLS_TO_ADD = ['description', 'color']
 
@@ -47,13 +50,14 @@ def merge_list(series: pd.Series):
                 keep.append(s)
     return sorted(set(keep)) if keep else []
 
-def run(external_dir: Path, processed_dir: Path) -> None:
-    full_articles = pd.read_csv(external_dir.joinpath("products.csv"), dtype="string")
-    articles_clean = pd.read_parquet(processed_dir.joinpath("articles_clean.parquet")).query("forSale.notna()")
+def run(external_dir: Path, processed_dir: Path) -> list[str]:
+    """Build articles_for_recs; returns the schema problems of the products export."""
+    full_articles, report = read_external(external_dir, "products", columns=["sku", *COLS_TO_ADD])
+    articles_clean = read_parquet(processed_dir.joinpath("articles_clean.parquet")).query("forSale.notna()")
     articles = articles_clean.drop(columns=COLS_TO_DROP, errors="ignore").copy()
     articles = articles.merge(full_articles[['sku'] + COLS_TO_ADD], on="sku", how="left")
 
-    articles['color'] = articles['color'].apply(dedup_color)
+    articles['color'] = map_unique(articles['color'], dedup_color, memo=True)
 
     articles = articles.sort_values("sku")
 
@@ -65,4 +69,5 @@ def run(external_dir: Path, processed_dir: Path) -> None:
 
     articles = articles.groupby("groupId", as_index=False).agg(agg_map)
     articles = articles[articles["name"].notna()].reset_index(drop=True)
-    articles.to_parquet(processed_dir.joinpath("articles_for_recs.parquet"), index=False)
+    write_parquet(articles, processed_dir.joinpath("articles_for_recs.parquet"))
+    return schema_problems(report)
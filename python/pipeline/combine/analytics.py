@@ -3,11 +3,14 @@ from pathlib import Path
 from typing import Iterable, Sequence
 import pandas as pd
 
+from pipeline.io import ARROW_STRING, read_parquet, write_parquet
+
 
 # ---------- Generic helpers ----------
 
 def _norm_str(s: pd.Series, unknown: str = "Unknown") -> pd.Series:
-    s = s.astype("string[python]")
+    # order_items strings are already string[pyarrow]; casting them to string[python] would copy
+    s = s if s.dtype == ARROW_STRING else s.astype(ARROW_STRING)
     s = s.where(~s.isna(), unknown)
     return s.str.strip().fillna(unknown)
 
@@ -27,7 +30,8 @@ def _ensure_cols(
 ) -> pd.DataFrame:
     """Return a copy with 'created' as datetime and 'quantity' as int64 (default=1)."""
     out = df.copy()
-    out[created_col] = pd.to_datetime(out.get(created_col), errors="coerce")
+    if not pd.api.types.is_datetime64_any_dtype(out.get(created_col)):
+        out[created_col] = pd.to_datetime(out.get(created_col), errors="coerce")
     q = pd.to_numeric(out.get(quantity_col), errors="coerce")
     out[quantity_col] = q.fillna(quantity_default).astype("int64")
     return out
@@ -134,7 +138,9 @@ def build_top_categories_by_season(
     tx = _prepare_common_tx(tx_items)
     cat_lists = _explode_unique_str_list(tx.get("category"), category_sep)
     tx_exp = tx.loc[cat_lists.index, ["country", "season_label", "quantity"]].copy()
-    tx_exp["category"] = _norm_str(cat_lists.explode().reset_index(drop=True))
+    tx_exp["category"] = cat_lists
+    tx_exp = tx_exp.explode("category")
+    tx_exp["category"] = _norm_str(tx_exp["category"])
     tx_exp = tx_exp.dropna(subset=["category"])  # after norm: removes explicit <NA>
 
     agg = (
@@ -252,7 +258,8 @@ def bucket_return_days(d: int) -> str | pd.NA:
 
 def count_return_buckets(tx_items: pd.DataFrame) -> pd.DataFrame:
     tx = tx_items.copy()
-    tx["created"] = pd.to_datetime(tx.get("created"), errors="coerce")
+    if not pd.api.types.is_datetime64_any_dtype(tx.get("created")):
+        tx["created"] = pd.to_datetime(tx.get("created"), errors="coerce")
     tx = tx.dropna(subset=["created", "customer_id"])
     tx["purchase_date"] = tx["created"].dt.date
 
@@ -284,20 +291,10 @@ def count_return_buckets(tx_items: pd.DataFrame) -> pd.DataFrame:
 
 
 def run_analytics(output_dir: Path) -> None:
-    tx_items = pd.read_parquet(output_dir / "order_items.parquet")
+    tx_items = read_parquet(output_dir / "order_items.parquet")
 
-    build_top_categories_by_season(tx_items).to_parquet(
-        output_dir / "top_categories_by_season.parquet", index=False
-    )
-    build_top_groupids_by_season(tx_items).to_parquet(
-        output_dir / "top_groupids_by_season.parquet", index=False
-    )
-    build_top_repurchase_groupids_by_country_unique_days(tx_items).to_parquet(
-        output_dir / "top_repurchase_groupids_by_country.parquet", index=False
-    )
-    build_top_brands_by_country(tx_items).to_parquet(
-        output_dir / "top_brands_by_country.parquet", index=False
-    )
-    count_return_buckets(tx_items).to_parquet(
-        output_dir / "return_buckets_overall.parquet", index=False
-    )
+    write_parquet(build_top_categories_by_season(tx_items), output_dir / "top_categories_by_season.parquet")
+    write_parquet(build_top_groupids_by_season(tx_items), output_dir / "top_groupids_by_season.parquet")
+    write_parquet(build_top_repurchase_groupids_by_country_unique_days(tx_items), output_dir / "top_repurchase_groupids_by_country.parquet")
+    write_parquet(build_top_brands_by_country(tx_items), output_dir / "top_brands_by_country.parquet")
+    write_parquet(count_return_buckets(tx_items), output_dir / "return_buckets_overall.parquet")
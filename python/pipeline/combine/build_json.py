@@ -9,6 +9,9 @@ from typing import Dict, Tuple, Iterable
 import numpy as np
 import pandas as pd
 
+from pipeline.aggregate import group_mode
+from pipeline.telemetry import note
+
 NORDICS: list[str] = ["Sweden", "Denmark", "Finland", "Norway"]
 
 #------helpers-----
@@ -16,13 +19,6 @@ def status_from_orders(n: int) -> str:
     return "New" if n <= 1 else ("Returning" if n <= 3 else "Loyal")
 
 
-def mode_or_first(s: pd.Series):
-    m = s.mode()
-    if not m.empty:
-        return m.iat[0]
-    s = s.dropna()
-    return s.iat[0] if not s.empty else None
-
 def _pick(df: pd.DataFrame, names: Iterable[str], default=None) -> pd.Series:
     for n in names:
         if n in df.columns:
@@ -79,12 +75,11 @@ def _build_base_tx(tx: pd.DataFrame) -> pd.DataFrame:
 def _prep_customers(customers: pd.DataFrame) -> pd.DataFrame:
     c = customers.copy()
     c["shopUserId_norm"] = _norm_id(c["shopUserId"])
-    c_agg = (
-        c.groupby("shopUserId_norm", dropna=False)
-        .agg(Age=("Age", mode_or_first), Gender=("Gender", mode_or_first))
-        .reset_index()
-    )
-    return c_agg
+    c_agg = pd.DataFrame({
+        "Age": group_mode(c, "shopUserId_norm", "Age"),
+        "Gender": group_mode(c, "shopUserId_norm", "Gender"),
+    })
+    return c_agg.sort_index().reset_index()
 
 #------aggregations-----
 def split_nordics(tx: pd.DataFrame) -> Dict[str, pd.DataFrame]:
@@ -117,10 +112,11 @@ def _agg_customer(tx: pd.DataFrame):
             total_orders=("orderId", "nunique"),
             first_order=("created", "min"),
             last_order=("created", "max"),
-            age=("Age", mode_or_first),
-            gender=("Gender", mode_or_first),
         )
     )
+    keys = ["city", "shopUserId"]
+    agg_customer["age"] = group_mode(tx_cust, keys, "Age")
+    agg_customer["gender"] = group_mode(tx_cust, keys, "Gender")
     agg_customer["total_spent_sek"] = np.rint(agg_customer["total_spent_sek"]).astype("int64")
     return agg_customer.sort_index(level=["city", "shopUserId"])
 
@@ -132,10 +128,11 @@ def _agg_order(tx: pd.DataFrame):
             order_total_sek=("rev", "sum"),
             n_items=("orderId", "size"),
             created=("created", "min"),
-            order_type=("type", mode_or_first),
-            price=("price", mode_or_first),
         )
     )
+    keys = ["city", "shopUserId", "orderId"]
+    agg_order["order_type"] = group_mode(tx_cust, keys, "type")
+    agg_order["price"] = group_mode(tx_cust, keys, "price")
     agg_order["order_total_sek"] = np.rint(agg_order["order_total_sek"]).astype("int64")
     return agg_order.sort_index(level=["city", "shopUserId", "orderId"])
 
@@ -196,14 +193,8 @@ def _build_items_grouped(
         else:
             items_tx[c] = tx.loc[tx_country.index, c] if c in tx.columns else None
     if articles is not None:
-        art = articles.copy()
-        for key in ("sku", "groupId"):
-            if key in art.columns:
-                art[key] = art[key].astype("string[python]").str.strip()
-        if "sku" in items_tx.columns:
-            items_tx["sku"] = items_tx["sku"].astype("string[python]").str.strip()
-        if "groupId" in items_tx.columns:
-            items_tx["groupId"] = items_tx["groupId"].astype("string[python]").str.strip()
+        # sku and groupId are trimmed when articles_clean and transactions_clean are written
+        art = articles
         if "brand" not in items_tx.columns:
             items_tx["brand"] = pd.NA
         if "category" not in items_tx.columns:
@@ -222,7 +213,9 @@ def _build_items_grouped(
             if "category" in art.columns:
                 gid_cat = art.dropna(subset=["groupId"]).drop_duplicates("groupId").set_index("groupId")["category"]
                 items_tx["category"] = items_tx["category"].fillna(items_tx.get("groupId").map(gid_cat))
-    items_tx = items_tx[tx_country["shopUserId"].notna()].copy()
+    # rows become Python dicts one group at a time (_item_dict): object columns make that a
+    # plain numpy take instead of one Arrow take per group and column
+    items_tx = items_tx[tx_country["shopUserId"].notna()].astype(object)
     items_tx["city"] = items_tx["city"].fillna("Unknown")
     return items_tx.groupby(["city", "shopUserId", "orderId"], dropna=False, sort=False)
 
@@ -256,6 +249,9 @@ def export_country_json(
 ) -> None:
     tx_c = tx_country.copy()
     tx_c["city"] = tx_c["city"].fillna("Unknown")
+    if "type" in tx_c.columns:
+        # categorical channels would group/mode in category order, not by label
+        tx_c["type"] = tx_c["type"].astype(object)
     total_revenue, customers_cnt, total_orders, aov_country = _country_totals(tx_c)
     agg_city, city_orders = _agg_city(tx_c)
     agg_customer = _agg_customer(tx_c)
@@ -334,4 +330,5 @@ def export_country_json(
         result[top_key]["cities"][ckey]["customers"][str(uid)] = cust_node
     out_path = Path(out_dir) / f"{country_name}.json"
     with out_path.open("w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
\ No newline at end of file
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    note("out", out_path)
\ No newline at end of file
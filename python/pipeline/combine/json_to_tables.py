@@ -5,6 +5,8 @@ from typing import Dict, List
 import json
 import pandas as pd
 import collections
+
+from pipeline.io import write_parquet
 from collections import defaultdict
 from datetime import datetime
 
@@ -22,7 +24,7 @@ def load_json(path: Path) -> dict:
         return json.load(f)
 
 def save_parquet(tx: pd.DataFrame, path: Path) -> None:
-    tx.to_parquet(path, index=False)
+    write_parquet(tx, path)
 
 def _ensure(tx: pd.DataFrame | None, cols: List[str]) -> pd.DataFrame:
     if tx is None or tx.empty:
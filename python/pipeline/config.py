@@ -0,0 +1,16 @@
+# config loading, kept free of pandas/pyarrow so light commands (cli.main --dry-run) start fast
+
+#------imports------
+from pathlib import Path
+import copy, functools
+import yaml
+
+#------load config------
+@functools.lru_cache(maxsize=None)
+def _parse_cfg(path: str, mtime_ns: int) -> dict:
+    return yaml.safe_load(Path(path).read_text())
+
+def load_cfg(path="configs/base.yaml"):
+    # parsed once per file version; stages run in one process (cli.main --in-memory) share it
+    p = Path(path)
+    return copy.deepcopy(_parse_cfg(str(p.resolve()), p.stat().st_mtime_ns))
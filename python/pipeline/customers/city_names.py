@@ -1,11 +1,16 @@
 import re
 import pandas as pd
 
+from pipeline.text import map_unique
+
 COUNTRY_TAIL_RE = re.compile(r'(?:,\s*)?(Denmark|Danmark|Sweden|Sverige|Norway|Norge|Finland|Suomi)\s*$', re.IGNORECASE)
 LEADING_POSTAL_RE = re.compile(r'^(?:[A-Z]{1,3}[-\s])?\d{2,3}\s?\d{2,3}\s+|^(?:[A-Z]{1,3}[-\s])?\d{3,6}\s+', re.IGNORECASE)
 DIGITS_ANYWHERE_RE = re.compile(r'\d+')
 
 def clean_city_series(s: pd.Series) -> pd.Series:
+    return map_unique(s, _clean_city, vectorized=True, memo=True)
+
+def _clean_city(s: pd.Series) -> pd.Series:
     s = s.astype("string").fillna("Unknown")
     s = s.str.replace(r"\s+", " ", regex=True).str.strip(" ,")
     s = s.mask(s.eq(""), "Unknown")
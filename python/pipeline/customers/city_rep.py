@@ -1,20 +1,12 @@
 import pandas as pd
 
-def _mode_or_first(s: pd.Series):
-    s = s.dropna()
-    if s.empty:
-        return pd.NA
-    # Most frequent; ties resolved by first appearance in value_counts order
-    return s.value_counts().idxmax()
+from pipeline.aggregate import group_mode
 
 def build_shopuser_city(
     customers: pd.DataFrame, *, id_col="shopUserId", city_col="invoiceCity"
 ) -> pd.Series:
-    return (
-        customers.groupby(id_col, dropna=False)[city_col]
-        .agg(_mode_or_first)
-        .astype("string")
-    )
+    # most frequent city; ties go to the one the customer used first
+    return group_mode(customers, id_col, city_col, ties="first").sort_index().astype("string")
 
 def assign_city_to_transactions(
     tx: pd.DataFrame, cust_city: pd.Series, *, id_col="shopUserId",
@@ -0,0 +1,25 @@
+# per-row cleaning and per-customer dedup of the customer export; cli.customers runs both,
+# and pipeline.customers.incremental versions its state on everything they import
+import pandas as pd
+
+from pipeline.customers.name_last_name import clean_customer_name_fields
+from pipeline.customers.city_names import clean_city_series
+from pipeline.customers.city_rep import enrich_and_dedup_customers
+from pipeline.customers.ssn import derive_gender_age
+
+COUNTRY_NAMES = {58: "Denmark", 205: "Sweden", 160: "Norway", 72: "Finland"}
+
+def clean_rows(customers: pd.DataFrame) -> pd.DataFrame:
+    customers = clean_customer_name_fields(customers)
+    if "invoiceCity" in customers.columns:
+        customers["invoiceCity"] = clean_city_series(customers["invoiceCity"])
+    return customers
+
+def dedup_and_derive(customers: pd.DataFrame, birth_col: str | None = None) -> pd.DataFrame:
+    customers = enrich_and_dedup_customers(customers, id_col="shopUserId", city_col="invoiceCity")
+
+    num_id = pd.to_numeric(customers["invoiceCountryId"], errors="coerce")
+    customers["Country"] = num_id.map(COUNTRY_NAMES).fillna(customers["invoiceCountryId"]).astype(str)
+
+    return derive_gender_age(customers, ssn_col="invoiceSSN", country_col="invoiceCountryId",
+                             gender_col="Gender", age_col="Age", birth_col=birth_col)
@@ -0,0 +1,193 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+from pipeline.customers.ssn import gender_age_arrays
+
+# near-duplicate customers: same zip, names a typo apart ("Andersson"/"Andersón", "Kristina"/"Kristna").
+# Candidates come from blocks (zip + phonetic key of the last name, then zip + phonetic key of
+# the first name), never from all pairs; each block yields its pairs in bounded chunks that are
+# scored with a vectorized Levenshtein similarity. A pair is only a match when both sides
+# carry an SSN and the SSNs agree: names and a zip alone are not an identity. Matches are fed
+# to the identity index, which never splits, so a false match sticks until
+# --rebuild-identity: the rules lean towards missing a duplicate.
+
+#------keys------
+_FOLD = str.maketrans({"æ": "ae", "ø": "o", "ß": "ss", "þ": "th", "ð": "d", "ł": "l"})
+# soundex classes, with the Nordic spellings folded first (c/k/q, w/v, z/s sound alike)
+_SOUNDEX = str.maketrans("abcdefghijklmnopqrstuvwxyz", "01230120022455012623010202")
+_FIRST = str.maketrans("cqwz", "kkvs")
+
+def fold(s: pd.Series) -> pd.Series:
+    """Lowercase ASCII letters only: diacritics stripped, æ/ø/ß spelled out."""
+    s = s.astype("string").str.lower().str.translate(_FOLD).str.normalize("NFKD")
+    return s.str.replace(r"[^a-z]", "", regex=True)
+
+def phonetic_key(folded: pd.Series) -> pd.Series:
+    """Soundex-style key of a folded name: first letter + up to three consonant classes."""
+    head = folded.str[:1].str.translate(_FIRST)
+    code = folded.str.replace(r"[hw]", "", regex=True).str.translate(_SOUNDEX)
+    code = code.str.replace(r"(\d)\1+", r"\1", regex=True).str[1:].str.replace("0", "", regex=False)
+    key = head + code.str[:3]
+    return key.mask(folded.str.len() == 0)
+
+def zip_key(s: pd.Series) -> pd.Series:
+    z = s.astype("string").str.replace(r"\s+", "", regex=True).str.upper()
+    return z.mask(z.str.len() == 0)
+
+def _per_value(s: pd.Series, fn) -> pd.Series:
+    # names repeat a lot: apply fn to each distinct value once
+    codes, uniq = pd.factorize(s)
+    out = fn(pd.Series(uniq, dtype="string")).to_numpy(dtype=object)
+    return pd.Series(np.where(codes >= 0, out[codes], None), index=s.index, dtype="string")
+
+#------similarity------
+def _codes(s: np.ndarray, width: int) -> np.ndarray:
+    # fixed-width code points, zero padded, one row per character position: (width, n) uint32
+    return np.asarray(s, dtype=f"<U{width}").view(np.uint32).reshape(len(s), width).T.copy()
+
+def levenshtein_sim(a: np.ndarray, b: np.ndarray, width: int = 24) -> np.ndarray:
+    """1 - edit distance / longer length, for each pair a[i], b[i] (strings cut at `width`).
+    Adjacent transpositions ("Nilsson"/"Nislson") count as one edit."""
+    dist, longest = levenshtein(a, b, width)
+    return 1.0 - dist / longest
+
+def levenshtein(a: np.ndarray, b: np.ndarray, width: int = 24) -> tuple[np.ndarray, np.ndarray]:
+    """Edit distance (optimal string alignment) of each pair a[i], b[i] and the longer length
+    (at least 1)."""
+    n = len(a)
+    if n == 0:
+        return np.zeros(0, np.int16), np.ones(0, np.int64)
+    la = np.minimum(np.char.str_len(np.asarray(a, dtype=str)), width)
+    lb = np.minimum(np.char.str_len(np.asarray(b, dtype=str)), width)
+    wa, wb = max(int(la.max()), 1), max(int(lb.max()), 1)
+    ca, cb = _codes(a, width)[:wa], _codes(b, width)[:wb]
+    # DP table rows are characters of b, each vectorized over all pairs; one pass per character of a
+    cols = np.arange(n)
+    prev = np.repeat(np.arange(wb + 1, dtype=np.int16)[:, None], n, axis=1)
+    dist = prev[lb, cols].copy()
+    cur, before = np.empty_like(prev), np.empty_like(prev)   # before: the row ahead of prev
+    for i in range(1, wa + 1):
+        cur[0] = i
+        np.minimum(prev[:-1] + (cb != ca[i - 1]), prev[1:] + 1, out=cur[1:])
+        if i > 1 and wb > 1:  # a[i-2:i] == b[j-1], b[j-2]
+            swap = (cb[:-1] == ca[i - 1]) & (cb[1:] == ca[i - 2])
+            np.minimum(cur[2:], np.where(swap, before[:-2] + 1, cur[2:]), out=cur[2:])
+        for j in range(1, wb + 1):  # insertions run along b
+            np.minimum(cur[j], cur[j - 1] + 1, out=cur[j])
+        done = la == i
+        dist[done] = cur[lb[done], cols[done]]
+        before, prev, cur = prev, cur, before
+    return dist, np.maximum(np.maximum(la, lb), 1)
+
+#------identity------
+def ssn_key(ssn: pd.Series) -> np.ndarray:
+    """Last ten digits of an SSN ("" when it has fewer), so 19121212-1212 and 121212-1212 agree."""
+    digits = ssn.astype("string").str.replace(r"\D", "", regex=True).fillna("")
+    return digits.str[-10:].where(digits.str.len() >= 10, "").to_numpy(dtype=object)
+
+def _conflict(x: np.ndarray, a: np.ndarray, b: np.ndarray, missing) -> np.ndarray:
+    # both sides known and different
+    return (x[a] != x[b]) & (x[a] != missing) & (x[b] != missing)
+
+#------candidates------
+def _block_codes(*keys: pd.Series) -> np.ndarray:
+    # dense code per distinct combination of keys, -1 where any key is missing
+    codes = np.zeros(len(keys[0]), dtype=np.int64)
+    missing = np.zeros(len(codes), dtype=bool)
+    for k in keys:
+        c, uniq = pd.factorize(k)
+        codes = codes * (len(uniq) + 1) + c
+        missing |= c < 0
+    return np.where(missing, -1, pd.factorize(codes)[0])
+
+def _block_pairs(codes: np.ndarray, max_block: int, chunk_pairs: int):
+    """Yield (left, right) row positions of all pairs sharing a block code, at most ~chunk_pairs at a time."""
+    rows = np.flatnonzero(codes >= 0)
+    rows = rows[np.argsort(codes[rows], kind="stable")]
+    c = codes[rows]
+    starts = np.flatnonzero(np.r_[True, c[1:] != c[:-1]])
+    sizes = np.diff(np.r_[starts, len(c)])
+    size = np.repeat(sizes, sizes)
+    pos = np.arange(len(c)) - np.repeat(starts, sizes)
+    partners = np.where((size > 1) & (size <= max_block), size - 1 - pos, 0)
+    cum = np.cumsum(partners)
+    lo = 0
+    while lo < len(rows):
+        base = cum[lo - 1] if lo else 0
+        hi = max(int(np.searchsorted(cum, base + chunk_pairs, side="right")), lo + 1)
+        k = partners[lo:hi]
+        left = np.repeat(np.arange(lo, hi), k)
+        offset = np.arange(len(left)) - np.repeat(cum[lo:hi] - k - base, k)
+        if len(left):
+            yield rows[left], rows[left + 1 + offset]
+        lo = hi
+
+def fuzzy_duplicates(
+    customers: pd.DataFrame,
+    *,
+    id_col: str = "shopUserId",
+    first_col: str = "invoiceFirstName",
+    last_col: str = "invoiceLastName",
+    zip_col: str = "invoiceZip",
+    ssn_col: str = "invoiceSSN",
+    country_col: str = "invoiceCountryId",
+    threshold: float = 0.85,
+    min_field: float = 0.7,
+    max_last_edits: int = 1,
+    only: pd.Series | None = None,
+    max_block: int = 500,
+    chunk_pairs: int = 1_000_000,
+) -> tuple[pd.DataFrame, dict]:
+    """Pairs of ids in the same zip whose names are within typo distance.
+
+    score is the mean Levenshtein similarity of the folded first and last names; a pair
+    matches when score >= threshold, neither name is below min_field, the last names are
+    at most max_last_edits edits apart, both sides have an SSN (ssn_key) and the SSNs and the
+    birth dates they encode agree. Name matches lacking an SSN on either side are counted
+    in "no_ssn", ones whose SSNs or birth dates disagree in "conflicts". With `only` (a
+    boolean mask over customers) a pair needs at least one side in it, so a nightly run
+    only scores pairs that involve new or changed customers. Blocks larger than max_block
+    (shared placeholder names) are skipped. Returns (id_a, id_b, score) and counts."""
+    ids = customers[id_col].astype("string").to_numpy(dtype=object)
+    first = _per_value(customers[first_col], fold).fillna("")
+    last = _per_value(customers[last_col], fold).fillna("")
+    z = _per_value(customers[zip_col], zip_key).mask(customers[id_col].isna().to_numpy())
+    keys = {"last": _per_value(last, phonetic_key), "first": _per_value(first, phonetic_key)}
+    blocks = {name: _block_codes(z, k) for name, k in keys.items()}
+    first, last = first.to_numpy(dtype=object), last.to_numpy(dtype=object)
+    ssn = ssn_key(customers[ssn_col])
+    _, _, born = gender_age_arrays(customers[ssn_col], customers[country_col], with_birth=True)
+    born = born.astype(np.int64)  # NaT is int64 min
+    pick = None if only is None else np.asarray(only, dtype=bool)
+    seen = []  # earlier blockings: a pair sharing all of one was scored there already
+    stats = {"rows": len(customers), "candidates": 0, "scored": 0, "conflicts": 0, "no_ssn": 0, "matches": 0}
+    out = []
+    for name, codes in blocks.items():
+        stats[f"skipped_blocks_{name}"] = int((np.bincount(codes[codes >= 0]) > max_block).sum())
+        for a, b in _block_pairs(codes, max_block, chunk_pairs):
+            stats["candidates"] += len(a)
+            keep = ids[a] != ids[b]
+            if pick is not None:
+                keep &= pick[a] | pick[b]
+            for prior in seen:
+                keep &= (prior[a] != prior[b]) | (prior[a] < 0)
+            a, b = a[keep], b[keep]
+            stats["scored"] += len(a)
+            s_first = levenshtein_sim(first[a], first[b])
+            d_last, n_last = levenshtein(last[a], last[b])
+            s_last = 1.0 - d_last / n_last
+            score = (s_first + s_last) / 2
+            hit = (score >= threshold) & (np.minimum(s_first, s_last) >= min_field) & (d_last <= max_last_edits)
+            conflict = _conflict(ssn, a, b, "") | _conflict(born, a, b, np.iinfo(np.int64).min)
+            stats["conflicts"] += int((hit & conflict).sum())
+            hit &= ~conflict
+            no_ssn = (ssn[a] == "") | (ssn[b] == "")
+            stats["no_ssn"] += int((hit & no_ssn).sum())
+            hit &= ~no_ssn
+            out.append(pd.DataFrame({"id_a": ids[a[hit]], "id_b": ids[b[hit]], "score": score[hit]}))
+        seen.append(codes)
+    pairs = (pd.concat(out, ignore_index=True) if out
+             else pd.DataFrame({"id_a": [], "id_b": [], "score": []}))
+    stats["matches"] = len(pairs)
+    return pairs, stats
@@ -0,0 +1,147 @@
+from __future__ import annotations
+from datetime import date
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline import sources
+from pipeline.customers.ssn import age_column, ages_from_birth
+
+# State for `cli.customers --incremental`, kept in <interim>:
+#   customers_rows.parquet  one row per distinct raw customer row: its hash, the columns the
+#                           name/city cleaners produced, and the canonical id it mapped to
+#   customers_base.parquet  the deduplicated customers before the age filter, with each
+#                           one's birth date, so ages can be moved to a new run date
+# Only canonical ids touched by a new, changed or removed raw row (or by a new merge) are
+# rebuilt; everyone else is copied from the base. The state is rebuilt from scratch when the
+# cleaning code changes or the year turns (Swedish YYMMDD SSNs resolve centuries by year).
+ROWS_FILE = "customers_rows.parquet"
+BASE_FILE = "customers_base.parquet"
+BIRTH_COL = "_birth"
+CLEANED = ("shopUserId", "invoiceFirstName", "invoiceLastName", "invoiceZip", "invoiceCity")
+# the state is versioned on every repo module these import (cleaners, dedup, SSN rules, ...)
+CLEANING = ("pipeline.customers.clean", "pipeline.customers.incremental")
+
+def code_version() -> str:
+    return sources.code_version(*CLEANING)
+
+def row_hashes(raw: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(raw, index=False).to_numpy()
+
+def _table(df: pd.DataFrame, schema: pa.Schema | None = None) -> pa.Table:
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+def _write(t: pa.Table, path: Path, meta: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    t = t.replace_schema_metadata({**(t.schema.metadata or {}), **{k: str(v) for k, v in meta.items()}})
+    tmp = path.with_name(path.name + ".tmp")
+    pq.write_table(t, tmp, compression="zstd")
+    tmp.replace(path)
+
+def _kept(base: pd.DataFrame, affected) -> np.ndarray:
+    # customers without an id are rebuilt every run
+    ids = base["shopUserId"]
+    return (ids.notna() & ~ids.isin(list(affected))).to_numpy()
+
+def load_state(interim: Path, today: date | None = None) -> dict | None:
+    """{"rows", "base", "tables"} from the last incremental run, or None when there is none or
+    it is stale. "tables" keeps the Arrow tables so save_state only converts what changed."""
+    today = today or date.today()
+    paths = {"rows": Path(interim) / ROWS_FILE, "base": Path(interim) / BASE_FILE}
+    if not all(p.exists() for p in paths.values()):
+        return None
+    meta = pq.read_schema(paths["base"]).metadata or {}
+    if meta.get(b"version", b"").decode() != code_version() or meta.get(b"year", b"").decode() != str(today.year):
+        print("customers state is from other code or another year; rebuilding")
+        return None
+    tables = {k: pq.read_table(p) for k, p in paths.items()}
+    return {
+        "rows": tables["rows"].to_pandas().set_index("row_hash"),
+        "base": tables["base"].to_pandas(),
+        "tables": tables,
+    }
+
+def save_state(interim: Path, rows: pd.DataFrame, base: pd.DataFrame, today: date | None = None,
+               prev: dict | None = None, fresh: pd.DataFrame | None = None, affected=()) -> None:
+    """Write the rows and base state. With the previous state, rows already in it and base
+    customers outside `affected` are copied from its Arrow tables; only the new rows and the
+    `fresh` (rebuilt) customers are converted from pandas."""
+    today = today or date.today()
+    meta = {"version": code_version(), "year": today.year}
+    if prev is None:
+        rows_t = _table(rows.reset_index())
+        base_t = _table(base.assign(Age=pd.to_numeric(base["Age"], errors="coerce").astype(float)))
+    else:
+        old_rows, old_base = prev["tables"]["rows"], prev["tables"]["base"]
+        pos = prev["rows"].index.get_indexer(rows.index)
+        known = pos >= 0
+        canonical = pa.array(rows["canonical"].to_numpy()[known], old_rows.schema.field("canonical").type, from_pandas=True)
+        kept_rows = old_rows.take(pos[known])
+        kept_rows = kept_rows.set_column(kept_rows.schema.get_field_index("canonical"), "canonical", canonical)
+        rows_t = pa.concat_tables([kept_rows, _table(rows[~known].reset_index(), old_rows.schema)])
+        kept = _kept(prev["base"], affected)
+        fresh = fresh.assign(Age=pd.to_numeric(fresh["Age"], errors="coerce").astype(float))
+        base_t = pa.concat_tables([old_base.filter(pa.array(kept)), _table(fresh, old_base.schema)])
+    _write(rows_t, Path(interim) / ROWS_FILE, meta)
+    _write(base_t, Path(interim) / BASE_FILE, meta)
+
+def reuse_cleaned(raw: pd.DataFrame, hashes: np.ndarray, rows: pd.DataFrame | None, clean) -> tuple[pd.DataFrame, np.ndarray]:
+    """raw with the CLEANED columns taken from `rows` for known hashes and from clean() for the
+    rest; returns it and the mask of rows that were reused."""
+    pos = rows.index.get_indexer(hashes) if rows is not None else np.full(len(raw), -1)
+    hit = pos >= 0
+    out = raw.copy()
+    fresh = clean(raw.loc[~hit])
+    for c in CLEANED:
+        if c not in out.columns:
+            continue
+        col = pd.Series(pd.NA, index=out.index, dtype=fresh[c].dtype)
+        col[~hit] = fresh[c].to_numpy()
+        if hit.any():
+            col[hit] = rows[c].to_numpy()[pos[hit]]
+        out[c] = col
+    return out, hit
+
+def affected_ids(canonical: pd.Series, hashes: np.ndarray, hit: np.ndarray, rows: pd.DataFrame | None) -> set:
+    """Canonical ids whose group has a new, changed or removed raw row, or gained a member by a merge."""
+    if rows is None:
+        return set(canonical.dropna())
+    pos = rows.index.get_indexer(hashes)
+    before = pd.Series(rows["canonical"].to_numpy()[pos[hit]], index=canonical.index[hit])
+    now = canonical[hit]
+    moved = now.ne(before).fillna(True).to_numpy()
+    ids = set(canonical[~hit].dropna()) | set(now[moved].dropna()) | set(before[moved].dropna())
+    removed = ~rows.index.isin(hashes)
+    return ids | set(rows.loc[removed, "canonical"].dropna())
+
+def new_rows_state(cleaned: pd.DataFrame, canonical: pd.Series, hashes: np.ndarray) -> pd.DataFrame:
+    """State row per distinct raw row: the cleaned columns before the id remap, and the remapped id."""
+    rows = cleaned[[c for c in CLEANED if c in cleaned.columns]].copy()
+    rows["canonical"] = canonical.to_numpy()
+    rows.index = pd.Index(hashes, name="row_hash")
+    return rows[~rows.index.duplicated()]
+
+def merge_base(base: pd.DataFrame, fresh: pd.DataFrame, affected, dtypes: pd.Series,
+               today: date | None = None) -> pd.DataFrame:
+    """Base customers outside `affected`, with ages moved to today, plus the rebuilt ones.
+    An id that disappeared (all its rows removed or merged away) is always in `affected`."""
+    kept = base[_kept(base, affected)]
+    age = ages_from_birth(kept[BIRTH_COL].to_numpy(dtype="datetime64[D]"), today)
+    known = ~np.isnat(kept[BIRTH_COL].to_numpy(dtype="datetime64[D]"))
+    kept = kept.assign(Age=np.where(known, age, kept["Age"].to_numpy(dtype=float)))
+    fresh = fresh.assign(Age=pd.to_numeric(fresh["Age"], errors="coerce").astype(float))
+    out = pd.concat([kept, fresh], ignore_index=True)
+    for c, t in dtypes.items():
+        if c in out.columns and out[c].dtype != t:
+            out[c] = out[c].astype(t)
+    out["Age"] = age_column(out["Age"].to_numpy(dtype=float))
+    return out
+
+def age_changed(before: pd.DataFrame, after: pd.DataFrame) -> set:
+    """Ids whose Age differs between two bases: birthdays since the last run, mostly."""
+    a, b = (f.dropna(subset=["shopUserId"]).set_index("shopUserId")["Age"] for f in (before, after))
+    a, b = pd.to_numeric(a, errors="coerce").astype(float).align(pd.to_numeric(b, errors="coerce").astype(float))
+    same = (a == b) | (a.isna() & b.isna())
+    return set(a.index[~same.to_numpy()])
@@ -1,6 +1,8 @@
 import re
 import pandas as pd
 
+from pipeline.text import map_unique
+
 _NULL_RE = re.compile(r"^(?:|nan|null|none|n/?a|n\.a\.|-|\.|0)$", re.IGNORECASE)
 
 def clean_series(s: pd.Series) -> pd.Series:
@@ -15,5 +17,6 @@ def clean_customer_name_fields(
     existing = [c for c in cols if c in out]
     if not existing:
         return out
-    out[existing] = out[existing].apply(clean_series)
+    for c in existing:
+        out[c] = map_unique(out[c], clean_series, vectorized=True)
     return out
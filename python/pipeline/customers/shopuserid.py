@@ -1,5 +1,8 @@
 from __future__ import annotations
+from pathlib import Path
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 def build_id_remap(
     customers: pd.DataFrame,
@@ -36,3 +39,138 @@ def apply_id_remap(df: pd.DataFrame, remap: pd.Series, *, id_col: str = "shopUse
     out = df.copy()
     out[id_col] = out[id_col].map(remap).fillna(out[id_col])
     return out
+
+#------persistent identity index------
+# Union-find over shopUserIds, kept between runs in <processed>/identity_index.npz as
+# integer arrays: node i is the i-th id ever seen (UTF-8 bytes + offsets), parent[i] its
+# union-find parent, seen (sorted) the hashes of every (node, key columns) pair seen so far;
+# key_hash/key_node (sorted by hash) map each (first, last, zip) hash to a node that had it.
+# Only rows with an unseen (id, key) pair are unioned each run, and merges chain: an id seen
+# under two keys joins both groups, and stays out of the delta while it keeps both. Roots
+# are always the earliest node, so the canonical id of a group is the first id seen for it,
+# as in build_id_remap. Groups never split; delete the file (cli.customers
+# --rebuild-identity) to start over.
+ID_INDEX_FILE = "identity_index.npz"
+KEY_COLS = ("invoiceFirstName", "invoiceLastName", "invoiceZip")
+
+def _empty_index(key_cols) -> dict:
+    return {
+        "ids": np.array([], dtype=object), "parent": np.array([], dtype=np.int32),
+        "seen": np.array([], dtype=np.uint64), "key_hash": np.array([], dtype=np.uint64),
+        "key_node": np.array([], dtype=np.int32), "key_cols": list(key_cols),
+    }
+
+def load_id_index(path: Path, key_cols: tuple[str, ...] = KEY_COLS) -> dict:
+    path = Path(path)
+    if not path.exists():
+        return _empty_index(key_cols)
+    z = np.load(path, allow_pickle=False)
+    if z["key_cols"].tolist() != list(key_cols):
+        print(f"identity index {path.name} was built on {z['key_cols'].tolist()}; rebuilding")
+        return _empty_index(key_cols)
+    offsets, data = z["id_offsets"], z["id_data"]
+    ids = pa.StringArray.from_buffers(len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(data))
+    return {
+        "ids": ids.to_numpy(zero_copy_only=False), "parent": z["parent"],
+        # files from before `seen` existed: every row is a delta once, unions are idempotent
+        "seen": z["seen"] if "seen" in z.files else np.array([], dtype=np.uint64),
+        "key_hash": z["key_hash"], "key_node": z["key_node"], "key_cols": list(key_cols),
+    }
+
+def save_id_index(index: dict, path: Path) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ids = pa.array(index["ids"], type=pa.string())
+    offsets = np.frombuffer(ids.buffers()[1], dtype=np.int32)[: len(ids) + 1]
+    data = np.frombuffer(ids.buffers()[2], dtype=np.uint8) if len(ids) else np.zeros(0, np.uint8)
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez(tmp, id_offsets=offsets, id_data=data[: offsets[-1]], parent=index["parent"],
+             seen=index["seen"], key_hash=index["key_hash"], key_node=index["key_node"],
+             key_cols=np.array(index["key_cols"]))
+    tmp.replace(path)
+
+def _roots(parent: np.ndarray) -> np.ndarray:
+    # pointer jumping until every node points at its root
+    root = parent.copy()
+    while True:
+        nxt = root[root]
+        if np.array_equal(nxt, root):
+            return root
+        root = nxt
+
+def update_id_index(index: dict, customers: pd.DataFrame, *, id_col: str = "shopUserId") -> dict:
+    """Fold new or changed customer rows into `index` (in place); returns counts."""
+    key_cols = index["key_cols"]
+    ids = customers[id_col].astype("string")
+    keep = ids.notna().to_numpy()
+    ids = ids[keep].to_numpy(dtype=object)
+    keys = customers.loc[keep, key_cols]
+    has_key = keys.notna().all(axis=1).to_numpy()
+    key_hash = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+    # nodes: existing ids keep theirs, unseen ids are appended in row order
+    known = pd.Index(index["ids"])
+    node = known.get_indexer(ids)
+    fresh = pd.unique(ids[node < 0])
+    n_old = len(index["ids"])
+    if len(fresh):
+        index["ids"] = np.concatenate([index["ids"], fresh])
+        index["parent"] = np.concatenate([index["parent"], np.arange(n_old, n_old + len(fresh), dtype=np.int32)])
+        node[node < 0] = n_old + pd.Index(fresh).get_indexer(ids[node < 0])
+
+    # the delta: rows whose (id, key columns) pair the index has not seen
+    pair = _pair_hash(node, key_hash)
+    delta = ~np.isin(pair, index["seen"])
+    index["seen"] = np.union1d(index["seen"], pair[delta])
+    sel = delta & has_key
+    d_node, d_key = node[sel], key_hash[sel]
+
+    # owner of each key: the node already registered for it, else its first row here
+    pos = np.searchsorted(index["key_hash"], d_key)
+    pos_ok = np.minimum(pos, max(len(index["key_hash"]) - 1, 0))
+    found = (pos < len(index["key_hash"])) & (index["key_hash"][pos_ok] == d_key) if len(index["key_hash"]) else np.zeros(len(d_key), bool)
+    owner = np.where(found, index["key_node"][pos_ok] if len(index["key_node"]) else -1, -1)
+    new_keys, first = np.unique(d_key[~found], return_index=True)
+    if len(new_keys):
+        owner[~found] = d_node[~found][first][np.searchsorted(new_keys, d_key[~found])]
+        kh = np.concatenate([index["key_hash"], new_keys])
+        kn = np.concatenate([index["key_node"], d_node[~found][first].astype(np.int32)])
+        order = np.argsort(kh, kind="stable")
+        index["key_hash"], index["key_node"] = kh[order], kn[order]
+
+    merged = _union(index, d_node[d_node != owner], owner[d_node != owner])
+    return {"ids": len(index["ids"]), "new": len(fresh), "changed": len(pd.unique(node[delta & (node < n_old)])),
+            "merged": merged, "delta_ids": pd.unique(ids[delta | (node >= n_old)])}
+
+def _pair_hash(node: np.ndarray, key_hash: np.ndarray) -> np.ndarray:
+    return pd.util.hash_pandas_object(pd.DataFrame({"node": node, "key": key_hash}), index=False).to_numpy()
+
+def _union(index: dict, a: np.ndarray, b: np.ndarray) -> int:
+    # union by smallest node, so a group's root is the earliest id seen for it
+    parent = index["parent"]
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    merged = 0
+    for x, y in zip(a.tolist(), b.tolist()):
+        rx, ry = find(x), find(y)
+        if rx != ry:
+            parent[max(rx, ry)] = min(rx, ry)
+            merged += 1
+    index["parent"] = _roots(parent)
+    return merged
+
+def union_id_pairs(index: dict, id_a, id_b) -> int:
+    """Merge the groups of each (id_a[i], id_b[i]) pair, e.g. fuzzy matches; ids must be indexed."""
+    known = pd.Index(index["ids"])
+    a, b = known.get_indexer(np.asarray(id_a, dtype=object)), known.get_indexer(np.asarray(id_b, dtype=object))
+    if (a < 0).any() or (b < 0).any():
+        raise KeyError("union_id_pairs: ids missing from the identity index; run update_id_index first")
+    return _union(index, a, b)
+
+def id_index_remap(index: dict) -> pd.Series:
+    """id -> canonical id for every id in the index; feed it to apply_id_remap."""
+    ids = index["ids"]
+    return pd.Series(ids[index["parent"]], index=pd.Index(ids), name="canonical", dtype="string")
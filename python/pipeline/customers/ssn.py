@@ -2,7 +2,10 @@
 from __future__ import annotations
 import re
 from datetime import date
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
 S = pd.StringDtype()
 COUNTRY_MAP = {"58": "DK", "160": "NO", "205": "SE", "72": "FI"}
@@ -96,9 +99,10 @@ def get_gender_age_from_ssn(ssn, country_id):
     age = _age_from_birthdate(_parse_birthdate(ssn_str, country))
     return gender, age
 
-def derive_gender_age(df: pd.DataFrame,
-                      *, ssn_col="invoiceSSN", country_col="invoiceCountryId",
-                      gender_col="Gender", age_col="Age") -> pd.DataFrame:
+def derive_gender_age_rowwise(df: pd.DataFrame,
+                              *, ssn_col="invoiceSSN", country_col="invoiceCountryId",
+                              gender_col="Gender", age_col="Age") -> pd.DataFrame:
+    # reference implementation (one get_gender_age_from_ssn call per row); see scripts/bench_ssn.py
     out = df.copy()
     out[[gender_col, age_col]] = out.apply(
         lambda r: pd.Series(get_gender_age_from_ssn(r[ssn_col], r[country_col])),
@@ -106,6 +110,159 @@ def derive_gender_age(df: pd.DataFrame,
     )
     return out
 
+#------vectorized------
+# Same rules as get_gender_age_from_ssn, evaluated per country mask on whole columns:
+# string work runs in Arrow compute kernels, the digits of each SSN become an int
+# matrix, and century, date validity and age are integer arithmetic. Rows with
+# non-ASCII characters go through the scalar parser: Python's \d, \w and strip()
+# are Unicode-aware, Arrow's (RE2) are ASCII-only, so on ASCII both agree.
+FI_RE = r"(?i)^(?P<dd>\d{2})(?P<mm>\d{2})(?P<yy>\d{2})(?P<cent>[-+A])\d{3}\w?$"
+ASCII_WS = " \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"   # what str.strip() removes in ASCII
+_DAYS = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+def _fixed_width(arr: pa.Array, width: int, side: str = "right") -> np.ndarray:
+    # first (side="right") or last (side="left") `width` chars of ASCII digit strings
+    # as an (n, width) int matrix, zero padded
+    if side == "right":
+        arr = pc.utf8_rpad(pc.utf8_slice_codeunits(arr, 0, width), width=width, padding="0")
+    else:
+        arr = pc.utf8_lpad(pc.utf8_slice_codeunits(arr, -width), width=width, padding="0")
+    arr = pa.concat_arrays([arr]) if isinstance(arr, pa.ChunkedArray) else arr
+    offsets = np.frombuffer(arr.buffers()[1], dtype=np.int32)[arr.offset:arr.offset + len(arr) + 1]
+    buf = np.frombuffer(arr.buffers()[2], dtype=np.uint8) if len(arr) else np.zeros(0, np.uint8)
+    return buf[offsets[0]:offsets[-1]].reshape(len(arr), width).astype(np.int64) - 48
+
+def _valid_date(y, m, d) -> np.ndarray:
+    leap = ((y % 4 == 0) & (y % 100 != 0)) | (y % 400 == 0)
+    mm = np.clip(m, 0, 12)
+    days = _DAYS[mm] + ((mm == 2) & leap)
+    return (y >= 1) & (y <= 9999) & (m >= 1) & (m <= 12) & (d >= 1) & (d <= days)
+
+def _age_on(y, m, d, valid, today: date) -> np.ndarray:
+    before = (today.month * 100 + today.day) < (m * 100 + d)
+    return np.where(valid, today.year - y - before, np.nan)
+
+def ages_from_birth(birth: np.ndarray, today: date | None = None) -> np.ndarray:
+    """Age on `today` (float, NaN = unknown) from datetime64[D] birth dates (NaT = unknown)."""
+    today = today or date.today()
+    birth = np.asarray(birth, dtype="datetime64[D]")
+    months = birth.astype("datetime64[M]")
+    y = birth.astype("datetime64[Y]").astype(np.int64) + 1970
+    m = months.astype(np.int64) % 12 + 1
+    d = (birth - months.astype("datetime64[D]")).astype(np.int64) + 1
+    return _age_on(y, m, d, ~np.isnat(birth), today)
+
+def gender_age_arrays(ssn: pd.Series, country_id: pd.Series, today: date | None = None, *,
+                      with_birth: bool = False):
+    """(gender, age) as an object array of "Male"/"Female"/None and a float array (NaN = unknown).
+    with_birth=True also returns the datetime64[D] birth dates (NaT where unknown, and for
+    the rare non-ASCII SSNs, whose age comes from the scalar parser)."""
+    today = today or date.today()
+    n = len(ssn)
+    gender_digit = np.full(n, -1)
+    y, m, d = np.zeros(n, np.int64), np.zeros(n, np.int64), np.zeros(n, np.int64)
+    has_date = np.zeros(n, bool)
+
+    raw = pa.array(ssn.astype("string").to_numpy(dtype=object, na_value=None), type=pa.string())
+    country = country_id.astype(str).map(COUNTRY_MAP).to_numpy()
+    odd = pc.fill_null(pc.match_substring_regex(raw, r"[^\x00-\x7f]"), False).to_numpy(zero_copy_only=False)
+    ok = raw.is_valid().to_numpy(zero_copy_only=False) & ~odd
+    text = pc.if_else(pa.array(ok), pc.utf8_trim(raw, characters=ASCII_WS), "")
+    digits = pc.replace_substring_regex(text, r"\D", "")
+    L = pc.utf8_length(digits).to_numpy(zero_copy_only=False)
+    head = _fixed_width(digits, 12)
+    tail = _fixed_width(digits, 2, side="left")
+    num2 = lambda i: head[:, i] * 10 + head[:, i + 1]
+
+    def put(mask, yy, mm, dd):
+        y[mask], m[mask], d[mask] = yy[mask], mm[mask], dd[mask]
+        has_date[mask] = True
+
+    # Sweden: YYYYMMDD-NNNN, or YYMMDD-NNNN where "+" marks someone 100 or older
+    se = ok & (country == "SE")
+    se12, se10 = se & (L >= 12), se & (L >= 10) & (L < 12)
+    put(se12, head[:, 0] * 1000 + head[:, 1] * 100 + num2(2), num2(4), num2(6))
+    yy = num2(0)
+    has = lambda ch: pc.match_substring(text, ch).to_numpy(zero_copy_only=False)
+    plus = has("+") & ~has("-")
+    cutoff = today.year - 100
+    year_plus = np.where(1900 + yy <= cutoff, 1900 + yy, 1800 + yy)
+    year_dash = np.where(1900 + yy > cutoff, 1900 + yy, 2000 + yy)
+    put(se10, np.where(plus, year_plus, year_dash), num2(2), num2(4))
+    gender_digit[se & (L >= 10)] = tail[se & (L >= 10), 0]
+
+    # Norway: DDMMYYIIIKK, century from the individual number III; D-numbers add 40 to DD
+    no = ok & (country == "NO") & (L == 11)
+    dd, yy = num2(0), num2(4)
+    dd = np.where(dd > 40, dd - 40, dd)
+    ind = head[:, 6] * 100 + head[:, 7] * 10 + head[:, 8]
+    year = np.select(
+        [ind <= 499, (ind >= 500) & (ind <= 749) & (yy >= 54), (ind >= 500) & (yy <= 39), (ind >= 900) & (yy >= 40)],
+        [1900 + yy, 1800 + yy, 2000 + yy, 1900 + yy],
+        np.where(yy <= 24, 2000 + yy, 1900 + yy),
+    )
+    put(no, year, num2(2), dd)
+    gender_digit[no] = head[no, 8]
+
+    # Denmark: DDMMYY-NNNN
+    dk = ok & (country == "DK") & (L >= 10)
+    year_24 = np.where(yy <= 24, 2000 + yy, 1900 + yy)
+    put(dk, year_24, num2(2), num2(0))
+    gender_digit[dk] = tail[dk, 1]
+
+    # Finland: DDMMYYCNNNX with century sign C, else the Danish-style fallback
+    fi = ok & (country == "FI")
+    fi_re = np.zeros(n, bool)
+    if fi.any():
+        idx = np.flatnonzero(fi)
+        parts = pc.extract_regex(text.take(pa.array(idx)), FI_RE)
+        hit = parts.is_valid().to_numpy(zero_copy_only=False)
+        fi_re[idx[hit]] = True
+        field = lambda k: pc.struct_field(parts, k).filter(pa.array(hit))
+        cent = pc.utf8_upper(field("cent")).to_numpy(zero_copy_only=False)
+        base = np.select([cent == "+", cent == "-"], [1800, 1900], 2000)
+        to_int = lambda k: pc.cast(field(k), pa.int64()).to_numpy(zero_copy_only=False)
+        y[idx[hit]] = base + to_int("yy")
+        m[idx[hit]], d[idx[hit]] = to_int("mm"), to_int("dd")
+        has_date[idx[hit]] = True
+    fi_10 = fi & ~fi_re & (L >= 10)
+    put(fi_10, year_24, num2(2), num2(0))
+    gender_digit[fi_re | fi_10] = head[fi_re | fi_10, 8]
+
+    valid = has_date & _valid_date(y, m, d)
+    age = _age_on(y, m, d, valid, today)
+    gender = np.where(gender_digit < 0, None, np.where(gender_digit % 2 == 1, "Male", "Female")).astype(object)
+
+    for i in np.flatnonzero(odd):
+        gender[i], a = get_gender_age_from_ssn(ssn.iat[i], country_id.iat[i])
+        age[i] = np.nan if a is None else a
+    if with_birth:
+        birth = np.full(n, np.datetime64("NaT"), dtype="datetime64[D]")
+        yv, mv, dv = y[valid], m[valid], d[valid]
+        birth[valid] = ((yv - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (mv - 1)).astype("datetime64[D]") + (dv - 1)
+        return gender, age, birth
+    return gender, age
+
+def derive_gender_age(df: pd.DataFrame,
+                      *, ssn_col="invoiceSSN", country_col="invoiceCountryId",
+                      gender_col="Gender", age_col="Age", birth_col: str | None = None) -> pd.DataFrame:
+    out = df.copy()
+    gender, age, birth = gender_age_arrays(out[ssn_col], out[country_col], with_birth=True)
+    out[gender_col] = gender
+    if birth_col:
+        out[birth_col] = birth
+    out[age_col] = age_column(age)
+    return out
+
+def age_column(age: np.ndarray) -> np.ndarray:
+    # the dtypes the row-wise version ended up with: int64 when every age is known,
+    # float64 with NaN when some are, None objects when none is
+    if len(age) and np.isnan(age).all():
+        return np.full(len(age), None, dtype=object)
+    if len(age) and not np.isnan(age).any():
+        return age.astype(np.int64)
+    return age
+
 def filter_age_range(df: pd.DataFrame, *, age_col="Age", lo=10, hi=105) -> pd.DataFrame:
     mask = df[age_col].isna() | ((df[age_col] >= lo) & (df[age_col] <= hi))
     return df.loc[mask].reset_index(drop=True)
@@ -0,0 +1,151 @@
+# SEK exchange rates for articles.price and transactions.currency, fetched from frankfurter.app
+# into a dated on-disk history so a run makes at most one request and works offline
+
+#------imports------
+from __future__ import annotations
+from datetime import date, timedelta
+from pathlib import Path
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+
+#------store------
+# <interim>/fx_rates.parquet: one row per ECB business day, SEK per unit of each currency and
+# when it was fetched. The latest rates are refetched once they are older than ttl_hours; with
+# PIPELINE_FX_OFFLINE=1 nothing is fetched and the stored history is used as is.
+FX_FILE = "fx_rates.parquet"
+CURRENCIES = ("EUR", "NOK", "DKK")
+# used only when the store is empty, the API cannot be reached and the caller allows it
+# (allow_fallback, or PIPELINE_FX_ALLOW_FALLBACK=1): prices from these rates are rough
+FALLBACK = {"EUR": 11.50, "NOK": 1.00, "DKK": 1.55}
+API = "https://api.frankfurter.app"
+
+def _offline() -> bool:
+    # read per call: cli.worker runs each job under its caller's environment
+    return os.environ.get("PIPELINE_FX_OFFLINE", "") not in ("", "0")
+
+def _allow_fallback() -> bool:
+    return os.environ.get("PIPELINE_FX_ALLOW_FALLBACK", "") not in ("", "0")
+
+def _empty() -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": pd.Series(dtype="datetime64[ns]"),
+        **{c: pd.Series(dtype="float64") for c in CURRENCIES},
+        "fetched": pd.Series(dtype="datetime64[ns, UTC]"),
+    })
+
+def load_history(store: Path | None) -> pd.DataFrame:
+    """Stored rates sorted by date (empty without a store)."""
+    if store is None or not Path(store).exists():
+        return _empty()
+    return pq.read_table(store).to_pandas().sort_values("date", ignore_index=True)
+
+def _save(store: Path, hist: pd.DataFrame) -> None:
+    store = Path(store)
+    store.parent.mkdir(parents=True, exist_ok=True)
+    tmp = store.with_name(store.name + ".tmp")
+    pq.write_table(pa.Table.from_pandas(hist, preserve_index=False), tmp, compression="zstd")
+    tmp.replace(store)
+
+#------fetch------
+def _fetch(path: str, timeout: float) -> pd.DataFrame:
+    """GET <API>/<path> (latest, a date or a start..end range) as SEK per EUR/NOK/DKK by date."""
+    resp = requests.get(f"{API}/{path}", params={"from": "EUR", "to": "SEK,NOK,DKK"}, timeout=timeout)
+    resp.raise_for_status()
+    data = resp.json()
+    # a single day answers {"date", "rates": {...}}, a range {"rates": {date: {...}}}
+    days = data["rates"] if "date" not in data else {data["date"]: data["rates"]}
+    rows = [
+        {"date": pd.Timestamp(d), "EUR": float(r["SEK"]),
+         "NOK": float(r["SEK"]) / float(r["NOK"]), "DKK": float(r["SEK"]) / float(r["DKK"])}
+        for d, r in days.items()
+    ]
+    out = pd.DataFrame(rows, columns=["date", *CURRENCIES])
+    out["fetched"] = pd.Timestamp.now(tz="UTC")
+    return out
+
+def _merge(hist: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    out = pd.concat([hist, new], ignore_index=True) if len(hist) else new
+    return out.drop_duplicates("date", keep="last").sort_values("date", ignore_index=True)
+
+def _update(store: Path | None, hist: pd.DataFrame, paths: list[str], timeout: float) -> pd.DataFrame:
+    # one request per path; a failed request leaves the history as it was
+    for path in paths:
+        try:
+            hist = _merge(hist, _fetch(path, timeout))
+        except (requests.RequestException, KeyError, ValueError) as e:
+            print(f"fx: could not fetch {path} ({type(e).__name__}); using stored rates")
+            return hist
+        if store is not None:
+            _save(store, hist)
+    return hist
+
+def _range(start: pd.Timestamp, end: pd.Timestamp) -> str:
+    return f"{start.date().isoformat()}..{end.date().isoformat()}"
+
+def _stale(hist: pd.DataFrame, ttl_hours: float) -> bool:
+    if not len(hist):
+        return True
+    return pd.Timestamp.now(tz="UTC") - hist["fetched"].max() > pd.Timedelta(hours=ttl_hours)
+
+#------rates------
+def sek_rates(store: Path | None = None, *, ttl_hours: float = 24, timeout: float = 10,
+              offline: bool | None = None, allow_fallback: bool | None = None) -> dict[str, float | str]:
+    """Latest SEK per unit of EUR, NOK and DKK, plus "asof" (the rate date, or "fallback").
+
+    Fetched only when the store has nothing younger than ttl_hours; offline (default
+    PIPELINE_FX_OFFLINE) never fetches. When no rate is available this raises, unless
+    allow_fallback (default PIPELINE_FX_ALLOW_FALLBACK) permits FALLBACK."""
+    offline = _offline() if offline is None else offline
+    allow_fallback = _allow_fallback() if allow_fallback is None else allow_fallback
+    hist = load_history(store)
+    if not offline and _stale(hist, ttl_hours):
+        hist = _update(store, hist, ["latest"], timeout)
+    if not len(hist):
+        if not allow_fallback:
+            raise RuntimeError(f"fx: no stored rates in {store} and none could be fetched"
+                               f"{' (PIPELINE_FX_OFFLINE is set)' if offline else ''}; rerun online, "
+                               f"or pass --allow-fallback-fx to price with the fixed FALLBACK rates")
+        print("fx: no stored or fetched rates; using fallback rates")
+        return {**FALLBACK, "asof": "fallback"}
+    last = hist.iloc[-1]
+    return {**{c: float(last[c]) for c in CURRENCIES}, "asof": last["date"].date().isoformat()}
+
+def sek_rate_history(start, end, store: Path | None = None, *, ttl_hours: float = 24, timeout: float = 10,
+                     offline: bool | None = None) -> pd.DataFrame:
+    """Daily rates (date, EUR, NOK, DKK) covering start..end, fetching only the days the
+    store is missing: before its first date, and after its last once that is ttl_hours old."""
+    offline = _offline() if offline is None else offline
+    start, end = pd.Timestamp(start).normalize(), min(pd.Timestamp(end).normalize(), pd.Timestamp(date.today()))
+    hist = load_history(store)
+    if not offline and start <= end:
+        if not len(hist):
+            paths = [_range(start, end)]
+        else:
+            first, last = hist["date"].iloc[0], hist["date"].iloc[-1]
+            paths = [_range(start, first - timedelta(days=1))] if start < first else []
+            if end > last and _stale(hist, ttl_hours):
+                paths.append(_range(last + timedelta(days=1), end))
+        hist = _update(store, hist, paths, timeout)
+    return hist[["date", *CURRENCIES]]
+
+def rates_asof(dates: pd.Series, hist: pd.DataFrame, currency: pd.Series) -> np.ndarray:
+    """SEK per unit of `currency` (EUR/NOK/DKK/SEK, NA = unknown) on each of `dates`: the last
+    rate on or before the date, or the first one for dates before the history. Vectorized
+    as-of lookup with searchsorted; NaN where the currency or date is unknown or hist is empty."""
+    out = np.full(len(dates), np.nan)
+    cur = currency.astype("string").to_numpy(dtype=object, na_value=None)
+    out[cur == "SEK"] = 1.0
+    if not len(hist):
+        return out
+    d = pd.to_datetime(dates, errors="coerce").to_numpy(dtype="datetime64[ns]")
+    pos = np.searchsorted(hist["date"].to_numpy(dtype="datetime64[ns]"), d, side="right") - 1
+    pos = np.clip(pos, 0, len(hist) - 1)
+    known = ~np.isnat(d)
+    for c in CURRENCIES:
+        m = known & (cur == c)
+        out[m] = hist[c].to_numpy()[pos[m]]
+    return out
@@ -0,0 +1,94 @@
+# global int32 codes for groupId, shopUserId and orderId, shared by every stage that builds
+# matrices or joins on them; strings are restored only when a stage writes its output
+
+#------imports------
+from __future__ import annotations
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from pipeline.io import artifact_exists, read_table, write_parquet
+
+#------store------
+# <processed>/id_dictionary.parquet: one row per (kind, id) with its int32 code. Codes are
+# dense per kind (0..n-1) and append-only: an id keeps its code across runs and unseen ids
+# get the next codes, so codes held by an earlier run stay valid. cli.ids builds it after
+# cleaning; delete the file (cli.ids --rebuild) to renumber from scratch. A vocabulary is
+# an Arrow string array whose i-th id has code i.
+ID_FILE = "id_dictionary.parquet"
+KINDS = ("groupId", "shopUserId", "orderId")
+
+def load_ids(processed_dir: Path, kinds: tuple[str, ...] = KINDS) -> dict[str, pa.Array]:
+    """Vocabulary per kind (empty without a dictionary)."""
+    path = Path(processed_dir) / ID_FILE
+    if not artifact_exists(path):
+        return {k: pa.array([], type=pa.string()) for k in kinds}
+    table = read_table(path, columns=["kind", "id", "code"], filters=[("kind", "in", list(kinds))])
+    kind = table["kind"].cast(pa.string())
+    out = {}
+    for k in kinds:
+        part = table.filter(pc.equal(kind, k))
+        part = part.take(pc.sort_indices(part["code"]))
+        if not np.array_equal(part["code"].to_numpy(), np.arange(part.num_rows)):
+            raise ValueError(f"{path.name}: {k} codes are not 0..{part.num_rows - 1}; rebuild it with cli.ids --rebuild")
+        out[k] = part["id"].combine_chunks().cast(pa.string())
+    return out
+
+def update_ids(vocab: dict[str, pa.Array], values: dict[str, pa.Array | pd.Series]) -> dict[str, int]:
+    """Append ids of `values` (kind -> ids) missing from `vocab` (in place); returns new ids per kind."""
+    new = {}
+    for k, v in values.items():
+        known = vocab.get(k, pa.array([], type=pa.string()))
+        ids = pc.unique(_arrow(v).cast(pa.string())).drop_null()
+        fresh = ids.filter(pc.is_null(pc.index_in(ids, value_set=known)))
+        vocab[k] = pa.concat_arrays([known, fresh]) if len(fresh) else known
+        new[k] = len(fresh)
+    return new
+
+def save_ids(processed_dir: Path, vocab: dict[str, pa.Array]) -> Path:
+    path = Path(processed_dir) / ID_FILE
+    table = pa.concat_tables([
+        pa.table({"kind": pa.array([k] * len(v), type=pa.string()), "id": v,
+                  "code": pa.array(np.arange(len(v), dtype=np.int32))})
+        for k, v in vocab.items()
+    ])
+    write_parquet(table, path)
+    return path
+
+#------encode/decode------
+def _arrow(values) -> pa.Array | pa.ChunkedArray:
+    return values if isinstance(values, (pa.Array, pa.ChunkedArray)) else pa.array(values)
+
+def _codes(arr: pa.Array, vocab: pa.Array) -> np.ndarray:
+    """int64 codes of a plain or dictionary array; -1 where missing or unknown."""
+    if pa.types.is_dictionary(arr.type):
+        # only the dictionary is looked up; the indices pick from it (last slot: null)
+        lut = np.append(_codes(arr.dictionary, vocab), -1)
+        return lut[arr.indices.fill_null(len(lut) - 1).to_numpy(zero_copy_only=False)]
+    if pa.types.is_null(arr.type):
+        return np.full(len(arr), -1, dtype=np.int64)
+    if not pa.types.is_large_string(arr.type):
+        arr = arr.cast(pa.string())
+    codes = pc.index_in(arr, value_set=vocab if arr.type == vocab.type else vocab.cast(arr.type))
+    return codes.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+
+def encode(values, vocab: pa.Array, kind: str = "id") -> np.ndarray:
+    """int32 codes of `values` (a Series or an Arrow array); missing values become -1,
+    ids not in `vocab` raise."""
+    arr = _arrow(values)
+    chunks = arr.chunks if isinstance(arr, pa.ChunkedArray) else [arr]
+    codes = np.concatenate([_codes(c, vocab) for c in chunks]) if chunks else np.empty(0, np.int64)
+    valid = np.concatenate([c.is_valid().to_numpy(zero_copy_only=False) for c in chunks]) if chunks else np.empty(0, bool)
+    unknown = (codes < 0) & valid
+    if unknown.any():
+        sample = pd.unique(pa.chunked_array(chunks, type=arr.type).to_pandas()[unknown])[:5].tolist()
+        raise KeyError(f"{int(unknown.sum()):,} {kind} values are not in {ID_FILE} (e.g. {sample}); "
+                       f"rerun cli.ids after cleaning")
+    return codes.astype(np.int32)
+
+def decode(codes, vocab: pa.Array) -> np.ndarray:
+    """Ids (object array) of int `codes`; -1 becomes None."""
+    codes = np.asarray(codes, dtype=np.int64)
+    return pc.take(vocab, pa.array(codes, mask=codes < 0)).to_numpy(zero_copy_only=False)
@@ -2,17 +2,693 @@
 
 #------imports------
 from pathlib import Path
-import pandas as pd, yaml
+import csv, itertools, shutil
+from urllib.parse import quote
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
-#------load config------
-def load_cfg(path="configs/base.yaml"):
-    return yaml.safe_load(Path(path).read_text())
+from pipeline.telemetry import note
 
 #------read csv as str------
 def read_csv_str(path: Path) -> pd.DataFrame:
     return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[])
 
+#------parquet writer policy------
+# Layout per artifact (keyed by file stem). Rows are stably sorted on `sort_by` so each
+# row group covers a narrow key range and its min/max statistics let filtered reads
+# (pd.read_parquet(..., filters=...)) skip the rest. pyarrow cannot write bloom filters,
+# so sorted row groups + statistics + the page index do the pruning instead.
+# partition_by makes the artifact a hive-partitioned directory (see partitioned datasets).
+PARQUET_DEFAULT = {
+    "compression": "zstd",
+    "compression_level": 3,
+    "row_group_size": 128_000,
+    "sort_by": [],
+    "dictionary": True,
+    "partition_by": [],
+}
+PARQUET_POLICY: dict[str, dict] = {
+    "transactions_clean": {
+        "sort_by": ["groupId", "shopUserId"],
+        "row_group_size": 64_000,
+        "dictionary": ["groupId", "shopUserId", "orderId", "sku", "currencyId",
+                       "type", "category", "brand", "audience", "audienceId", "Gender"],
+        "partition_by": ["country", "year_month"],
+    },
+    "transactions_canonical": {"sort_by": ["shopUserId", "orderId"], "row_group_size": 64_000},
+    "customers_clean": {"sort_by": ["shopUserId"]},
+    "articles_for_recs": {"sort_by": ["groupId"]},
+    "order_items": {"row_group_size": 64_000},
+    "id_dictionary": {"sort_by": ["kind", "code"], "dictionary": ["kind"]},
+}
+
+def parquet_policy(artifact: str) -> dict:
+    return {**PARQUET_DEFAULT, **PARQUET_POLICY.get(artifact, {})}
+
+def _sort_table(table: pa.Table, keys: list[str]) -> pa.Table:
+    # sort on decoded values: dictionary columns can't be sorted directly
+    keys = [k for k in keys if k in table.column_names]
+    if not keys or table.num_rows == 0:
+        return table
+    cols = {k: table[k].cast(pa.string()) if pa.types.is_dictionary(table[k].type) else table[k] for k in keys}
+    order = pc.sort_indices(pa.table(cols), sort_keys=[(k, "ascending") for k in keys], null_placement="at_end")
+    return table.take(order)
+
+def _sort_keys(policy: dict) -> list[str]:
+    # partition keys first keeps each partition's rows contiguous for the dataset writer
+    return policy["partition_by"] + policy["sort_by"]
+
+#------processed artifact types------
+# Canonical column types of the processed artifacts. write_parquet (and write_parquet_chunks)
+# casts a frame to them once, so stages read ids back trimmed and dates parsed instead of
+# re-normalizing them with .astype(str).str.strip() / pd.to_datetime:
+#   "id"        trimmed Arrow-backed string (string[pyarrow])
+#   "string"    Arrow-backed string
+#   "category"  dictionary-encoded string; only for labels no stage fills or edits in place
+#   "datetime"  timestamp (unparseable values become NaT)
+#   otherwise   a pandas numeric dtype, for exact downcasts ("int32", "Int32", ...)
+# Columns not listed keep their type. The read_* helpers return strings as string[pyarrow].
+ARTIFACT_TYPES: dict[str, dict[str, str]] = {
+    "transactions_canonical": {
+        "orderId": "id", "orderLineId": "id", "shopUserId": "id", "sku": "id", "groupId": "id",
+        "created": "datetime", "currencyId": "category", "type": "category",
+        "name": "string", "invoiceEmail": "string", "invoiceCity": "string",
+    },
+    "transactions_clean": {
+        "orderId": "id", "shopUserId": "id", "sku": "id", "groupId": "id",
+        "created": "datetime", "currencyId": "category", "type": "category",
+        "invoiceCity": "category", "Gender": "category",
+        "name": "string", "category": "string", "brand": "string",
+        "audience": "string", "audienceId": "string",
+        "quantity": "int32", "price_sek": "Int32",
+    },
+    "customers_clean": {
+        "shopUserId": "id", "invoiceCountryId": "category", "invoiceCity": "category",
+        "Country": "category", "Gender": "category",
+        "invoiceFirstName": "string", "invoiceLastName": "string", "invoiceSSN": "string",
+        "invoiceZip": "string", "invoiceEmail": "string",
+    },
+    "articles_clean": {
+        "sku": "id", "groupId": "id", "forSale": "category",
+        "brandId": "string", "name": "string", "brand": "string", "audience": "string",
+        "audienceId": "string", "category": "string", "categoryId": "string",
+    },
+    "articles_for_recs": {
+        "groupId": "id", "name": "string", "brand": "string", "audience": "string",
+        "audienceId": "string", "category": "string", "description": "string",
+    },
+    "orders": {
+        "customer_id": "id", "order_id": "id", "created": "datetime",
+        "country": "category", "city": "category", "order_type": "category",
+        "n_items": "Int32",
+    },
+    "order_items": {
+        "customer_id": "id", "order_id": "id", "sku": "id", "groupId": "id", "created": "datetime",
+        "country": "category", "city": "category", "type": "category",
+        "name": "string", "brand": "string", "category": "string",
+        "quantity": "Int32", "price_sek": "Int32",
+    },
+    "id_dictionary": {"kind": "category", "id": "id", "code": "int32"},
+}
+ARROW_STRING = pd.StringDtype("pyarrow")
+
+def conform_types(df: pd.DataFrame, artifact: str) -> pd.DataFrame:
+    """`df` with the ARTIFACT_TYPES of `artifact` (a shallow copy; df itself is untouched)."""
+    types = {c: t for c, t in ARTIFACT_TYPES.get(artifact, {}).items() if c in df.columns}
+    if not types:
+        return df
+    df = df.copy(deep=False)
+    for c, t in types.items():
+        s = df[c]
+        if t in ("id", "string"):
+            s = s if s.dtype == ARROW_STRING else s.astype(ARROW_STRING)
+            s = s.str.strip() if t == "id" else s
+        elif t == "category":
+            if not isinstance(s.dtype, pd.CategoricalDtype):
+                s = s.astype(ARROW_STRING).astype("category")
+        elif t == "datetime":
+            if not pd.api.types.is_datetime64_any_dtype(s.dtype):
+                s = pd.to_datetime(s, errors="coerce")
+        elif s.dtype != t:
+            s = (pd.to_numeric(s, errors="coerce") if s.dtype == object else s).astype(t)
+        df[c] = s
+    return df
+
+def _strings_to_arrow():
+    # pandas rebuilds "string" columns with the default storage; make that Arrow
+    return pd.option_context("mode.string_storage", "pyarrow")
+
+#------partitioned datasets------
+# An artifact whose policy has partition_by is written as a directory under its usual path,
+# <artifact>.parquet/country=Sweden/year_month=2025-01/part-0.parquet, with the rows of each
+# partition sorted on sort_by. Partition values are strings (null is __HIVE_DEFAULT_PARTITION__)
+# and come back as the last columns; filters on them skip whole directories.
+HIVE_NULL = "__HIVE_DEFAULT_PARTITION__"
+
+def _partitioning(policy: dict) -> ds.Partitioning:
+    return ds.partitioning(pa.schema([(c, pa.string()) for c in policy["partition_by"]]), flavor="hive")
+
+def _read_kwargs(path: Path) -> dict:
+    path = Path(path)
+    return {"partitioning": _partitioning(parquet_policy(path.stem))} if path.is_dir() else {}
+
+def _partitions_last(table: pa.Table, policy: dict) -> pa.Table:
+    parts = [c for c in policy["partition_by"] if c in table.column_names]
+    table = table.select([c for c in table.column_names if c not in parts] + parts)
+    for c in parts:
+        table = table.set_column(table.schema.get_field_index(c), c, table[c].cast(pa.string()))
+    return table
+
+def _dataset_options(schema: pa.Schema, policy: dict, sorted_: bool = True) -> dict:
+    files = pa.schema([f for f in schema if f.name not in policy["partition_by"]])
+    dictionary = policy["dictionary"]
+    if isinstance(dictionary, list):
+        dictionary = [c for c in dictionary if c in files.names]
+    sorting = [pq.SortingColumn(files.get_field_index(k)) for k in policy["sort_by"] if k in files.names and sorted_]
+    options = ds.ParquetFileFormat().make_write_options(
+        compression=policy["compression"],
+        compression_level=policy["compression_level"],
+        use_dictionary=dictionary,
+        write_statistics=True,
+        write_page_index=True,
+        sorting_columns=sorting or None,
+    )
+    return dict(format="parquet", partitioning=_partitioning(policy), file_options=options,
+                basename_template="part-{i}.parquet", max_rows_per_group=policy["row_group_size"],
+                preserve_order=True)
+
+def _remove(path: Path) -> None:
+    # a file or a directory left by an earlier (possibly interrupted) write
+    if path.is_dir():
+        shutil.rmtree(path)
+    else:
+        path.unlink(missing_ok=True)
+
+def _write_dataset(tables, path: Path, policy: dict, sorted_: bool = True) -> int:
+    # full rewrite from tables of one schema, each sorted on _sort_keys, as one stream (so a
+    # partition gets one file): written next to `path`, then the directories are swapped.
+    # sorted_=False for several tables, whose files are then only sorted per table
+    tmp, old = path.with_name(path.name + ".tmp"), path.with_name(path.name + ".old")
+    _remove(tmp)
+    tmp.mkdir(parents=True)
+    tables = iter(tables)
+    first = next(tables, None)
+    rows = 0
+    if first is not None:
+        def batches():
+            nonlocal rows
+            for table in itertools.chain([first], tables):
+                rows += table.num_rows
+                yield from table.to_batches()
+        ds.write_dataset(batches(), tmp, schema=first.schema, **_dataset_options(first.schema, policy, sorted_))
+    _remove(old)
+    if path.is_dir():
+        path.replace(old)
+    _remove(path)
+    tmp.replace(path)
+    _remove(old)
+    return rows
+
+def _partition_dir(policy: dict, key: tuple) -> str:
+    # the directory write_dataset puts a partition in (values are URI-encoded)
+    return "/".join(f"{c}={HIVE_NULL if v is None else quote(str(v), safe='')}"
+                    for c, v in zip(policy["partition_by"], key))
+
+def partition_keys(table: pa.Table, artifact: str) -> list[tuple]:
+    """Distinct partition values (in partition_by order) of the rows in `table`."""
+    parts = parquet_policy(artifact)["partition_by"]
+    if not parts or table.num_rows == 0:
+        return [()] if not parts else []
+    keys = table.select(parts).group_by(parts).aggregate([])
+    return list(zip(*(keys[c].cast(pa.string()).to_pylist() for c in parts)))
+
+def partition_filter(artifact: str, keys: list[tuple]) -> ds.Expression | None:
+    """Filter expression selecting the partitions `keys` of `artifact` (None = everything)."""
+    parts = parquet_policy(artifact)["partition_by"]
+    if not parts:
+        return None
+    expr = pc.scalar(False)
+    for key in keys:
+        term = pc.scalar(True)
+        for c, v in zip(parts, key):
+            term = term & (pc.field(c).is_null() if v is None else pc.field(c) == v)
+        expr = expr | term
+    return expr
+
+def write_partitions(table: pa.Table, path: Path, keys: list[tuple], artifact: str | None = None) -> None:
+    """Replace the partitions `keys` of an artifact with the rows of `table` (which must all
+    fall in them) and leave the others alone. Held, single-file and unpartitioned artifacts
+    are rewritten whole, with the rows outside `keys` taken from the current artifact."""
+    path = Path(path)
+    artifact = artifact or path.stem
+    policy = parquet_policy(artifact)
+    if _held is not None or not path.is_dir():
+        if artifact_exists(path):
+            current = _partitions_last(read_table(path), policy)
+            expr = partition_filter(artifact, keys)
+            rest = current.filter(pc.invert(expr)) if expr is not None else current.slice(0, 0)
+            table = pa.concat_tables([rest, _partitions_last(table, policy).select(rest.schema.names).cast(rest.schema)])
+        return write_parquet(table, path, artifact)
+    schema = ds.dataset(path, format="parquet", partitioning=_partitioning(policy)).schema
+    table = _partitions_last(table, policy).select(schema.names).cast(schema)
+    table = _sort_table(table, _sort_keys(policy))
+    # write the new partitions aside, then swap them in one directory at a time
+    tmp = path.with_name(path.name + ".tmp")
+    _remove(tmp)
+    ds.write_dataset(table, tmp, **_dataset_options(schema, policy))
+    for key in keys:
+        part, new = path / _partition_dir(policy, key), tmp / _partition_dir(policy, key)
+        _remove(part)
+        if new.is_dir():
+            part.parent.mkdir(parents=True, exist_ok=True)
+            new.replace(part)
+    _remove(tmp)
+    note("out", path, table.num_rows)
+
+#------in-memory artifacts------
+# While hold_in_memory() is active (cli.main --in-memory runs every stage in one process),
+# write_parquet keeps each artifact as its sorted Arrow table and writes the file only for
+# checkpoint artifacts; read_parquet serves held tables before touching disk.
+_held: dict[Path, pa.Table] | None = None
+_checkpoints: set[str] = set()
+
+def hold_in_memory(checkpoints) -> None:
+    """Start handing artifacts over in memory; `checkpoints` are file stems still written."""
+    global _held, _checkpoints
+    _held, _checkpoints = {}, set(checkpoints)
+
+def release(path: Path | None = None) -> None:
+    """Drop one held artifact, or (no path) all of them and leave in-memory mode."""
+    global _held
+    if path is None:
+        _held = None
+    elif _held is not None:
+        _held.pop(Path(path).resolve(), None)
+
+def artifact_exists(path: Path) -> bool:
+    path = Path(path)
+    return (_held is not None and path.resolve() in _held) or path.exists()
+
+# pandas' dtype_backend="numpy_nullable" mapping, for held tables
+_NULLABLE = {
+    pa.int8(): pd.Int8Dtype(), pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(), pa.uint8(): pd.UInt8Dtype(), pa.uint16(): pd.UInt16Dtype(),
+    pa.uint32(): pd.UInt32Dtype(), pa.uint64(): pd.UInt64Dtype(), pa.bool_(): pd.BooleanDtype(),
+    pa.float32(): pd.Float32Dtype(), pa.float64(): pd.Float64Dtype(),
+    pa.string(): pd.StringDtype(), pa.large_string(): pd.StringDtype(),
+}
+
+def _held_to_pandas(table: pa.Table, columns=None, filters=None, dtype_backend=None) -> pd.DataFrame:
+    # same result as reading the file back: filter, project, then the pandas conversion
+    if filters:
+        table = table.filter(pq.filters_to_expression(filters))
+    if columns is not None:
+        table = table.select(list(columns))
+    if dtype_backend == "numpy_nullable":
+        return table.to_pandas(types_mapper=_NULLABLE.get)
+    if dtype_backend == "pyarrow":
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return table.to_pandas()
+
 #------write parquet------
-def write_parquet(df, path: Path):
+def write_parquet(df, path: Path, artifact: str | None = None):
+    """Write `df` (a DataFrame or an Arrow table) with the PARQUET_POLICY of `artifact`
+    (default: the file stem); a DataFrame is cast to its ARTIFACT_TYPES first."""
+    path = Path(path)
+    policy = parquet_policy(artifact or path.stem)
+    if not isinstance(df, pa.Table):  # tables are taken as already typed
+        df = pa.Table.from_pandas(conform_types(df, artifact or path.stem), preserve_index=False)
+    table = _sort_table(_partitions_last(df, policy), _sort_keys(policy))
+    if _held is not None:
+        _held[path.resolve()] = table
+        if (artifact or path.stem) not in _checkpoints:
+            note("out", path, table.num_rows)
+            return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if policy["partition_by"]:
+        _write_dataset([table], path, policy)
+        note("out", path, table.num_rows)
+        return
+    if path.is_dir():
+        shutil.rmtree(path)  # was partitioned under an older policy
+    dictionary = policy["dictionary"]
+    if isinstance(dictionary, list):
+        dictionary = [c for c in dictionary if c in table.column_names]
+    sorting = [pq.SortingColumn(table.schema.get_field_index(k)) for k in policy["sort_by"] if k in table.column_names]
+    pq.write_table(
+        table, path,
+        compression=policy["compression"],
+        compression_level=policy["compression_level"],
+        row_group_size=policy["row_group_size"],
+        use_dictionary=dictionary,
+        write_statistics=True,
+        write_page_index=True,
+        sorting_columns=sorting or None,
+    )
+    note("out", path, table.num_rows)
+
+#------chunked parquet------
+def iter_parquet_batches(path: Path, batch_size: int = 250_000, columns: list[str] | None = None):
+    """read_parquet in frames of at most batch_size rows, so a stage can stream an artifact.
+    Serves held tables like read_parquet; the read counts once, when the stream is exhausted."""
+    held = _held.get(Path(path).resolve()) if _held is not None else None
+    if held is not None:
+        batches = (held.select(columns) if columns is not None else held).to_batches(max_chunksize=batch_size)
+    elif Path(path).is_dir():
+        dataset = ds.dataset(path, format="parquet", **_read_kwargs(path))
+        batches = dataset.to_batches(columns=columns, batch_size=batch_size)
+    else:
+        batches = pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns)
+    # the scanners stop batches at row group (and file) ends: regroup to batch_size rows
+    rows, buf, buffered = 0, [], 0
+    for batch in batches:
+        rows += batch.num_rows
+        buf.append(batch)
+        buffered += batch.num_rows
+        if buffered >= batch_size:
+            table = pa.Table.from_batches(buf)
+            with _strings_to_arrow():
+                df = table.slice(0, batch_size).to_pandas()
+            yield df
+            rest = table.slice(batch_size)
+            buf, buffered = rest.to_batches(), rest.num_rows
+    if buffered:
+        with _strings_to_arrow():
+            df = pa.Table.from_batches(buf).to_pandas()
+        yield df
+    note("in", path, rows)
+
+def _conformed(chunks, artifact: str, policy: dict):
+    # frames -> typed, sorted Arrow tables with the first chunk's schema (all-null columns as
+    # strings, dictionaries with int32 indices so later chunks can bring more values)
+    schema = None
+    for df in chunks:
+        table = _partitions_last(pa.Table.from_pandas(conform_types(df, artifact), preserve_index=False), policy)
+        if schema is None:
+            schema = pa.schema(
+                [f.with_type(pa.string()) if pa.types.is_null(f.type)
+                 else f.with_type(pa.dictionary(pa.int32(), f.type.value_type)) if pa.types.is_dictionary(f.type)
+                 else f for f in table.schema],
+                metadata=table.schema.metadata,
+            )
+            yield schema
+        if table.num_rows:
+            yield _sort_table(table.select(schema.names).cast(schema), _sort_keys(policy))
+
+def write_parquet_chunks(chunks, path: Path, artifact: str | None = None) -> int:
+    """write_parquet for an iterable of frames, holding one chunk at a time. Each chunk is
+    sorted on the policy's sort_by and appended as its own row groups, so the file (or each
+    partition) is only sorted within chunks. Columns take their type from the first chunk
+    (all-null columns become strings). Always written to disk, also in in-memory mode.
+    Returns the row count."""
+    path = Path(path)
+    policy = parquet_policy(artifact or path.stem)
     path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_parquet(path, index=False)
+    tables = _conformed(chunks, artifact or path.stem, policy)
+    schema = next(tables, None)
+    rows = 0
+    if schema is not None and policy["partition_by"]:
+        rows = _write_dataset(tables, path, policy, sorted_=False)
+    else:
+        tmp = path.with_name(path.name + ".tmp")
+        _remove(tmp)
+        if schema is None:
+            pq.write_table(pa.table({}), tmp)
+        else:
+            dictionary = policy["dictionary"]
+            if isinstance(dictionary, list):
+                dictionary = [c for c in dictionary if c in schema.names]
+            with pq.ParquetWriter(
+                tmp, schema,
+                compression=policy["compression"],
+                compression_level=policy["compression_level"],
+                use_dictionary=dictionary,
+                write_statistics=True,
+                write_page_index=True,
+            ) as writer:
+                for table in tables:
+                    writer.write_table(table, row_group_size=policy["row_group_size"])
+                    rows += table.num_rows
+        if path.is_dir():
+            shutil.rmtree(path)
+        tmp.replace(path)
+    if _held is not None:
+        release(path)  # readers take the file, not an older held table
+    note("out", path, rows)
+    return rows
+
+#------read parquet------
+def read_table(path: Path, columns: list[str] | None = None, filters=None) -> pa.Table:
+    """read_parquet as an Arrow table, for stages that rewrite an artifact without pandas.
+    filters is a DNF list or an Expression (see partition_filter)."""
+    held = _held.get(Path(path).resolve()) if _held is not None else None
+    if held is not None:
+        if filters is not None:
+            held = held.filter(pq.filters_to_expression(filters) if isinstance(filters, list) else filters)
+        table = held.select(columns) if columns is not None else held
+    else:
+        table = pq.read_table(path, columns=columns, filters=filters, **_read_kwargs(path))
+    note("in", path, table.num_rows)
+    return table
+
+def read_schema(path: Path) -> pa.Schema:
+    """Schema of an artifact (held, a file or a partitioned directory) without reading rows."""
+    held = _held.get(Path(path).resolve()) if _held is not None else None
+    if held is not None:
+        return held.schema
+    if Path(path).is_dir():
+        return ds.dataset(path, format="parquet", **_read_kwargs(path)).schema
+    return pq.read_schema(path)
+
+def read_parquet(path: Path, columns: list[str] | None = None, **kwargs) -> pd.DataFrame:
+    """pd.read_parquet that also counts the read towards the running stage's telemetry.
+    String columns come back Arrow-backed (string[pyarrow])."""
+    held = _held.get(Path(path).resolve()) if _held is not None else None
+    with _strings_to_arrow():
+        if held is not None:
+            df = _held_to_pandas(held, columns, **kwargs)
+        else:
+            df = pd.read_parquet(path, columns=columns, **_read_kwargs(path), **kwargs)
+    note("in", path, len(df))
+    return df
+
+#------schema registry------
+# pandas' default NA tokens (what dtype="string" reads treat as missing)
+PANDAS_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# Declared layout of each external export. dtypes: "string", "category" (dictionary
+# encoded), "float" and "datetime" (unparseable values become null and are counted).
+# keep_default_na=False files keep blanks as "" strings like read_csv_str; the others
+# read NA tokens as missing like dtype="string". Undeclared columns load as strings.
+SCHEMAS: dict[str, dict] = {
+    "customers": {
+        "file": "customers.csv",
+        "keep_default_na": False,
+        "columns": {
+            "shopUserId": "string",
+            "invoiceFirstName": "string",
+            "invoiceLastName": "string",
+            "invoiceSSN": "string",
+            "invoiceZip": "string",
+            "invoiceCity": "string",
+            "invoiceCountryId": "category",
+            "invoiceEmail": "string",
+        },
+    },
+    "transactions": {
+        "file": "transactions.csv",
+        "keep_default_na": False,
+        "columns": {
+            "orderId": "string",
+            "orderLineId": "string",
+            "shopUserId": "string",
+            "created": "datetime",
+            "currencyId": "category",
+            "sku": "string",
+            "groupId": "string",
+            "quantity": "float",
+            "price": "float",
+            "name": "string",
+            "type": "category",
+            "invoiceEmail": "string",
+        },
+    },
+    "products": {
+        "file": "products.csv",
+        "keep_default_na": True,
+        # prices stay strings: the export mixes "1 234,50" and "1234.5" styles
+        "columns": {
+            "sku": "string",
+            "groupId": "string",
+            "brandId": "string",
+            "name": "string",
+            "brand": "string",
+            "size": "string",
+            "audience": "string",
+            "audienceId": "string",
+            "category": "string",
+            "categoryId": "string",
+            "priceSEK": "string",
+            "priceEUR": "string",
+            "priceNOK": "string",
+            "priceDKK": "string",
+            "forSale": "category",
+            "status": "category",
+            "incommingQuantity": "string",
+            "length": "string",
+            "width": "string",
+            "height": "string",
+            "weight": "string",
+            "fabricId": "string",
+            "fabric": "string",
+            "description": "string",
+            "colorId": "string",
+            "color": "string",
+            "sizeId": "string",
+            "publishedDate": "string",
+            "quantity": "string",
+        },
+    },
+}
+_ARROW_TYPES = {
+    "string": pa.string(),
+    "category": pa.dictionary(pa.int32(), pa.string()),
+    "float": pa.float64(),
+    "datetime": pa.timestamp("ns"),
+}
+
+def _csv_header(path: Path) -> list[str]:
+    with Path(path).open(newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f))
+
+def _dtypes(name: str, names: list[str]) -> dict[str, str]:
+    declared = SCHEMAS[name]["columns"]
+    return {c: declared.get(c, "string") for c in names}
+
+def _convert_options(name: str, names: list[str]) -> pacsv.ConvertOptions:
+    # everything is read as text first so a bad value can't abort the whole read
+    keep_na = SCHEMAS[name]["keep_default_na"]
+    return pacsv.ConvertOptions(
+        column_types={c: pa.string() for c in names},
+        null_values=PANDAS_NA_VALUES if keep_na else [""],
+        strings_can_be_null=keep_na,
+    )
+
+def _cast_column(arr, dtype: str):
+    """Cast a text column to its declared type; returns (array, values that failed to parse)."""
+    if dtype == "string":
+        return arr, 0
+    if dtype == "category":
+        return arr.dictionary_encode(), 0
+    arr = pc.utf8_trim_whitespace(arr)
+    arr = pc.if_else(pc.equal(arr, ""), pa.scalar(None, pa.string()), arr)
+    try:
+        out = pc.cast(arr, _ARROW_TYPES[dtype])
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        s = arr.to_pandas()
+        s = pd.to_datetime(s, errors="coerce") if dtype == "datetime" else pd.to_numeric(s, errors="coerce")
+        out = pa.array(s, type=_ARROW_TYPES[dtype], from_pandas=True)
+    return out, out.null_count - arr.null_count
+
+def _apply_schema(table: pa.Table, dtypes: dict[str, str], report: dict) -> pa.Table:
+    cols = []
+    for c in table.column_names:
+        arr, bad = _cast_column(table[c], dtypes[c])
+        if bad:
+            report["unparsed"][c] = report["unparsed"].get(c, 0) + bad
+        cols.append(arr)
+    return pa.table(cols, names=table.column_names)
+
+def _new_report(name: str, names: list[str]) -> dict:
+    declared = SCHEMAS[name]["columns"]
+    return {
+        "name": name,
+        "rows": 0,
+        "missing": [c for c in declared if c not in names],
+        "unexpected": [c for c in names if c not in declared],
+        "unparsed": {},
+    }
+
+def schema_problems(report: dict) -> list[str]:
+    """Human-readable mismatches from a read/ingest report (empty when clean)."""
+    out = []
+    if report["missing"]:
+        out.append(f"{report['name']}: missing columns {report['missing']}")
+    if report["unexpected"]:
+        out.append(f"{report['name']}: undeclared columns read as strings {report['unexpected']}")
+    for c, n in report["unparsed"].items():
+        out.append(f"{report['name']}: {n} value(s) in {c!r} not parseable as {SCHEMAS[report['name']]['columns'][c]}")
+    return out
+
+def _to_pandas(table: pa.Table, name: str) -> pd.DataFrame:
+    df = table.to_pandas()
+    if SCHEMAS[name]["keep_default_na"]:
+        for c in df.columns:
+            if df[c].dtype == object:
+                df[c] = df[c].astype("string")
+    return df
+
+#------typed csv reader------
+def read_csv_typed(path: Path, name: str, *, columns: list[str] | None = None) -> tuple[pd.DataFrame, dict]:
+    """Multi-threaded Arrow read of an external CSV honouring SCHEMAS[name].
+    Returns the frame and a validation report (see schema_problems)."""
+    names = _csv_header(path)
+    report = _new_report(name, names)
+    convert = _convert_options(name, names)
+    if columns is not None:
+        convert.include_columns = [c for c in columns if c in names]
+    table = pacsv.read_csv(path, read_options=pacsv.ReadOptions(use_threads=True), convert_options=convert)
+    table = _apply_schema(table, _dtypes(name, names), report)
+    report["rows"] = table.num_rows
+    return _to_pandas(table, name), report
+
+#------ingest------
+def csv_to_parquet(src: Path, dst: Path, name: str, *, block_size: int = 1 << 24) -> dict:
+    """Stream an external CSV into zstd Parquet one Arrow record batch at a time,
+    typed per SCHEMAS[name]. Returns the validation report."""
+    names = _csv_header(src)
+    dtypes = _dtypes(name, names)
+    report = _new_report(name, names)
+    schema = pa.schema([(c, _ARROW_TYPES[dtypes[c]]) for c in names])
+    reader = pacsv.open_csv(
+        src, read_options=pacsv.ReadOptions(block_size=block_size), convert_options=_convert_options(name, names)
+    )
+    tmp = dst.with_suffix(".parquet.tmp")
+    with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+        for batch in reader:
+            writer.write_table(_apply_schema(pa.Table.from_batches([batch]), dtypes, report))
+            report["rows"] += batch.num_rows
+    tmp.replace(dst)
+    return report
+
+#------external exports------
+def external_parquet(external: Path, name: str) -> Path:
+    return Path(external) / f"{name}.parquet"
+
+def read_external(external: Path, name: str, columns: list[str] | None = None) -> tuple[pd.DataFrame, dict]:
+    """Read an external export with its registry types, preferring the Parquet written
+    at ingest; falls back to the typed CSV reader when it is missing or stale.
+    Requested columns the export lacks are left out either way. Returns the frame and
+    a validation report (see schema_problems)."""
+    csv_path = Path(external) / SCHEMAS[name]["file"]
+    pq_path = external_parquet(external, name)
+    fresh = pq_path.exists() and (
+        not csv_path.exists() or pq_path.stat().st_mtime >= csv_path.stat().st_mtime
+    )
+    if fresh:
+        names = pq.read_schema(pq_path).names
+        report = _new_report(name, names)
+        table = pq.read_table(pq_path, columns=None if columns is None else [c for c in columns if c in names])
+        report["rows"] = table.num_rows
+        df = _to_pandas(table, name)
+    else:
+        df, report = read_csv_typed(csv_path, name, columns=columns)
+    note("in", pq_path if fresh else csv_path, len(df))
+    return df, report
@@ -1,16 +1,21 @@
 # python/pipeline/recs/hybrid.py
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
+import pyarrow.compute as pc
 from functools import reduce
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+from pipeline.ids import decode, encode, load_ids
+from pipeline.io import read_parquet, write_parquet
+
 TOP_PREFIX, SCORE_PREFIX = "Top ", "Score "
 
 
 def wide_to_long(path: Path | str, score_col_name: str) -> pd.DataFrame:
-    df = pd.read_parquet(path, dtype_backend="numpy_nullable")
+    df = read_parquet(path, dtype_backend="numpy_nullable")
 
     ranks: List[int] = sorted(
         int(c.split()[1])
@@ -74,13 +79,26 @@ def build_hybrid(
     pair_long = wide_to_long(path_pair, "score_pair")
     semantic_long = wide_to_long(path_semantic, "score_semantic")
 
-    dfs = [basket_long, pair_long, semantic_long]
+    # join on global int32 codes (pipeline.ids) rather than strings
+    ids = load_ids(processed_dir, kinds=("groupId",))["groupId"]
+    dfs = [
+        df.assign(product_id=encode(df["product_id"], ids, "groupId"), rec_id=encode(df["rec_id"], ids, "groupId"))
+        for df in (basket_long, pair_long, semantic_long)
+    ]
     hybrid = reduce(
         lambda left, right: pd.merge(
             left, right, on=["product_id", "rec_id"], how="outer"
         ),
         dfs,
     )
+    # an outer join on strings sorted rows by (product_id, rec_id) string; keep that order,
+    # since make_topk_hybrid_parquet breaks score ties by it
+    rank = np.empty(len(ids), dtype=np.int64)
+    rank[pc.sort_indices(ids).to_numpy()] = np.arange(len(ids))
+    order = np.lexsort((rank[hybrid["rec_id"].to_numpy()], rank[hybrid["product_id"].to_numpy()]))
+    hybrid = hybrid.iloc[order].reset_index(drop=True)
+    hybrid["product_id"] = decode(hybrid["product_id"], ids)
+    hybrid["rec_id"] = decode(hybrid["rec_id"], ids)
 
     hybrid["product_id"] = hybrid["product_id"].astype("string")
     hybrid["rec_id"] = hybrid["rec_id"].astype("string")
@@ -133,5 +151,5 @@ def make_topk_hybrid_parquet(
         .reset_index(drop=True)
     )
 
-    topk_df.to_parquet(out_path, index=False)
+    write_parquet(topk_df, out_path)
     return out_path
\ No newline at end of file
@@ -1,15 +1,19 @@
 # python/pipeline/recs/iicf_ease.py
 from __future__ import annotations
 
-from itertools import combinations
 from pathlib import Path
 from typing import Iterable
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 from cornac.data import Dataset
 from cornac.models.ease import EASE
 
+from pipeline.ids import decode, encode, load_ids
+from pipeline.io import read_parquet, write_parquet
+from pipeline.telemetry import track
+
 
 BAD_IDS: set[str] = {"12025DK", "12025FI", "12025NO", "12025SE", "970300", "459978"}
 
@@ -23,11 +27,12 @@ def load_filtered_transactions(
     trans_path = processed_dir / "transactions_clean.parquet"
     avail_path = processed_dir / "articles_for_recs.parquet"
 
-    df = pd.read_parquet(trans_path, columns=list(cols))
-    avail_df = pd.read_parquet(avail_path, columns=["groupId"])
+    # groupIds are stored trimmed (pipeline.io.ARTIFACT_TYPES)
+    avail_ids = set(read_parquet(avail_path, columns=["groupId"])["groupId"].dropna().unique())
 
-    gid = df["groupId"].astype(str).str.strip()
-    avail_ids = set(avail_df["groupId"].astype(str).str.strip().unique())
+    # each transactions_clean partition is sorted on groupId, so this skips unrelated row groups
+    df = read_parquet(trans_path, columns=list(cols), filters=[("groupId", "in", sorted(avail_ids))])
+    gid = df["groupId"]
 
     return df.loc[gid.isin(avail_ids) & ~gid.isin(bad_ids)].reset_index(drop=True)
 
@@ -57,22 +62,15 @@ def product_pair_user_counts(
     item_col: str = "groupId",
 ) -> pd.DataFrame:
     """Count distinct users per unordered item pair."""
+    a, b = f"{item_col}_a", f"{item_col}_b"
     ui = pairs[[user_col, item_col]].drop_duplicates()
-    combos = (
-        ui.groupby(user_col)[item_col]
-        .apply(lambda s: list(combinations(sorted(s.unique()), 2)))
-        .explode()
-        .dropna()
-        .reset_index(name="pair")
-    )
-    combos[[f"{item_col}_a", f"{item_col}_b"]] = pd.DataFrame(
-        combos["pair"].tolist(), index=combos.index
-    )
-    combos = combos.drop(columns="pair")
+    # self-join per user instead of itertools.combinations per group: on int codes the
+    # join and the comparison stay vectorized; each (user, a < b) occurs once
+    combos = ui.merge(ui, on=user_col, suffixes=("_a", "_b"))
+    combos = combos[combos[a] < combos[b]]
     return (
-        combos.drop_duplicates([user_col, f"{item_col}_a", f"{item_col}_b"])
-        .groupby([f"{item_col}_a", f"{item_col}_b"])[user_col]
-        .nunique()
+        combos.groupby([a, b])
+        .size()
         .reset_index(name="distinct_users")
         .sort_values("distinct_users", ascending=False)
         .reset_index(drop=True)
@@ -126,7 +124,7 @@ def filter_pairs_by_item_frequency(
     inclusive: str = "both",
 ) -> pd.DataFrame:
     """Quantile-trim items by frequency and return the filtered pairs."""
-    gid = pairs[item_col].astype(str).str.strip()
+    gid = pairs[item_col]
     counts = gid.value_counts()
     low, high = counts.quantile([q_low, q_high])
     mask = gid.map(counts).between(low, high, inclusive=inclusive)
@@ -139,11 +137,11 @@ def _to_uir(
     item_col: str = "groupId",
     pref_col: str = "pref",
 ):
-    """Return (user, item, rating) triplets for Cornac."""
+    """Return (user, item, rating) triplets for Cornac (ids as given: strings or int codes)."""
     return list(
         zip(
-            pairs[user_col].astype(str),
-            pairs[item_col].astype(str),
+            pairs[user_col].tolist(),
+            pairs[item_col].tolist(),
             pairs[pref_col].astype(float),
         )
     )
@@ -155,17 +153,21 @@ def build_ease_topk_wide(
     k_min: int = 1,
     k_max: int = 10,
     out_path: Path | None = None,
+    vocab: pa.Array | None = None,
 ) -> pd.DataFrame:
     """
     Train EASE and emit a wide Top-K dataframe with scores.
     - Keep positive neighbors ≥ rel_min * row_max
     - Require at least k_min neighbors; cap at k_max
+    - Item ids that are int codes are decoded with `vocab`
     """
     train_set = Dataset.from_uir(uir)
     model = EASE(verbose=False)
     model.fit(train_set)
 
     item_ids = train_set.item_ids
+    if vocab is not None:
+        item_ids = decode(np.asarray(item_ids, dtype=np.int64), vocab)
     B = model.B.astype(np.float32, copy=True)
     np.fill_diagonal(B, np.nan)
     B_df = pd.DataFrame(B, index=item_ids, columns=item_ids)
@@ -201,8 +203,7 @@ def build_ease_topk_wide(
     wide[score_cols] = wide[score_cols].astype("Float32")
 
     if out_path is not None:
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-        wide.to_parquet(out_path, index=False)
+        write_parquet(wide, out_path)
     return wide
 
 
@@ -219,6 +220,10 @@ def run(
 ) -> Path:
     """Full pipeline: filter → pairs → co-occur filter → freq trim → train EASE → write parquet."""
     df = load_filtered_transactions(processed_dir)
+    # pairs and the EASE matrix run on global int32 codes (pipeline.ids); groupIds come back at export
+    # (orderIds are only deduplicated on, then dropped, so they are not worth encoding)
+    ids = load_ids(processed_dir, kinds=("shopUserId", "groupId"))
+    df = df.assign(**{c: encode(df[c], ids[c], c) for c in ("shopUserId", "groupId")})
     pairs = make_user_item_pairs(df)
     pair_counts = product_pair_user_counts(pairs)
 
@@ -236,11 +241,14 @@ def run(
     uir = _to_uir(pairs)
     out_path = processed_dir / out_filename
 
-    _ = build_ease_topk_wide(
-        uir,
-        rel_min=rel_min,
-        k_min=k_min,
-        k_max=k_max,
-        out_path=out_path,
-    )
+    with track("iicf_ease", "build_ease_topk_wide") as rec:
+        rec["interactions"] = len(uir)
+        _ = build_ease_topk_wide(
+            uir,
+            rel_min=rel_min,
+            k_min=k_min,
+            k_max=k_max,
+            out_path=out_path,
+            vocab=ids["groupId"],
+        )
     return out_path
@@ -2,18 +2,22 @@
 from __future__ import annotations
 from typing import Iterable, Tuple
 from pathlib import Path
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MultiLabelBinarizer
+import pyarrow as pa
+import pyarrow.compute as pc
+import scipy.sparse as sp
 from mlxtend.frequent_patterns import apriori, association_rules
 
+from pipeline.ids import decode, encode, load_ids
+from pipeline.io import read_parquet, write_parquet
+
 def load_filtered_order_items(order_items_path: Path, articles_path: Path, bad_ids: Iterable[str] = None) -> pd.DataFrame:
     """Filter out bad/unknown groupIds to avoid skew."""
     BAD = {"12025DK", "12025FI", "12025NO", "12025SE", "970300", "459978"} if bad_ids is None else set(bad_ids)
-    order_items = pd.read_parquet(order_items_path)
-    articles = pd.read_parquet(articles_path)
-    articles["groupId"] = articles["groupId"].astype(str).str.strip()
-    order_items["groupId"] = order_items["groupId"].astype(str).str.strip()
-    allow = set(articles["groupId"].dropna())
+    # groupIds are stored trimmed (pipeline.io.ARTIFACT_TYPES)
+    allow = set(read_parquet(articles_path, columns=["groupId"])["groupId"].dropna())
+    order_items = read_parquet(order_items_path, filters=[("groupId", "in", sorted(allow - BAD))])
     return (order_items.loc[~order_items["groupId"].isin(BAD)]
                       .loc[order_items["groupId"].isin(allow)]
                       .reset_index(drop=True))
@@ -25,16 +29,21 @@ def filter_group_ids_by_quantile(df: pd.DataFrame, lower_q: float = 0.5, upper_q
     keep = counts[(counts >= lo) & (counts <= hi)].index
     return df[df["groupId"].isin(keep)].reset_index(drop=True), float(lo), float(hi)
 
-def create_basket(df: pd.DataFrame) -> pd.DataFrame:
-    """Dedup per order; keep baskets size ≥2."""
-    b = df.groupby("order_id")["groupId"].apply(lambda x: sorted(set(x))).reset_index()
-    return b[b["groupId"].apply(lambda x: len(x) >= 2)].reset_index(drop=True)
+def create_basket_df(df: pd.DataFrame, item_order: np.ndarray | None = None) -> tuple[pd.DataFrame, np.ndarray]:
+    """Orders×items boolean matrix of (order_id, groupId) codes; baskets of ≥2 distinct items.
 
-def create_basket_df(basket: pd.DataFrame) -> pd.DataFrame:
-    """Orders×items boolean matrix."""
-    mlb = MultiLabelBinarizer(sparse_output=True)
-    X = mlb.fit_transform(basket["groupId"])
-    return pd.DataFrame.sparse.from_spmatrix(X, index=basket["order_id"], columns=mlb.classes_).astype(bool)
+    Column j is item code items[j] (returned alongside), in `item_order` if given.
+    """
+    pairs = df[["order_id", "groupId"]].drop_duplicates()
+    pairs = pairs[pairs.groupby("order_id")["groupId"].transform("size") >= 2]
+    rows, orders = pd.factorize(pairs["order_id"], sort=True)
+    items = np.unique(pairs["groupId"].to_numpy())
+    if item_order is not None:
+        items = item_order[np.isin(item_order, items)]
+    cols = pd.Index(items).get_indexer(pairs["groupId"])
+    X = sp.csr_matrix((np.ones(len(pairs), dtype=np.int8), (rows, cols)), shape=(len(orders), len(items)))
+    # positional columns: mlxtend rejects sparse frames with other integer column names
+    return pd.DataFrame.sparse.from_spmatrix(X, index=orders).astype(bool), items
 
 def get_frequent_itemsets(basket_df: pd.DataFrame, min_support: float = 0.001) -> pd.DataFrame:
     """Frequent itemsets via apriori."""
@@ -44,11 +53,14 @@ def build_rules(fis: pd.DataFrame, min_confidence: float = 0.1) -> pd.DataFrame:
     """Confidence-filtered rules; sort by lift."""
     return association_rules(fis, metric="confidence", min_threshold=min_confidence).sort_values("lift", ascending=False)
 
-def rules_to_parquet_topk(rules: pd.DataFrame, output_path: Path, top_k: int = 10) -> pd.DataFrame:
-    """Top-K consequents per antecedent (score=confidence; tie=lift)."""
+def rules_to_parquet_topk(rules: pd.DataFrame, output_path: Path, top_k: int = 10,
+                          vocab: pa.Array | None = None) -> pd.DataFrame:
+    """Top-K consequents per antecedent (score=confidence; tie=lift); item positions are decoded with `vocab`."""
     r = rules[(rules["antecedents"].apply(lambda s: len(s) == 1)) & (rules["consequents"].apply(lambda s: len(s) == 1))].copy()
-    r["A"] = r["antecedents"].apply(lambda s: str(next(iter(s))))
-    r["B"] = r["consequents"].apply(lambda s: str(next(iter(s))))
+    a = r["antecedents"].apply(lambda s: next(iter(s))).to_numpy()
+    b = r["consequents"].apply(lambda s: next(iter(s))).to_numpy()
+    r["A"] = decode(a.astype(np.int64), vocab) if vocab is not None else a.astype(str)
+    r["B"] = decode(b.astype(np.int64), vocab) if vocab is not None else b.astype(str)
     r = r.sort_values(["A", "confidence", "lift"], ascending=[True, False, False]).groupby("A").head(top_k)
 
     def pack(g: pd.DataFrame) -> pd.Series:
@@ -64,7 +76,7 @@ def rules_to_parquet_topk(rules: pd.DataFrame, output_path: Path, top_k: int = 1
               .reset_index(drop=True)
               .sort_values("Product ID")
               .reset_index(drop=True))
-    out.to_parquet(output_path, index=False)
+    write_parquet(out, output_path)
     return out
 
 def run(
@@ -83,11 +95,15 @@ def run(
     articles_path = processed_dir / available
     out_path = processed_dir / output
 
-    df = load_filtered_order_items(order_items_path, articles_path)[["order_id", "groupId"]]
+    # baskets and rules run on global int32 codes (pipeline.ids); groupIds come back at export
+    ids = load_ids(processed_dir, kinds=("groupId", "orderId"))
+    df = load_filtered_order_items(order_items_path, articles_path)
+    df = pd.DataFrame({"order_id": encode(df["order_id"], ids["orderId"], "orderId"),
+                       "groupId": encode(df["groupId"], ids["groupId"], "groupId")})
     df, _, _ = filter_group_ids_by_quantile(df, lower_q=lower_q, upper_q=upper_q)
-    basket = create_basket(df)
-    X = create_basket_df(basket)
+    # items in groupId string order, so tied rules come out in the same order as before
+    X, items = create_basket_df(df, item_order=pc.sort_indices(ids["groupId"]).to_numpy())
     fis = get_frequent_itemsets(X, min_support=min_support)
     rules = build_rules(fis, min_confidence=min_confidence)
-    rules_to_parquet_topk(rules, output_path=out_path, top_k=top_k)
+    rules_to_parquet_topk(rules, output_path=out_path, top_k=top_k, vocab=ids["groupId"].take(items))
     return out_path
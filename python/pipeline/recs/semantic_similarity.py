@@ -7,6 +7,8 @@ import faiss
 from sentence_transformers import SentenceTransformer
 from transformers.utils import logging as hf_logging
 
+from pipeline.io import read_parquet, write_parquet
+
 MISSING = {"", "unknown", "nan", "none", None}
 PRICE_BINS = [0, 100, 300, 600, 1000, 2000, float("inf")]
 PRICE_LABELS = ["Budget", "Value", "Popular", "Premium", "Luxury", "Exclusive"]
@@ -90,6 +92,21 @@ def _iter_batches(n, bs):
     for i in range(0, n, bs):
         yield i, min(i + bs, n)
 
+_encoders: dict[str, SentenceTransformer] = {}
+
+def load_encoder(model_id: str = MODEL_ID) -> SentenceTransformer:
+    # loaded once per process, so a resident cli.worker keeps it warm between runs
+    enc = _encoders.get(model_id)
+    if enc is None:
+        enc = SentenceTransformer(model_id, device="cpu", trust_remote_code=True)
+        try:
+            max_len = getattr(getattr(enc, "tokenizer", None), "model_max_length", 4096)
+        except Exception:
+            max_len = 4096
+        enc.max_seq_length = min(4096, max_len)
+        _encoders[model_id] = enc
+    return enc
+
 def run(
     processed_dir: Path,
     batch_size: int = 64,
@@ -103,7 +120,7 @@ def run(
     hf_logging.set_verbosity_error()
     torch.set_num_threads(max(1, num_threads))
 
-    groups = pd.read_parquet(processed_dir.joinpath("articles_for_recs.parquet"))
+    groups = read_parquet(processed_dir.joinpath("articles_for_recs.parquet"))
     groups["priceSEK"] = pd.to_numeric(groups["priceSEK"], errors="coerce")
     groups = groups[groups["priceSEK"] >= min_price].copy()
     groups["priceband"] = pd.cut(groups["priceSEK"], bins=PRICE_BINS, labels=PRICE_LABELS, include_lowest=True)
@@ -118,13 +135,7 @@ def run(
     texts = group_df["text"].fillna("").tolist()
     N = len(texts)
 
-    enc = SentenceTransformer(MODEL_ID, device="cpu", trust_remote_code=True)
-    try:
-        max_len = getattr(getattr(enc, "tokenizer", None), "model_max_length", 4096)
-    except Exception:
-        max_len = 4096
-    enc.max_seq_length = min(4096, max_len)
-
+    enc = load_encoder()
     probe = enc.encode(texts[:1] or [""], batch_size=1, normalize_embeddings=True,
                        convert_to_numpy=True, show_progress_bar=False).astype("float32")
     d = int(probe.shape[1])
@@ -181,7 +192,7 @@ def run(
 
     cols = ["Product ID"] + [c for r in range(1, k + 1) for c in (f"Top {r}", f"Score {r}")]
     wide = pd.DataFrame(rows, columns=cols)
-    wide.to_parquet(processed_dir.joinpath("semantic_similarity_recs.parquet"), index=False)
+    write_parquet(wide, processed_dir.joinpath("semantic_similarity_recs.parquet"))
 
     try:
         os.remove(mmap_path)
@@ -3,7 +3,9 @@ from __future__ import annotations
 from pathlib import Path
 import pandas as pd
 import pyarrow as pa
-import pyarrow.parquet as pq
+
+from pipeline.ids import decode, encode, load_ids
+from pipeline.io import read_parquet, write_parquet
 
 GENDER_TOKENS = {"dam", "herr"}
 
@@ -13,10 +15,10 @@ def load_filtered_transactions(
     bad_ids: set[str] = {"12025DK", "12025FI", "12025NO", "12025SE", "970300", "459978"},
     cols: tuple[str, ...] = ("shopUserId", "orderId", "groupId", "category", "brand", "audience"),
 ) -> pd.DataFrame:
-    df = pd.read_parquet(trans_path, columns=list(cols))
-    avail_df = pd.read_parquet(avail_path)
-    gid = df["groupId"].astype(str).str.strip()
-    avail_ids = set(avail_df["groupId"].astype(str).str.strip().unique())
+    # groupIds are stored trimmed (pipeline.io.ARTIFACT_TYPES)
+    avail_ids = set(read_parquet(avail_path, columns=["groupId"])["groupId"].dropna().unique())
+    df = read_parquet(trans_path, columns=list(cols), filters=[("groupId", "in", sorted(avail_ids))])
+    gid = df["groupId"]
     return df.loc[gid.isin(avail_ids) & ~gid.isin(bad_ids)].reset_index(drop=True)
 
 def aggregate_by_groupid(
@@ -53,7 +55,9 @@ def preprocess_pairs(pairs: pd.DataFrame) -> tuple[pd.DataFrame, int]:
     df["cat_set"] = df["category"].map(_cat_to_set)
     return df, skipped
 
-def build_recs(filtered_pairs: pd.DataFrame, min_recs=1, max_recs=10) -> tuple[pd.DataFrame, int]:
+def build_recs(filtered_pairs: pd.DataFrame, min_recs=1, max_recs=10,
+               vocab: pa.Array | None = None) -> tuple[pd.DataFrame, int]:
+    """Same-brand recs per groupId; groupIds may be int codes, decoded with `vocab` at the end."""
     recs, insufficient = {}, 0
     gdf = filtered_pairs.copy()
     gdf["transactions"] = pd.to_numeric(gdf["transactions"], errors="coerce").fillna(0)
@@ -63,9 +67,10 @@ def build_recs(filtered_pairs: pd.DataFrame, min_recs=1, max_recs=10) -> tuple[p
         cat_map = g["cat_set"].to_dict()
         cutoff = g["transactions"].quantile(0.95)
         is_bestseller = g["transactions"] >= cutoff
+        gids = g["groupId"].to_numpy()
 
         for idx, row in g.iterrows():
-            gid = str(row["groupId"])
+            gid = row["groupId"]
             my_cats = row["cat_set"]
             my_aud  = row["aud_norm"]
             if not my_cats:
@@ -73,14 +78,14 @@ def build_recs(filtered_pairs: pd.DataFrame, min_recs=1, max_recs=10) -> tuple[p
                 continue
 
             mask = (
-                (g["groupId"].astype(str) != gid)
+                (gids != gid)
                 & (g.index != idx)
                 & (~is_bestseller)                 # drop top 5%
                 & (g["aud_norm"] == my_aud)        # exact audience match
                 & g.index.map(lambda j: _categories_match(my_cats, cat_map[j]))
             )
 
-            tops = g.loc[mask, "groupId"].astype(str).head(max_recs).tolist()
+            tops = g.loc[mask, "groupId"].head(max_recs).tolist()
             if len(tops) >= min_recs:
                 recs[gid] = {f"Top {i+1}": t for i, t in enumerate(tops)}
             else:
@@ -91,11 +96,13 @@ def build_recs(filtered_pairs: pd.DataFrame, min_recs=1, max_recs=10) -> tuple[p
     if not out.empty:
         ordered = ["Product ID"] + [c for i in range(1, max_recs + 1) if (c := f"Top {i}") in out.columns]
         out = out[ordered]
+    if vocab is not None and not out.empty:
+        for c in out.columns:
+            out[c] = decode(out[c].fillna(-1).astype("int64"), vocab)
     return out, insufficient
 
 def save_parquet(df: pd.DataFrame, path: str | Path):
-    table = pa.Table.from_pandas(df)
-    pq.write_table(table, path)
+    write_parquet(df, Path(path))
 
 def run(
     processed_dir: str | Path,
@@ -111,8 +118,11 @@ def run(
         avail_path=processed_dir / available,
     )
     pairs = aggregate_by_groupid(df)
+    # the per-item scan compares global int32 codes (pipeline.ids); groupIds come back at export
+    ids = load_ids(processed_dir, kinds=("groupId",))["groupId"]
+    pairs["groupId"] = encode(pairs["groupId"], ids, "groupId")
     filtered, skipped = preprocess_pairs(pairs)
-    export_df, insufficient = build_recs(filtered, min_recs=min_recs, max_recs=max_recs)
+    export_df, insufficient = build_recs(filtered, min_recs=min_recs, max_recs=max_recs, vocab=ids)
     out_path = processed_dir / output
     save_parquet(export_df, out_path)
     print(f"Skipped {skipped} rows due to Unknown brand")
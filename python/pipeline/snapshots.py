@@ -0,0 +1,94 @@
+# content-addressed store for raw export snapshots
+
+#------imports------
+from __future__ import annotations
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING
+import hashlib, json, shutil
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# <root>/objects/ab/abcd....zst holds each distinct export once (zstd);
+# <root>/<name>.jsonl has one line per stored fetch, oldest first
+CHUNK = 1 << 20
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _object_path(root: Path, digest: str) -> Path:
+    return Path(root) / "objects" / digest[:2] / f"{digest}.zst"
+
+def _index_path(root: Path, name: str) -> Path:
+    return Path(root) / f"{name}.jsonl"
+
+#------read------
+def list_snapshots(root: Path, name: str) -> list[dict]:
+    p = _index_path(root, name)
+    if not p.exists():
+        return []
+    return [json.loads(line) for line in p.read_text().splitlines() if line.strip()]
+
+def get_snapshot(root: Path, name: str, n: int = -1) -> dict:
+    """Index entry of snapshot n (0 = oldest, -1 = latest)."""
+    entries = list_snapshots(root, name)
+    if not entries:
+        raise FileNotFoundError(f"No snapshots of {name!r} under {root}")
+    try:
+        return entries[n]
+    except IndexError:
+        raise IndexError(f"{name!r} has {len(entries)} snapshots, no snapshot {n}") from None
+
+def snapshot_asof(root: Path, name: str, when: str) -> int:
+    """Position of the latest snapshot taken on or before `when` (ISO date or datetime)."""
+    entries = list_snapshots(root, name)
+    hits = [i for i, e in enumerate(entries) if e["taken"][:len(when)] <= when]
+    if not hits:
+        raise FileNotFoundError(f"No snapshot of {name!r} taken on or before {when}")
+    return hits[-1]
+
+def open_snapshot(root: Path, name: str, n: int = -1) -> pa.NativeFile:
+    """Decompressing binary stream over snapshot n; usable as a file object."""
+    import pyarrow as pa  # deferred: cli.main only needs sha256_file
+    entry = get_snapshot(root, name, n)
+    return pa.input_stream(str(_object_path(root, entry["sha256"])), compression="zstd")
+
+def restore_snapshot(root: Path, name: str, dest: Path, n: int = -1) -> dict:
+    entry = get_snapshot(root, name, n)
+    dest = Path(dest)
+    tmp = dest.with_name(dest.name + ".tmp")
+    with open_snapshot(root, name, n) as src, tmp.open("wb") as f:
+        shutil.copyfileobj(src, f, CHUNK)
+    tmp.replace(dest)
+    return entry
+
+#------write------
+def put_snapshot(root: Path, name: str, path: Path, *, sha256: str | None = None, meta: dict | None = None) -> dict:
+    """Record `path` as the newest snapshot of `name` and return its index entry.
+    Content already in the store (any export, any day) is not written again."""
+    path = Path(path)
+    digest = sha256 or sha256_file(path)
+    obj = _object_path(root, digest)
+    if not obj.exists():
+        import pyarrow as pa
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        tmp = obj.with_name(obj.name + ".tmp")
+        with path.open("rb") as src, pa.CompressedOutputStream(str(tmp), "zstd") as out:
+            for chunk in iter(lambda: src.read(CHUNK), b""):
+                out.write(chunk)
+        tmp.replace(obj)
+    entry = {
+        "sha256": digest,
+        "size": path.stat().st_size,
+        "stored_size": obj.stat().st_size,
+        "taken": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **(meta or {}),
+    }
+    with _index_path(root, name).open("a") as f:
+        f.write(json.dumps(entry, sort_keys=True) + "\n")
+    return entry
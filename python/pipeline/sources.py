@@ -0,0 +1,52 @@
+# repo source files behind a module, for code fingerprints (cli.main's stage cache, the
+# resident worker, and the --incremental states); kept free of pandas/pyarrow so
+# cli.main --dry-run starts fast
+
+#------imports------
+from pathlib import Path
+import ast, hashlib
+
+PY_ROOT = Path(__file__).resolve().parents[1]
+
+#------import graph------
+def _module_file(module: str, root: Path) -> Path | None:
+    base = Path(root).joinpath(*module.split("."))
+    for p in (base.with_suffix(".py"), base / "__init__.py"):
+        if p.is_file():
+            return p
+    return None
+
+def source_files(module: str, root: Path = PY_ROOT) -> list[Path]:
+    """Repo files `module` imports, directly or transitively (third-party imports ignored)."""
+    seen, files, todo = set(), set(), [module]
+    while todo:
+        mod = todo.pop()
+        if mod in seen:
+            continue
+        seen.add(mod)
+        parts = mod.split(".")
+        todo += [".".join(parts[:i]) for i in range(1, len(parts))]
+        path = _module_file(mod, root)
+        if path is None:
+            continue
+        files.add(path)
+        pkg = mod if path.name == "__init__.py" else ".".join(parts[:-1])
+        for node in ast.walk(ast.parse(path.read_text(), str(path))):
+            if isinstance(node, ast.Import):
+                todo += [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ""
+                if node.level:
+                    anchor = pkg.split(".")[: len(pkg.split(".")) - node.level + 1]
+                    base = ".".join([*anchor, base] if base else anchor)
+                todo += [base, *(f"{base}.{a.name}" for a in node.names)]
+    return sorted(files)
+
+def code_version(*modules: str, root: Path = PY_ROOT) -> str:
+    """Short hash of every repo file the given modules import, so editing any of them
+    changes it."""
+    h = hashlib.sha256()
+    for f in sorted({f for m in modules for f in source_files(m, root)}):
+        h.update(f"{f.relative_to(root)}\n".encode())
+        h.update(f.read_bytes())
+    return h.hexdigest()[:16]
@@ -0,0 +1,147 @@
+# per-stage performance records, one JSON line each, for the cli.* entry points
+
+#------imports------
+from __future__ import annotations
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+import functools, json, os, resource, threading, time
+
+# logs/telemetry.jsonl (relative to the working directory, i.e. the repo root under make);
+# cli.main sets PIPELINE_RUN_ID so every stage of one run shares an id
+TELEMETRY_FILE = "telemetry.jsonl"
+_RUN_ID = os.environ.get("PIPELINE_RUN_ID") or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+_lock = threading.Lock()
+_stage: dict | None = None
+
+def log_dir() -> Path:
+    # read per record: cli.worker runs each job under its caller's PIPELINE_LOG_DIR
+    return Path(os.environ.get("PIPELINE_LOG_DIR", "logs"))
+
+def run_id() -> str:
+    return _RUN_ID
+
+def set_run_id(run: str) -> None:
+    # a long-lived process (cli.worker) serves stages of many runs
+    global _RUN_ID
+    _RUN_ID = run
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux; it is the peak of the whole process so far
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def rss_mb() -> float | None:
+    """Resident set size right now (None where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * _PAGE / 2**20, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+class _RssSampler:
+    """Highest RSS polled every `interval` seconds until stop(). A stage that runs after a
+    bigger one in the same process (--in-memory, cli.worker) cannot read its own peak from
+    ru_maxrss, which never goes down."""
+    def __init__(self, interval: float = 0.05):
+        self.high = rss_mb()
+        self._done = threading.Event()
+        self._thread = None
+        if self.high is not None:
+            self._thread = threading.Thread(target=self._poll, args=(interval,), daemon=True)
+            self._thread.start()
+
+    def _poll(self, interval: float) -> None:
+        while not self._done.wait(interval):
+            self._see(rss_mb())
+
+    def _see(self, mb: float | None) -> None:
+        if mb is not None and mb > self.high:
+            self.high = mb
+
+    def stop(self) -> float | None:
+        self._done.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._see(rss_mb())
+        return self.high
+
+def emit(rec: dict) -> None:
+    path = log_dir()
+    path.mkdir(parents=True, exist_ok=True)
+    with _lock, (path / TELEMETRY_FILE).open("a") as f:
+        f.write(json.dumps(rec, default=str) + "\n")
+
+#------artifacts------
+def note(direction: str, path: Path, rows: int | None = None) -> None:
+    """Record an artifact read ("in") or written ("out") by the active stage, if any."""
+    if _stage is None:
+        return
+    path = Path(path)
+    if path.is_dir():  # partitioned dataset
+        size = sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    else:
+        size = path.stat().st_size if path.is_file() else None
+    entry = {"path": path.name, "rows": rows, "bytes": size}
+    with _lock:
+        _stage[f"artifacts_{direction}"].append(entry)
+
+def _rows(entries: list[dict]) -> int | None:
+    counts = [e["rows"] for e in entries if e["rows"] is not None]
+    return sum(counts) if counts else None
+
+#------tracking------
+@contextmanager
+def track(stage: str, step: str | None = None, *, thread_cpu: bool = False):
+    """Time a stage (or a sub-step of one) and emit its record on exit.
+    Stage records also collect the artifacts pipeline.io reads and writes meanwhile.
+    thread_cpu counts only the calling thread's CPU, for steps run in a thread pool.
+    peak_rss_mb is the peak during this record only; rss_start_mb is the RSS it began with."""
+    global _stage
+    rec = {"run": _RUN_ID, "stage": stage, "step": step, "pid": os.getpid()}
+    if step is None:
+        rec.update(artifacts_in=[], artifacts_out=[])
+        _stage = rec
+    cpu = time.thread_time if thread_cpu else time.process_time
+    peak0, rss = peak_rss_mb(), _RssSampler()
+    rec["rss_start_mb"] = rss.high
+    t0, c0 = time.perf_counter(), cpu()
+    rec["status"] = "error"
+    try:
+        yield rec
+        rec["status"] = "ok"
+    except SystemExit as e:
+        rec["status"] = "ok" if e.code in (0, None) else "error"
+        raise
+    finally:
+        rec["wall_s"] = round(time.perf_counter() - t0, 3)
+        rec["cpu_s"] = round(cpu() - c0, 3)
+        # exact when this stage raised the process peak; otherwise the polled high-water mark
+        high, peak = rss.stop(), peak_rss_mb()
+        exact = peak > peak0 or high is None
+        rec["peak_rss_mb"] = peak if exact else high
+        rec["peak_rss_source"] = "ru_maxrss" if exact else "sampled"
+        rec["ts"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        if step is None:
+            rec["rows_in"] = _rows(rec["artifacts_in"])
+            rec["rows_out"] = _rows(rec["artifacts_out"])
+            _stage = None
+        emit(rec)
+
+def tracked(stage: str):
+    """Decorator form of track() for a cli entry point."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with track(stage):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+#------reading back------
+def load_records(directory: Path | None = None) -> list[dict]:
+    p = Path(directory or log_dir()) / TELEMETRY_FILE
+    if not p.exists():
+        return []
+    return [json.loads(line) for line in p.read_text().splitlines() if line.strip()]
@@ -0,0 +1,89 @@
+# string cleaning on distinct values: columns such as city, category, size and colour have
+# a few thousand distinct values over millions of rows, so cleaners run once per value
+
+#------imports------
+from __future__ import annotations
+from pathlib import Path
+import hashlib, inspect, os, re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+#------memo------
+# With PIPELINE_TEXT_MEMO set to a directory, map_unique(..., memo=True) keeps each cleaner's
+# results there (<module>.<function>.parquet) and only cleans values it has not seen before.
+# A memo is dropped when the source file defining its cleaner changes.
+MEMO_DIR = os.environ.get("PIPELINE_TEXT_MEMO") or None
+_memos: dict[str, tuple[str, dict]] = {}
+
+def _memo_key(fn) -> tuple[str, str]:
+    name = re.sub(r"[^\w.]+", "", f"{fn.__module__}.{fn.__qualname__}")
+    src = inspect.getsourcefile(fn)
+    version = hashlib.sha256(Path(src).read_bytes()).hexdigest()[:16] if src else ""
+    return name, version
+
+def _memo_path(name: str) -> Path:
+    return Path(MEMO_DIR) / f"{name}.parquet"
+
+def _load_memo(fn) -> dict:
+    name, version = _memo_key(fn)
+    if name in _memos and _memos[name][0] == version:
+        return _memos[name][1]
+    memo = {}
+    path = _memo_path(name)
+    if path.exists():
+        t = pq.read_table(path)
+        if (t.schema.metadata or {}).get(b"version", b"").decode() == version:
+            memo = dict(zip(t["raw"].to_pylist(), t["clean"].to_pylist()))
+    _memos[name] = (version, memo)
+    return memo
+
+def _save_memo(fn, memo: dict) -> None:
+    name, version = _memo_key(fn)
+    path = _memo_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    t = pa.table({"raw": pa.array(list(memo), pa.string()), "clean": pa.array(list(memo.values()), pa.string())})
+    tmp = path.with_name(path.name + ".tmp")
+    pq.write_table(t.replace_schema_metadata({"version": version}), tmp)
+    tmp.replace(path)
+
+#------map over distinct values------
+def map_unique(s: pd.Series, fn, *, vectorized: bool = False, memo: bool = False) -> pd.Series:
+    """fn applied to each distinct value of `s` once, broadcast back to every row.
+
+    fn is a scalar cleaner (value -> value, called once for NA too), or with vectorized=True
+    a Series -> Series cleaner called on the distinct values. The result has fn's dtype
+    (object for scalar cleaners, like Series.map). memo=True reuses results across runs
+    (see MEMO_DIR); only for cleaners returning strings or NA."""
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    # distinct values in s's dtype, with NA last (rows coded -1 point at it)
+    values = pd.concat([pd.Series(uniques).astype(s.dtype), pd.Series([None], dtype=s.dtype)], ignore_index=True)
+
+    cache = _load_memo(fn) if memo and MEMO_DIR else None
+    todo = np.ones(len(values), dtype=bool)  # NA (last) is never memoized
+    known = {}
+    if cache:
+        for i, v in enumerate(values.iloc[:-1]):
+            if v in cache:
+                known[i] = cache[v]
+                todo[i] = False
+    if vectorized:
+        part = fn(values[todo].reset_index(drop=True))
+        out = pd.Series(pd.NA, index=range(len(values)), dtype=part.dtype)
+        out[np.flatnonzero(todo)] = part.to_numpy()
+        for i, v in known.items():
+            out[i] = pd.NA if v is None else v
+    else:
+        out = np.empty(len(values), dtype=object)
+        for i in np.flatnonzero(todo):
+            out[i] = fn(values.iat[i])
+        for i, v in known.items():
+            out[i] = pd.NA if v is None else v
+        out = pd.Series(out)
+    if cache is not None:
+        new = {values.iat[i]: out.iat[i] for i in np.flatnonzero(todo[:-1])}
+        if new:
+            cache.update({k: (None if pd.isna(v) else str(v)) for k, v in new.items()})
+            _save_memo(fn, cache)
+    return pd.Series(out.array.take(np.where(codes < 0, len(values) - 1, codes)), index=s.index, name=s.name)
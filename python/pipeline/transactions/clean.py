@@ -0,0 +1,39 @@
+# per-line cleaning of transactions_canonical; cli.transactions runs it over the whole file,
+# in chunks or over an --incremental delta, and pipeline.transactions.incremental versions
+# its state on everything this imports
+from __future__ import annotations
+from pathlib import Path
+import pandas as pd
+
+from pipeline.transactions.remove_known_bugs import remove_known_bugs
+from pipeline.transactions.currency import fix_six_digit_prices, unify_price_to_sek
+from pipeline.transactions.customer_enrich import enrich_tx_with_customers, filter_tx_by_age
+from pipeline.transactions.line_totals import normalize_quantity_to_str, compute_and_filter_line_total_sek
+from pipeline.transactions.country_label import label_country
+
+def clean_transactions(tx: pd.DataFrame, a_lu: pd.DataFrame, customers: pd.DataFrame, *,
+                       min_created: str, fx_store: Path, fx_asof: bool = False,
+                       rates: dict[str, float] | None = None,
+                       allow_fallback_fx: bool | None = None) -> pd.DataFrame:
+    tx = remove_known_bugs(tx, a_lu, min_created=min_created)
+
+    tx = fix_six_digit_prices(tx)
+    # rates come from the shared store in <interim>; fx_asof prices each line at its own date
+    tx = unify_price_to_sek(tx, fx_store=fx_store, created_col="created" if fx_asof else None,
+                            rates=None if fx_asof else rates, allow_fallback_fx=allow_fallback_fx)
+
+    tx = label_country(tx, src_col="currency_country", out_col="country", drop_src=True)
+
+    tx = enrich_tx_with_customers(tx, customers, id_col="shopUserId", customer_cols=("Age","Gender"))
+    tx = filter_tx_by_age(tx, age_col="Age", lo=10, hi=105)
+
+    tx = normalize_quantity_to_str(tx)
+    tx = compute_and_filter_line_total_sek(tx)
+
+    tx["price"] = pd.to_numeric(tx["price"], errors="coerce").astype("Float64")
+    # stored trimmed so readers can push groupId filters down to the Parquet scan
+    tx["groupId"] = tx["groupId"].str.strip()
+    # partition key of transactions_clean, next to country
+    month = tx["created"].to_numpy("datetime64[M]").astype(str)  # "2025-01"; much faster than strftime
+    tx["year_month"] = pd.Series(month, index=tx.index).where(tx["created"].notna())
+    return tx
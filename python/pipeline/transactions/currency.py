@@ -1,6 +1,8 @@
 from __future__ import annotations
+from pathlib import Path
 import pandas as pd
-import requests
+
+from pipeline import fx
 
 CURRENCYID_TO_COUNTRY = {
     "40":  "DK",
@@ -8,6 +10,7 @@ CURRENCYID_TO_COUNTRY = {
     "103": "NO",
     "50":  "FI",
 }
+COUNTRY_TO_CURRENCY = {"DK": "DKK", "SE": "SEK", "NO": "NOK", "FI": "EUR"}
 
 def fix_six_digit_prices(df: pd.DataFrame, *, price_col: str = "price") -> pd.DataFrame:
     out = df.copy()
@@ -17,23 +20,11 @@ def fix_six_digit_prices(df: pd.DataFrame, *, price_col: str = "price") -> pd.Da
     out[price_col] = pd.to_numeric(out[price_col], errors="coerce").astype("Float64")
     return out
 
-def fetch_sek_rates(timeout: int = 10) -> dict[str, float]:
-    resp = requests.get(
-        "https://api.frankfurter.app/latest",
-        params={"from": "EUR", "to": "SEK,DKK,NOK"},
-        timeout=timeout,
-    )
-    resp.raise_for_status()
-    rates = resp.json()["rates"]
-    sek_per_eur = float(rates["SEK"])
-    dkk_per_eur = float(rates["DKK"])
-    nok_per_eur = float(rates["NOK"])
-    return {
-        "DK": sek_per_eur / dkk_per_eur,
-        "NO": sek_per_eur / nok_per_eur,
-        "SE": 1.0,
-        "FI": sek_per_eur,
-    }
+def fetch_sek_rates(timeout: int = 10, store: Path | None = None,
+                    allow_fallback: bool | None = None) -> dict[str, float]:
+    # latest SEK rate per currency country, from the shared store (see pipeline.fx)
+    r = fx.sek_rates(store, timeout=timeout, allow_fallback=allow_fallback)
+    return {k: 1.0 if cur == "SEK" else r[cur] for k, cur in COUNTRY_TO_CURRENCY.items()}
 
 def unify_price_to_sek(
     df: pd.DataFrame,
@@ -43,13 +34,24 @@ def unify_price_to_sek(
     out_col: str = "price_sek",
     add_cols: bool = True,
     rates: dict[str, float] | None = None,
+    fx_store: Path | None = None,
+    created_col: str | None = None,
+    allow_fallback_fx: bool | None = None,
 ) -> pd.DataFrame:
+    """price in SEK. Rates are `rates` (per currency country) or the latest in fx_store; with
+    created_col, each row uses the rate of its own date instead (as-of the last ECB day before)."""
     out = df.copy()
     cur = out[currency_id_col].astype("string").str.strip()
     country = cur.map(CURRENCYID_TO_COUNTRY)
-    if rates is None:
-        rates = fetch_sek_rates()
-    rate = country.map(rates)
+    if rates is None and created_col is not None:
+        created = pd.to_datetime(out[created_col], errors="coerce")
+        hist = fx.sek_rate_history(created.min(), created.max(), fx_store) if created.notna().any() else fx.load_history(None)
+        rate = pd.Series(fx.rates_asof(created, hist, country.map(COUNTRY_TO_CURRENCY)), index=out.index)
+        # days the store cannot cover (offline, API down) use the latest rates
+        rate = rate.fillna(country.map(fetch_sek_rates(store=fx_store, allow_fallback=allow_fallback_fx)))
+    else:
+        rate = country.map(rates if rates is not None
+                           else fetch_sek_rates(store=fx_store, allow_fallback=allow_fallback_fx))
     price = pd.to_numeric(out[price_col], errors="coerce")
     price_sek = (price * rate).round(0).astype("Int64")
     if add_cols:
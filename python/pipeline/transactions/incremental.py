@@ -0,0 +1,257 @@
+from __future__ import annotations
+from pathlib import Path
+import hashlib, json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from pipeline import sources
+from pipeline.io import (
+    artifact_exists, iter_parquet_batches, partition_filter, partition_keys, read_schema, read_table, write_partitions,
+)
+from pipeline.telemetry import track
+
+# State for `cli.transactions --incremental`, kept in <interim>:
+#   transactions_state.json    what the last run depended on (cleaning code, min_created,
+#                              articles, FX mode and rates)
+#   transactions_lines.parquet (orderId, sku, hash) of every canonical line the last run saw;
+#                              the hash covers the whole canonical row
+#   customers_changed.parquet  canonical shopUserIds whose remap, city, age or gender changed
+#                              since transactions last ran; written by cli.customers and consumed
+#                              (deleted) here. all=1 in its metadata means every customer.
+# A run cleans the canonical lines whose hash is new (new or edited lines, whatever their
+# date), plus every line of a changed customer, and upserts them into transactions_clean keyed
+# on (orderId, sku); keys whose old hash is gone are replaced or deleted. Only the
+# (country, year_month) partitions holding covered or cleaned lines are rewritten.
+# Anything else in the state changing means a full rebuild.
+STATE_FILE = "transactions_state.json"
+LINES_FILE = "transactions_lines.parquet"
+CHANGED_FILE = "customers_changed.parquet"
+KEYS = ("orderId", "sku")
+# the state is versioned on every repo module these import: the cleaning, the FX store, and
+# pipeline.io, whose ARTIFACT_TYPES shape the lines that are written
+CLEANING = ("pipeline.transactions.clean", "pipeline.transactions.incremental", "pipeline.io")
+
+def code_version() -> str:
+    return sources.code_version(*CLEANING)
+
+def frame_digest(df: pd.DataFrame) -> str:
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()[:16]
+
+#------state------
+def load_state(interim: Path) -> dict | None:
+    p = Path(interim) / STATE_FILE
+    return json.loads(p.read_text()) if p.exists() else None
+
+def save_state(interim: Path, state: dict) -> None:
+    p = Path(interim) / STATE_FILE
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(p.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True))
+    tmp.replace(p)
+
+def line_hashes(canonical: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy()
+
+def load_lines(interim: Path) -> pd.DataFrame | None:
+    p = Path(interim) / LINES_FILE
+    return pq.read_table(p).to_pandas() if p.exists() else None
+
+def save_lines(interim: Path, keys: pd.DataFrame, hashes: np.ndarray) -> None:
+    """Store the KEYS and line_hashes of every canonical line."""
+    p = Path(interim) / LINES_FILE
+    p.parent.mkdir(parents=True, exist_ok=True)
+    t = pa.table({**{k: pa.array(keys[k].astype("string").to_numpy(dtype=object, na_value=None), pa.string())
+                     for k in KEYS}, "hash": pa.array(hashes, pa.uint64())})
+    tmp = p.with_name(p.name + ".tmp")
+    pq.write_table(t, tmp, compression="zstd")
+    tmp.replace(p)
+
+def changed_lines(keys: pd.DataFrame, hashes: np.ndarray, prev: pd.DataFrame,
+                  owned: np.ndarray) -> tuple[np.ndarray, pd.DataFrame]:
+    """Lines to clean again, as a mask over the canonical `keys`/`hashes`, and the KEYS of
+    `prev` (load_lines) lines no longer in the source as they were (edited or deleted).
+    `owned` marks the lines of changed customers. A key can hold several lines; when one of
+    them is new, gone or owned, all of them are cleaned."""
+    old = prev["hash"].to_numpy()
+    gone = prev.loc[~np.isin(old, hashes), list(KEYS)]
+    new = ~np.isin(hashes, old) | owned
+    replace = pa.concat_arrays([_key(_table(keys[new])).combine_chunks(), _key(_table(gone)).combine_chunks()])
+    mask = pc.is_in(_key(_table(keys)), value_set=replace).to_numpy(zero_copy_only=False)
+    return mask, gone
+
+def shared_keys(prev: pd.DataFrame) -> pa.Array:
+    """Joined KEYS held by more than one `prev` (load_lines) line."""
+    keys = _key(_table(prev)).combine_chunks()
+    return keys.filter(pa.array(pd.Series(keys.to_numpy(zero_copy_only=False)).duplicated(keep=False).to_numpy()))
+
+def candidate_lines(keys: pd.DataFrame, hashes: np.ndarray, prev: pd.DataFrame, owned: np.ndarray,
+                    shared: pa.Array) -> np.ndarray:
+    """A superset of changed_lines' mask that one chunk of lines can decide: new or owned
+    lines, lines sharing a key with one of them, and lines whose key had several lines
+    before (shared_keys), one of which may be gone. It misses only an unchanged line whose
+    key gains a line in another chunk."""
+    new = ~np.isin(hashes, prev["hash"].to_numpy()) | owned
+    key = _key(_table(keys)).combine_chunks()
+    touched = pa.concat_arrays([key.filter(pa.array(new)), shared])
+    return pc.is_in(key, value_set=touched).to_numpy(zero_copy_only=False)
+
+def _table(keys: pd.DataFrame) -> pa.Table:
+    return pa.Table.from_pandas(keys[list(KEYS)].astype("string"), preserve_index=False)
+
+def stale_reason(state: dict | None, expected: dict) -> str | None:
+    """Why the last run's state can't be continued from, or None."""
+    if state is None:
+        return "no previous state"
+    for k, v in expected.items():
+        if state.get(k) != v:
+            return f"{k} changed"
+    return None
+
+#------changed customers------
+def record_changed_customers(interim: Path, ids=None) -> None:
+    """Add canonical ids to the changed set for the next incremental transactions run;
+    ids=None marks every customer as changed (a full customers rebuild)."""
+    p = Path(interim) / CHANGED_FILE
+    prev = pq.read_table(p) if p.exists() else None
+    everyone = ids is None or (prev is not None and (prev.schema.metadata or {}).get(b"all") == b"1")
+    ids = [] if everyone else list(ids)
+    if prev is not None and not everyone:
+        ids = pd.unique(np.concatenate([prev["shopUserId"].to_numpy(zero_copy_only=False), np.asarray(ids, dtype=object)]))
+    t = pa.table({"shopUserId": pa.array(list(ids), pa.string())})
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(p.name + ".tmp")
+    pq.write_table(t.replace_schema_metadata({"all": "1" if everyone else "0"}), tmp)
+    tmp.replace(p)
+
+def changed_customers(interim: Path) -> list[str] | None:
+    """Changed canonical ids recorded by cli.customers ([] when none); None means all."""
+    p = Path(interim) / CHANGED_FILE
+    if not p.exists():
+        return []
+    t = pq.read_table(p)
+    if (t.schema.metadata or {}).get(b"all") == b"1":
+        return None
+    return t["shopUserId"].to_pylist()
+
+def consume_changed_customers(interim: Path) -> None:
+    (Path(interim) / CHANGED_FILE).unlink(missing_ok=True)
+
+#------delta and upsert------
+def _key(t: pa.Table) -> pa.ChunkedArray:
+    cols = [pc.fill_null(t[k].cast(pa.string()), "") for k in KEYS]
+    return pc.binary_join_element_wise(*cols, "\x1f")
+
+def covered(clean: pa.Table, keys: pd.DataFrame, ids: list[str]) -> pa.ChunkedArray:
+    """Mask of the transactions_clean lines a delta replaces: every (orderId, sku) in `keys`
+    (the delta input and the lines gone from the source), so reprocessing the same delta is
+    idempotent and lines the delta dropped or that left the source disappear, and the lines
+    of `ids`. `clean` needs only the KEYS and shopUserId columns."""
+    covered = pc.is_in(_key(clean), value_set=_key(_table(keys)).combine_chunks())
+    if ids:
+        owner = clean["shopUserId"].cast(pa.string())
+        covered = pc.or_(covered, pc.fill_null(pc.is_in(owner, value_set=pa.array(ids, pa.string())), False))
+    return covered
+
+def upsert(clean: pa.Table, keys: pd.DataFrame, delta_out: pd.DataFrame,
+           ids: list[str]) -> tuple[pa.Table, dict]:
+    """`clean` (transactions_clean or some of its partitions) with the lines the delta covers
+    (see covered) replaced by its cleaned lines."""
+    kept = clean.filter(pc.invert(covered(clean, keys, ids)))
+    fresh = pa.Table.from_pandas(delta_out, preserve_index=False).select(clean.schema.names).cast(clean.schema)
+    stats = {"replaced": clean.num_rows - kept.num_rows, "upserted": fresh.num_rows}
+    return pa.concat_tables([kept, fresh]), stats
+
+#------run------
+def _hash_pass(canonical: Path, batch_rows: int, ids, prev: pd.DataFrame | None) -> dict:
+    # hash every canonical line a chunk at a time; with `prev`, also keep the lines that may
+    # need cleaning (candidate_lines) and their positions
+    keys, hashes, owned, kept, at = [], [], [], [], []
+    shared = shared_keys(prev) if prev is not None else None
+    start = 0
+    for tx in iter_parquet_batches(canonical, batch_size=batch_rows):
+        keys.append(tx[list(KEYS)])
+        hashes.append(line_hashes(tx))
+        if prev is not None:
+            owned.append(tx["shopUserId"].isin(ids).to_numpy())
+            cand = candidate_lines(keys[-1], hashes[-1], prev, owned[-1], shared)
+            kept.append(tx[cand])
+            at.append(start + np.flatnonzero(cand))
+        start += len(tx)
+    return {
+        "keys": pd.concat(keys, ignore_index=True) if keys else pd.DataFrame(columns=list(KEYS)),
+        "hashes": np.concatenate(hashes) if hashes else np.empty(0, np.uint64),
+        "owned": np.concatenate(owned) if owned else np.empty(0, bool),
+        "kept": kept,
+        "at": np.concatenate(at) if at else np.empty(0, np.int64),
+    }
+
+def _delta(canonical: Path, batch_rows: int, seen: dict, pick: np.ndarray) -> pd.DataFrame:
+    # the picked lines: from the kept candidates, plus a rescan for any they missed
+    if seen["kept"]:
+        delta = pd.concat(seen["kept"], ignore_index=True)[pick[seen["at"]]].reset_index(drop=True)
+    else:
+        delta = read_schema(canonical).empty_table().to_pandas()
+    missed = pick.copy()
+    missed[seen["at"]] = False
+    if missed.any():
+        # unchanged lines sharing a key with a new line in another chunk: rare, one more scan
+        extra, start = [], 0
+        for tx in iter_parquet_batches(canonical, batch_size=batch_rows):
+            extra.append(tx[missed[start:start + len(tx)]])
+            start += len(tx)
+        delta = pd.concat([delta, *extra], ignore_index=True)
+    return delta
+
+def _finish(interim: Path, expected: dict, keys: pd.DataFrame, hashes: np.ndarray) -> None:
+    save_lines(interim, keys, hashes)
+    save_state(interim, expected)
+    consume_changed_customers(interim)
+
+def run_incremental(canonical: Path, clean_path: Path, interim: Path, expected: dict, clean_fn, *,
+                    batch_rows: int = 500_000) -> dict:
+    """Clean the canonical lines that changed since the last run and upsert them into the
+    partitions of `clean_path` that hold them. `expected` is what the state must match
+    (stale_reason); `clean_fn` turns canonical lines into clean ones.
+
+    Returns {"rebuild": reason} when the state can't be continued from (nothing is written;
+    rebuild transactions_clean, then call save_rebuild), else the counts of the upsert."""
+    state, prev = load_state(interim), load_lines(interim)
+    ids = changed_customers(interim)
+    reason = stale_reason(state, expected)
+    if reason is None and ids is None:
+        reason = "customers were rebuilt"
+    if reason is None and prev is None:
+        reason = "no line hashes"
+    if reason is None and not artifact_exists(clean_path):
+        reason = "no transactions_clean"
+    if reason is not None:
+        return {"rebuild": reason}
+
+    seen = _hash_pass(canonical, batch_rows, ids, prev)
+    pick, gone = changed_lines(seen["keys"], seen["hashes"], prev, seen["owned"])
+    delta = _delta(canonical, batch_rows, seen, pick)
+    replace = pd.concat([delta[list(KEYS)], gone], ignore_index=True)
+    with track("transactions", "upsert") as rec:
+        out = clean_fn(delta)
+        # rewrite only the partitions with a covered line or a cleaned one
+        index = read_table(clean_path, columns=[*KEYS, "shopUserId", "country", "year_month"])
+        hit = index.filter(covered(index, replace, ids))
+        parts = sorted(set(partition_keys(hit, "transactions_clean"))
+                       | set(partition_keys(pa.Table.from_pandas(out, preserve_index=False), "transactions_clean")),
+                       key=str)
+        part = read_table(clean_path, filters=partition_filter("transactions_clean", parts))
+        table, st = upsert(part, replace, out, ids)
+        write_partitions(table, clean_path, parts)
+        stats = {"rebuild": None, "delta": len(delta), "gone": len(gone), "changed_customers": len(ids),
+                 "partitions": len(parts), **st}
+        rec.update({k: v for k, v in stats.items() if k != "rebuild"})
+    _finish(interim, expected, seen["keys"], seen["hashes"])
+    return stats
+
+def save_rebuild(canonical: Path, interim: Path, expected: dict, *, batch_rows: int = 500_000) -> None:
+    """Record a full rebuild of transactions_clean as the state the next run continues from."""
+    seen = _hash_pass(canonical, batch_rows, None, None)
+    _finish(interim, expected, seen["keys"], seen["hashes"])
@@ -0,0 +1,83 @@
+# throughput and recall of the blocked fuzzy duplicate search on synthetic customers with injected typos
+from pathlib import Path
+import argparse, sys, time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "python"))
+from pipeline.customers.fuzzy_match import fuzzy_duplicates
+from pipeline.customers.name_last_name import clean_customer_name_fields
+from pipeline.telemetry import peak_rss_mb
+from gen_synthetic import customers
+
+def typo(names: np.ndarray, rng) -> np.ndarray:
+    """One random edit per name: drop, double, swap or replace a character."""
+    out = []
+    for s, kind, u in zip(names, rng.integers(0, 4, len(names)), rng.random(len(names))):
+        i = int(u * max(len(s) - 1, 1))
+        if kind == 0:
+            s = s[:i] + s[i + 1:]
+        elif kind == 1:
+            s = s[:i] + s[i] + s[i:]
+        elif kind == 2 and len(s) > 1:
+            s = s[:i] + s[i + 1] + s[i] + s[i + 2:]
+        else:
+            s = s[:i] + "aeiouyåäö"[i % 9] + s[i + 1:]
+        out.append(s)
+    return np.array(out, dtype=object)
+
+def typo_customers(n: int, frac: float, rng) -> tuple[pd.DataFrame, set]:
+    """Synthetic customers plus `frac` re-registrations with a typo in one name; returns truth pairs."""
+    df = customers(n, rng).reset_index(drop=True)
+    src = df.sample(frac=frac, random_state=int(rng.integers(1 << 31)))
+    dup = src.copy()
+    dup["shopUserId"] = (df["shopUserId"].astype(int).max() + 1 + np.arange(len(dup))).astype(str)
+    col = np.where(rng.random(len(dup)) < 0.5, "invoiceFirstName", "invoiceLastName")
+    for c in ("invoiceFirstName", "invoiceLastName"):
+        m = col == c
+        dup.loc[m, c] = typo(dup.loc[m, c].to_numpy(), rng)
+    truth = set(zip(src["shopUserId"], dup["shopUserId"]))
+    return pd.concat([df, dup], ignore_index=True), truth
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Throughput and recall of fuzzy_duplicates on synthetic customers.")
+    ap.add_argument("--n", type=int, default=1_000_000, help="customers before duplicates are added")
+    ap.add_argument("--typos", type=float, default=0.02, help="share re-registered with a typo")
+    ap.add_argument("--threshold", type=float, default=0.85)
+    ap.add_argument("--chunk-pairs", type=int, default=1_000_000)
+    ap.add_argument("--delta", type=float, default=0.01, help="share treated as new for the incremental run")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    t0 = time.perf_counter()
+    df, truth = typo_customers(args.n, args.typos, rng)
+    df = clean_customer_name_fields(df)
+    print(f"{len(df):,} customer rows ({len(truth):,} typo duplicates) generated in {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    pairs, st = fuzzy_duplicates(df, threshold=args.threshold, chunk_pairs=args.chunk_pairs)
+    wall = time.perf_counter() - t0
+    found = {tuple(sorted(p)) for p in zip(pairs["id_a"], pairs["id_b"])}
+    hit = sum(tuple(sorted(p)) in found for p in truth)
+    # a person is a generated customer (gen_synthetic's re-registrations copy name, zip and
+    # SSN) together with its typo copies; a match across two persons is a false merge
+    person = df.groupby(["invoiceFirstName", "invoiceLastName", "invoiceZip", "invoiceSSN"]).ngroup()
+    person = dict(zip(df["shopUserId"], person))
+    person.update({dup: person[src] for src, dup in truth})
+    false = sum(1 for a, b in found if person[a] != person[b])
+    print(f"full run:    {wall:6.1f}s  {len(df) / wall:>10,.0f} rows/s  {st['scored'] / wall:>10,.0f} pairs/s  "
+          f"{st['candidates']:,} candidates, {st['scored']:,} scored, {st['matches']:,} matches")
+    print(f"             typo recall {hit / max(len(truth), 1):.1%}, precision {1 - false / max(len(found), 1):.2%} "
+          f"({false:,} pairs of different people, {st['conflicts']:,} rejected on SSN or birth date, "
+          f"{st['no_ssn']:,} lacking an SSN), "
+          f"peak RSS {peak_rss_mb():,.0f} MB")
+
+    only = pd.Series(rng.random(len(df)) < args.delta)
+    t0 = time.perf_counter()
+    _, st = fuzzy_duplicates(df, threshold=args.threshold, chunk_pairs=args.chunk_pairs, only=only)
+    wall = time.perf_counter() - t0
+    print(f"delta {args.delta:.0%}:    {wall:6.1f}s  {st['scored']:,} pairs scored, {st['matches']:,} matches")
+
+if __name__ == "__main__":
+    main()
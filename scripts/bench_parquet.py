@@ -0,0 +1,77 @@
+# compare plain to_parquet against the pipeline.io writer policy on a processed artifact
+from pathlib import Path
+import argparse, sys, tempfile, time
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "python"))
+from pipeline.config import load_cfg
+from pipeline.io import write_parquet
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+def parquet_files(path: Path) -> list[Path]:
+    # a partitioned artifact is a directory of files
+    return sorted(path.rglob("*.parquet")) if path.is_dir() else [path]
+
+def row_groups_hit(path: Path, column: str, keys: list[str]) -> tuple[int, int]:
+    """(row groups whose min/max range can contain one of `keys`, total row groups)."""
+    keys = sorted(keys)
+    hit = total = 0
+    for f in parquet_files(path):
+        meta = pq.ParquetFile(f).metadata
+        idx = meta.schema.to_arrow_schema().get_field_index(column)
+        total += meta.num_row_groups
+        for i in range(meta.num_row_groups):
+            st = meta.row_group(i).column(idx).statistics
+            if st is None or not st.has_min_max:
+                hit += 1
+                continue
+            j = np.searchsorted(keys, st.min)
+            hit += j < len(keys) and keys[j] <= st.max
+    return hit, total
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Read/write timings of plain vs policy-tuned Parquet for one artifact.")
+    ap.add_argument("--cfg", default="configs/base.yaml")
+    ap.add_argument("--artifact", default="transactions_clean")
+    ap.add_argument("--column", default="groupId")
+    ap.add_argument("--keys", type=int, default=5, help="distinct values in the filter")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    src = Path(load_cfg(args.cfg)["processed"]) / f"{args.artifact}.parquet"
+    df = pd.read_parquet(src)
+    distinct = df[args.column].dropna().astype(str).unique()
+    rng = np.random.default_rng(args.seed)
+    keys = sorted(rng.choice(distinct, min(args.keys, len(distinct)), replace=False).tolist())
+    filters = [(args.column, "in", keys)]
+    print(f"{src}: {len(df):,} rows, filter on {len(keys)}/{len(distinct)} {args.column} values")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = Path(tmp) / "plain" / f"{args.artifact}.parquet"
+        tuned = Path(tmp) / "tuned" / f"{args.artifact}.parquet"
+        plain.parent.mkdir()
+        t_plain = best_of(lambda: df.to_parquet(plain, index=False), 1)
+        t_tuned = best_of(lambda: write_parquet(df, tuned, args.artifact), 1)
+
+        print(f"{'layout':<6} {'write s':>8} {'MiB':>8} {'full s':>8} {'filtered s':>11} {'row groups':>11} {'rows':>9}")
+        for label, path, t_write in (("plain", plain, t_plain), ("tuned", tuned, t_tuned)):
+            t_full = best_of(lambda: pd.read_parquet(path), args.repeat)
+            t_filt = best_of(lambda: pd.read_parquet(path, filters=filters), args.repeat)
+            hit, total = row_groups_hit(path, args.column, keys)
+            rows = len(pd.read_parquet(path, columns=[args.column], filters=filters))
+            size = sum(f.stat().st_size for f in parquet_files(path))
+            print(f"{label:<6} {t_write:>8.3f} {size / 2**20:>8.2f} {t_full:>8.3f} "
+                  f"{t_filt:>11.3f} {f'{hit}/{total}':>11} {rows:>9,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# run the pipeline on synthetic data at several scales and tabulate per-stage time and memory
+from pathlib import Path
+import argparse, math, os, subprocess, sys, time
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "python"))
+from pipeline.telemetry import load_records
+from gen_synthetic import generate
+
+def bench_scale(work: Path, scale: float, stages: list[str], cpus: int, seed: int) -> pd.DataFrame:
+    """Generate (once) and run one scale in work/x<scale>; returns its stage telemetry."""
+    base = work / f"x{scale:g}"
+    ext = base / "external"
+    if not (ext / "transactions.csv").exists():
+        t0 = time.perf_counter()
+        counts = generate(ext, scale, seed)
+        print(f"[x{scale:g}] generated " + ", ".join(f"{k} {v:,}" for k, v in counts.items())
+              + f" in {time.perf_counter() - t0:.1f}s")
+    cfg = base / "cfg.yaml"
+    cfg.write_text("".join(f"{k}: {base / k}\n" for k in ("external", "interim", "processed")))
+
+    run_id = f"bench-x{scale:g}-{time.strftime('%Y%m%dT%H%M%S')}"
+    env = {**os.environ, "PIPELINE_RUN_ID": run_id, "PIPELINE_LOG_DIR": str(base / "logs"),
+           "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT / "python"), os.environ.get("PYTHONPATH")]))}
+    # --force: a benchmark must not be served from the stage cache
+    cmd = [sys.executable, "-m", "cli.main", *stages, "--cfg", str(cfg), "--cpus", str(cpus), "--force"]
+    rc = subprocess.run(cmd, cwd=ROOT, env=env).returncode
+    if rc:
+        print(f"[x{scale:g}] pipeline exited with {rc}; partial results below")
+    recs = [r for r in load_records(base / "logs") if r["run"] == run_id and r.get("step") is None]
+    df = pd.DataFrame(recs, columns=["stage", "status", "wall_s", "cpu_s", "peak_rss_mb", "rows_in", "rows_out"])
+    df.insert(0, "scale", scale)
+    return df
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Per-stage wall time and peak RSS of the pipeline at several data scales.")
+    ap.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100])
+    ap.add_argument("--stages", nargs="*", default=[], help="stages to run (default: all)")
+    ap.add_argument("--work", type=Path, default=ROOT / "data" / "bench", help="data is generated here and reused")
+    ap.add_argument("--cpus", type=int, default=1, help="runner CPU budget; 1 runs stages one at a time")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--csv", type=Path, help="also write the results table here")
+    args = ap.parse_args()
+
+    res = pd.concat([bench_scale(args.work, s, args.stages, args.cpus, args.seed) for s in args.scales],
+                    ignore_index=True)
+    if args.csv:
+        res.to_csv(args.csv, index=False)
+    with pd.option_context("display.width", 200, "display.max_columns", 50):
+        for metric in ("wall_s", "peak_rss_mb", "rows_in"):
+            table = res.pivot_table(index="stage", columns="scale", values=metric, aggfunc="max")
+            print(f"\n{metric}")
+            print(table.to_string(na_rep="-"))
+        if len(args.scales) > 1:
+            # growth per 10x of input: ~10 is linear, well above 10 is super-linear
+            lo, hi = min(args.scales), max(args.scales)
+            wall = res.pivot_table(index="stage", columns="scale", values="wall_s", aggfunc="max")
+            growth = (wall[hi] / wall[lo]) ** (1 / max(1e-9, math.log10(hi / lo)))
+            print(f"\nwall time growth per 10x scale (x{lo:g} -> x{hi:g})")
+            print(growth.round(1).to_string(na_rep="-"))
+
+if __name__ == "__main__":
+    main()
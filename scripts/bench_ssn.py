@@ -0,0 +1,67 @@
+# check the vectorized derive_gender_age against the row-wise reference and time both
+from pathlib import Path
+import argparse, sys, time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "python"))
+from pipeline.customers.ssn import derive_gender_age, derive_gender_age_rowwise
+from gen_synthetic import COUNTRIES, _ssn
+
+def fuzz(n: int, rng) -> pd.DataFrame:
+    """Well-formed SSNs per country plus the junk the export also contains."""
+    country = rng.choice([*COUNTRIES, "999", ""], n, p=[0.45, 0.15, 0.15, 0.15, 0.05, 0.05])
+    born = pd.to_datetime("1890-01-01") + pd.to_timedelta(rng.integers(0, 365 * 135, n), unit="D")
+    ssn = _ssn(np.where(np.isin(country, list(COUNTRIES)), country, "205"), born, rng)
+
+    k = n // 3   # rewrite a third of them into edge cases
+    idx = rng.choice(n, k, replace=False)
+    lens = rng.integers(0, 15, k)
+    junk = ["".join(rng.choice(list("0123456789"), l)) for l in lens]
+    seps = rng.choice(["", "-", "+", "A", "a", " ", "X", "--"], k)
+    pos = rng.integers(0, 12, k)
+    junk = [j[:p] + s + j[p:] for j, s, p in zip(junk, seps, pos)]
+    kinds = rng.integers(0, 10, k)
+    for i, (j, kind) in enumerate(zip(junk, kinds)):
+        if kind == 0:
+            junk[i] = f"  {j}\t"                      # surrounding whitespace
+        elif kind == 1:
+            junk[i] = j + rng.choice(list("xyzABC_9"))  # trailing check character
+        elif kind == 2:
+            junk[i] = j.replace("1", "١")              # non-ASCII digits
+        elif kind == 3:
+            junk[i] = "29" + "02" + rng.choice(["00", "04", "23", "24", "25"]) + "-1234"  # leap days
+    ssn[idx] = junk
+    ssn = pd.array(ssn, dtype="string")
+    ssn[rng.random(n) < 0.03] = pd.NA
+    return pd.DataFrame({"invoiceSSN": ssn, "invoiceCountryId": pd.Categorical(country)})
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Equivalence check and timing of vectorized vs row-wise SSN parsing.")
+    ap.add_argument("--n", type=int, default=200_000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    df = fuzz(args.n, np.random.default_rng(args.seed))
+    t0 = time.perf_counter()
+    ref = derive_gender_age_rowwise(df)
+    t_ref = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    new = derive_gender_age(df)
+    t_new = time.perf_counter() - t0
+
+    print(f"{args.n:,} rows: row-wise {t_ref:.2f}s, vectorized {t_new:.3f}s ({t_ref / t_new:.0f}x)")
+    try:
+        pd.testing.assert_frame_equal(ref, new)
+    except AssertionError as e:
+        bad = ~((ref["Gender"] == new["Gender"]) | (ref["Gender"].isna() & new["Gender"].isna())) \
+              | ~((ref["Age"] == new["Age"]) | (ref["Age"].isna() & new["Age"].isna()))
+        print(e)
+        print(pd.concat([df[bad], ref.loc[bad, ["Gender", "Age"]].add_suffix("_ref"),
+                         new.loc[bad, ["Gender", "Age"]]], axis=1).head(20).to_string())
+        sys.exit(1)
+    known = ref["Age"].notna().mean()
+    print(f"identical Gender/Age on every row ({known:.0%} with a known age)")
+
+if __name__ == "__main__":
+    main()
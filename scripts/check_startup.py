@@ -0,0 +1,71 @@
+# startup budget for the CLI: trivial commands must not import the heavy stacks
+from pathlib import Path
+import argparse, os, subprocess, sys, time
+
+ROOT = Path(__file__).resolve().parents[1]
+HEAVY = ("torch", "faiss", "transformers", "sentence_transformers", "cornac", "sklearn", "mlxtend")
+COMMANDS = [
+    ["--help"],
+    ["run", "--help"],
+    ["run", "--dry-run", "--cfg", "{cfg}"],
+    ["telemetry", "--help"],
+    ["semantic_similarity", "--help"],
+    ["iicf_ease", "--help"],
+    ["lift", "--help"],
+    ["top_same_brand", "--help"],
+    ["hybrid", "--help"],
+    ["worker", "--help"],
+]
+
+def _env() -> dict:
+    return {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT / "python"), os.environ.get("PYTHONPATH")]))}
+
+def wall(cmd: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "cli", *cmd], cwd=ROOT, env=_env(),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def imports(cmd: list[str]) -> dict[str, int]:
+    """Modules imported by `cmd` with their cumulative import time (µs)."""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-m", "cli", *cmd], cwd=ROOT, env=_env(),
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    out = {}
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line.split("|")
+        if cum.strip().isdigit():
+            out[name.strip()] = int(cum)
+    return out
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Fail when a trivial CLI command exceeds its startup budget.")
+    ap.add_argument("--cfg", default="configs/base.yaml")
+    ap.add_argument("--budget", type=float, default=0.5, help="seconds per command (best of --repeat)")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    bad = 0
+    for cmd in COMMANDS:
+        cmd = [a.format(cfg=args.cfg) for a in cmd]
+        t = wall(cmd, args.repeat)
+        mods = imports(cmd)
+        heavy = sorted({m.split(".")[0] for m in mods} & set(HEAVY))
+        ok = t <= args.budget and not heavy
+        bad += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {t:6.3f}s  python -m cli {' '.join(cmd)}")
+        if heavy:
+            print(f"       imports {', '.join(heavy)}")
+        if t > args.budget:
+            # third-party packages only; our own modules' times include them
+            third = {m: us for m, us in mods.items() if "." not in m and m not in ("cli", "pipeline", "site")}
+            top = sorted(third.items(), key=lambda kv: -kv[1])[:5]
+            print("       slowest imports: " + ", ".join(f"{m} {us / 1e6:.2f}s" for m, us in top))
+    sys.exit(1 if bad else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# synthetic customers.csv / transactions.csv / products.csv shaped like the Åshild exports
+from pathlib import Path
+import argparse, time
+import numpy as np
+import pandas as pd
+
+# scale 1 ≈ one year of the real shop; everything grows linearly with --scale
+BASE = {"customers": 20_000, "groups": 1_500, "orders": 60_000}
+COUNTRIES = {  # invoiceCountryId -> (share, currencyId, local price per SEK)
+    "205": (0.62, "134", 1.0),   # Sweden, SEK
+    "160": (0.14, "103", 1.0),   # Norway, NOK
+    "58": (0.14, "40", 0.65),    # Denmark, DKK
+    "72": (0.10, "50", 0.087),   # Finland, EUR
+}
+BAD_GROUPS = ["12025DK", "12025FI", "12025NO", "12025SE", "970300", "459978"]
+FREIGHT = {"58": 0, "72": 1, "160": 2, "205": 3}   # country -> its shipping line in BAD_GROUPS
+
+FIRST = ["Anna", "Eva", "Maria", "Karin", "Kristina", "Lena", "Kerstin", "Ingrid", "Marie", "Birgitta",
+         "Inger", "Ulla", "Margareta", "Elisabeth", "Gunilla", "Mette", "Hanne", "Kari", "Liv", "Aino",
+         "Ann-Lisbet", "Else Marie", "Lars", "Anders", "Johan", "Per", "Mikael", "Jari", "Ole", "Bjørn"]
+LAST = ["Andersson", "Johansson", "Karlsson", "Nilsson", "Eriksson", "Larsson", "Olsson", "Persson",
+        "Jensen", "Nielsen", "Hansen", "Pedersen", "Johansen", "Olsen", "Berg", "Haugen", "Korhonen",
+        "Virtanen", "Mäkinen", "Nieminen", "Lindqvist", "Melander", "Ström", "Holm", "Sundberg"]
+CITIES = {
+    "205": ["Stockholm", "Göteborg", "Malmö", "Uppsala", "Umeå", "Ursviken", "Älmhult", "Västerås", "Örebro", "Luleå"],
+    "160": ["Oslo", "Bergen", "Trondheim", "Stavanger", "Brandbu", "Tromsø", "Drammen"],
+    "58": ["København", "Aarhus", "Odense", "Aalborg", "Holbæk", "Orø", "Esbjerg"],
+    "72": ["Helsinki", "Espoo", "Tampere", "Vantaa", "Turku", "Oulu", "Vaasa"],
+}
+COUNTRY_TAIL = {"205": "Sverige", "160": "Norge", "58": "Danmark", "72": "Finland"}
+BRANDS = ["Swegmark", "Glamorise", "Anita", "Triumph", "Damella", "Trofé", "Pastunette", "Rosa Faia",
+          "Ulla Popken", "Abecita", "Miss Mary", "Naturana", "Fantasie", "Panache", "Sloggi", "Calida",
+          "Schiesser", "Jockey", "Vedoneire", "Åshild"]
+CATEGORIES = [
+    ("Bh,Underkläder,Bygel-bh", "Dam"), ("Bh utan bygel,Bh,Underkläder", "Dam"),
+    ("Sport-bh,Bh,Underkläder", "Dam"), ("Minimizer,Bh,Underkläder", "Dam"),
+    ("Underkläder,Trosor & gördlar,Trosor", "Dam"), ("Nattlinnen,Sovkläder,Dam", "Dam"),
+    ("Baddräkter,Badkläder,Dam", "Dam"), ("Dam,Blusar,Dam", "Dam,Dam"), ("Byxor,Dam", "Dam"),
+    ("Klänningar,Dam", "Dam"), ("Herr,Skjortor", "Herr"), ("Kalsonger,Herr,Underkläder", "Herr"),
+    ("Frottéhanddukar & badlakan,Hemtextil", ""), ("Påslakanset,Sängkläder,Hemtextil", ""),
+    ("Kuddar", ""), ("Stödartiklar", ""), ("Rea,Dam,Toppar", "Dam"), ("", ""),
+]
+SIZES = ["XS", "S", "M", "L", "XL", "XXL", "36/38", "40/42", "44/46", "75B", "80C", "85D", "90E"]
+COLORS = ["Svart", "Vit", "Beige", "Röd", "Blå", "Marin", "Grå", "Rosa", "Grön"]
+TYPES = (["web", "telephone", "letter"], [0.78, 0.15, 0.07])
+
+def _ssn(country: np.ndarray, born: pd.DatetimeIndex, rng) -> np.ndarray:
+    """invoiceSSN in each country's format (plus some junk), consistent with `born`."""
+    n = len(country)
+    yyyy, yy = born.strftime("%Y").to_numpy(), born.strftime("%y").to_numpy()
+    mmdd, ddmm = born.strftime("%m%d").to_numpy(), born.strftime("%d%m").to_numpy()
+    d3 = np.char.zfill(rng.integers(0, 1000, n).astype(str), 3)
+    d4 = np.char.zfill(rng.integers(0, 10000, n).astype(str), 4)
+    d2 = np.char.zfill(rng.integers(0, 100, n).astype(str), 2)
+    long_se = rng.random(n) < 0.5
+    se = np.where(long_se, yyyy + mmdd + "-" + d4, yy + mmdd + "-" + d4)
+    dk = ddmm + yy + "-" + d4
+    no = ddmm + yy + d3 + d2
+    fi_cent = np.where(born.year.to_numpy() >= 2000, "A", "-")
+    fi = ddmm + yy + fi_cent + d3 + rng.choice(list("0123456789ABCDEFHJKLMNPRSTUVWXY"), n)
+    out = np.select([country == "205", country == "58", country == "160"], [se, dk, no], fi).astype(object)
+    junk = rng.random(n)
+    out[junk < 0.04] = ""
+    out[(junk >= 0.04) & (junk < 0.05)] = "temp"
+    return out
+
+def _zip(country: np.ndarray, rng) -> np.ndarray:
+    n = len(country)
+    z5 = rng.integers(10000, 99999, n).astype(str)
+    z4 = np.char.zfill(rng.integers(1, 9999, n).astype(str), 4)
+    s = pd.Series(z5)
+    se = (s.str[:3] + " " + s.str[3:]).to_numpy()          # Swedish "123 45"
+    return np.select([country == "205", country == "72"], [se, z5], z4).astype(object)
+
+def customers(n: int, rng) -> pd.DataFrame:
+    ids = rng.permutation(np.arange(100_000, 100_000 + int(n * 1.3)))[:n]
+    country = rng.choice(list(COUNTRIES), n, p=[v[0] for v in COUNTRIES.values()])
+    born = pd.to_datetime("1935-01-01") + pd.to_timedelta(rng.integers(0, 365 * 70, n), unit="D")
+    city = np.array([rng.choice(CITIES[c]) for c in country], dtype=object)
+    noise = rng.random(n)
+    # the raw city field is free text: postal codes, country tails, stray spaces
+    city = np.where(noise < 0.05, np.char.add(np.char.add(_zip(country, rng).astype(str), " "), city.astype(str)), city)
+    tail = np.array([COUNTRY_TAIL[c] for c in country])
+    city = np.where((noise >= 0.05) & (noise < 0.08), np.char.add(np.char.add(city.astype(str), ", "), tail), city)
+    city = np.where(noise > 0.99, "  ", city)
+    df = pd.DataFrame({
+        "shopUserId": ids.astype(str),
+        "invoiceFirstName": rng.choice(FIRST, n),
+        "invoiceLastName": rng.choice(LAST, n),
+        "invoiceSSN": _ssn(country, born, rng),
+        "invoiceZip": _zip(country, rng),
+        "invoiceCity": city,
+        "invoiceCountryId": country,
+        "invoiceEmail": [f"user{i}@example.com" for i in ids],
+    })
+    # ~5% of people registered twice (same name + zip, new id): exercises the id remap
+    dup = df.sample(frac=0.05, random_state=int(rng.integers(1 << 31))).copy()
+    dup["shopUserId"] = (ids.max() + 1 + np.arange(len(dup))).astype(str)
+    dup["invoiceEmail"] = [f"user{i}@example.com" for i in dup["shopUserId"]]
+    return pd.concat([df, dup], ignore_index=True).sample(frac=1.0, random_state=int(rng.integers(1 << 31)))
+
+def products(n_groups: int, rng) -> pd.DataFrame:
+    gids = rng.choice(np.arange(200_000, 200_000 + n_groups * 4), n_groups, replace=False)
+    per_group = rng.integers(1, 8, n_groups)
+    gid = np.repeat(gids, per_group).astype(str)
+    n = len(gid)
+    sku = np.char.add(np.char.add(gid, "-"), np.char.zfill(np.concatenate([np.arange(k) for k in per_group]).astype(str), 4))
+    g_cat = rng.integers(0, len(CATEGORIES), n_groups)
+    g_brand = rng.integers(0, len(BRANDS) + 2, n_groups)      # last two: unknown brand
+    g_price = np.round(rng.lognormal(5.6, 0.6, n_groups), -1) - 1
+    cat_idx = np.repeat(g_cat, per_group)
+    brand_idx = np.repeat(g_brand, per_group)
+    price = np.repeat(g_price, per_group)
+    category = np.array([CATEGORIES[i][0] for i in cat_idx], dtype=object)
+    audience = np.array([CATEGORIES[i][1] for i in cat_idx], dtype=object)
+    brand = np.array([BRANDS[i] if i < len(BRANDS) else "" for i in brand_idx], dtype=object)
+    brand_id = np.array([str(i + 1) if i < len(BRANDS) else "" for i in brand_idx], dtype=object)
+    size = rng.choice(SIZES, n)
+    size = np.where(rng.random(n) < 0.1, np.char.add(np.char.add(size, ","), size), size)   # "L,L"
+    sek = np.array([f"{p:.0f}" for p in price], dtype=object)
+    style = rng.random(n)
+    sek[style < 0.05] = [f"{p:,.2f}".replace(",", " ").replace(".", ",") for p in price[style < 0.05]]
+    sek[style > 0.97] = ""                                   # priced only in EUR: filled from FX
+    forsale = np.where(rng.random(n) < 0.85, "1", "")
+    cat_ids = np.array([",".join(str(10 + j) for j in range(len(c.split(",")))) if c else "" for c in category], dtype=object)
+    return pd.DataFrame({
+        "sku": sku, "groupId": gid, "brandId": brand_id,
+        "name": np.char.add("Produkt ", gid), "brand": brand, "size": size,
+        "audience": audience, "audienceId": "", "category": category, "categoryId": cat_ids,
+        "priceSEK": sek, "priceEUR": np.round(price * 0.087, 2).astype(str),
+        "priceNOK": np.round(price, 0).astype(int).astype(str),
+        "priceDKK": np.round(price * 0.65, 0).astype(int).astype(str),
+        "forSale": forsale, "status": rng.choice(["active", "inactive"], n, p=[0.9, 0.1]),
+        "incommingQuantity": "0", "length": "", "width": "", "height": "", "weight": "",
+        "fabricId": "", "fabric": rng.choice(["Bomull", "Polyamid", "Elastan", ""], n),
+        "description": "Mjuk och bekväm. Tvättas i 40 grader.",
+        "colorId": "", "color": rng.choice(COLORS, n), "sizeId": "",
+        "publishedDate": "2023-05-01", "quantity": rng.integers(0, 50, n).astype(str),
+    })
+
+def transactions(n_orders: int, cust: pd.DataFrame, prod: pd.DataFrame, rng) -> pd.DataFrame:
+    # customers and items both follow a long but bounded tail: about a third of the customers
+    # never buy, the busiest buyer has about a hundred orders, and no item is more than
+    # ~1% of the lines
+    cw = np.minimum(rng.lognormal(0.0, 1.0, len(cust)), 40.0) * (rng.random(len(cust)) < 0.65)
+    who = rng.choice(len(cust), n_orders, p=cw / cw.sum())
+    lines = rng.integers(1, 5, n_orders)
+    order = np.repeat(np.arange(n_orders), lines)
+    pw = np.minimum(rng.lognormal(0.0, 1.5, len(prod)), 100.0)
+    item = rng.choice(len(prod), len(order), p=pw / pw.sum())
+    freight = rng.random(len(order)) < 0.01                  # shipping lines the pipeline drops
+    # one line per (order, sku), as in the export: repeated draws are dropped
+    keep = ~pd.DataFrame({"o": order, "i": np.where(freight, -1, item)}).duplicated().to_numpy()
+    order, item, freight = order[keep], item[keep], freight[keep]
+    n = len(order)
+    start = pd.Timestamp("2024-01-01").value // 10**9
+    created = pd.to_datetime(rng.integers(start, start + 650 * 86400, n_orders), unit="s")
+    country = cust["invoiceCountryId"].to_numpy()[who][order]
+    currency = np.array([COUNTRIES[c][1] for c in country], dtype=object)
+    local = pd.to_numeric(prod["priceNOK"], errors="coerce").to_numpy()[item] * np.array([COUNTRIES[c][2] for c in country])
+    price = np.array([f"{p:.2f}".rstrip("0").rstrip(".") for p in local], dtype=object)
+    bug = rng.random(n) < 0.002                              # six-digit price bug, e.g. "449399.0"
+    price[bug] = [f"{rng.integers(100, 999)}{p[-3:].zfill(3)}.0" for p in price[bug]]
+    qty = rng.choice(["1", "1", "1", "2", "3", "1.0"], n)
+    sku = prod["sku"].to_numpy()[item].astype(object)
+    gid = prod["groupId"].to_numpy()[item].astype(object)
+    gid[freight] = [BAD_GROUPS[i] for i in pd.Series(country[freight]).map(FREIGHT).to_numpy(int)]
+    sku[freight] = gid[freight]
+    uid = cust["shopUserId"].to_numpy()[who][order]
+    email = cust["invoiceEmail"].to_numpy()[who][order]
+    typ = rng.choice(TYPES[0], n_orders, p=TYPES[1])[order]
+    return pd.DataFrame({
+        "orderId": (500_000 + order).astype(str),
+        "orderLineId": np.arange(1_000_000, 1_000_000 + n).astype(str),
+        "shopUserId": uid, "created": created[order].strftime("%Y-%m-%d %H:%M:%S"),
+        "currencyId": currency, "sku": sku, "groupId": gid,
+        "quantity": qty, "price": price,
+        "name": np.char.add("Produkt ", gid.astype(str)), "type": typ, "invoiceEmail": email,
+    })
+
+def generate(out_dir: Path, scale: float = 1.0, seed: int = 0) -> dict[str, int]:
+    """Write the three exports for `scale` into out_dir; returns row counts."""
+    rng = np.random.default_rng(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cust = customers(max(10, int(BASE["customers"] * scale)), rng)
+    prod = products(max(5, int(BASE["groups"] * scale ** 0.5)), rng)   # catalogue grows slower than traffic
+    tx = transactions(max(10, int(BASE["orders"] * scale)), cust, prod, rng)
+    counts = {}
+    for name, df in (("customers", cust), ("products", prod), ("transactions", tx)):
+        df.to_csv(out_dir / f"{name}.csv", index=False)
+        counts[name] = len(df)
+    return counts
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Generate synthetic raw exports for benchmarking.")
+    ap.add_argument("out_dir", type=Path)
+    ap.add_argument("--scale", type=float, default=1.0, help="1 ≈ 20k customers / 60k orders")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    counts = generate(args.out_dir, args.scale, args.seed)
+    print(f"{args.out_dir}: " + ", ".join(f"{k} {v:,}" for k, v in counts.items()) + f" in {time.perf_counter() - t0:.1f}s")
+
+if __name__ == "__main__":
+    main()
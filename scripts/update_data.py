@@ -1,19 +1,29 @@
 from pathlib import Path
-import logging, sys, traceback
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import argparse, json, logging, random, sys, threading, time, traceback
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "python"))
+from pipeline.io import csv_to_parquet, external_parquet, schema_problems
+from pipeline.snapshots import put_snapshot, restore_snapshot, sha256_file, snapshot_asof
+
 OUT = Path("/workspace/data/external")
+SNAPSHOTS = Path("/workspace/data/snapshots")
 LOG_DIR = Path("/workspace/.logs")
-OUT.mkdir(parents=True, exist_ok=True)
-LOG_DIR.mkdir(parents=True, exist_ok=True)
+MANIFEST = OUT / "manifest.json"
 
-logging.basicConfig(
-    filename=str(LOG_DIR / "update_data.log"),
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-)
-logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
+def setup_logging() -> None:
+    # done in main() so importing the module (tests) touches neither /workspace nor the root logger
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(
+        filename=str(LOG_DIR / "update_data.log"),
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+    )
+    logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
 
 def read_secret(name: str) -> str:
     p = Path("/run/secrets") / name
@@ -24,8 +34,6 @@ def read_secret(name: str) -> str:
 BASE = (Path("/run/secrets/ASHILD_BASE").read_text().strip()
         if (Path("/run/secrets/ASHILD_BASE").exists())
         else "https://www.ashild.se/Api/Export")
-USER = read_secret("ASHILD_USER")
-PASS = read_secret("ASHILD_PASS")
 
 ENDPOINTS = {
     "customers":    f"{BASE}/Customers",
@@ -33,23 +41,274 @@ ENDPOINTS = {
     "products":     f"{BASE}/Articles",
 }
 
-def dl_csv(name: str, url: str) -> None:
-    out_path = OUT / f"{name}.csv"
-    logging.info(f"Downloading {name} from {url} -> {out_path.name}")
-    with requests.get(url, auth=HTTPBasicAuth(USER, PASS), timeout=120, stream=True) as r:
+# (connect, read) seconds; the transactions export is by far the slowest to start streaming
+TIMEOUTS = {
+    "customers":    (10, 120),
+    "transactions": (10, 300),
+    "products":     (10, 180),
+}
+DEFAULT_TIMEOUT = (10, 120)
+RETRIES = 4
+BACKOFF = 2.0  # seconds, doubled per attempt, plus jitter
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class RetryableError(requests.RequestException):
+    pass
+
+RETRYABLE_ERRORS = (
+    requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError, RetryableError,
+)
+_manifest_lock = threading.Lock()
+
+#------manifest------
+def load_manifest() -> dict:
+    if not MANIFEST.exists():
+        return {}
+    try:
+        return json.loads(MANIFEST.read_text())
+    except ValueError:
+        logging.warning(f"Ignoring unreadable manifest {MANIFEST}")
+        return {}
+
+def save_manifest(manifest: dict) -> None:
+    tmp = MANIFEST.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    tmp.replace(MANIFEST)
+
+def commit_entry(manifest: dict, name: str, entry: dict) -> None:
+    # endpoints download concurrently but share one manifest file
+    with _manifest_lock:
+        manifest[name] = dict(entry)
+        save_manifest(manifest)
+
+def _validators(r: requests.Response) -> dict:
+    return {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+
+#------download------
+def _request_headers(entry: dict, partial: dict, offset: int) -> dict:
+    # identity encoding keeps byte offsets meaningful for Range requests
+    headers = {"Accept-Encoding": "identity"}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if partial.get("etag") or partial.get("last_modified"):
+            headers["If-Range"] = partial.get("etag") or partial["last_modified"]
+    return headers
+
+def make_session(pool_size: int) -> requests.Session:
+    s = requests.Session()
+    s.auth = HTTPBasicAuth(read_secret("ASHILD_USER"), read_secret("ASHILD_PASS"))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+def _fetch(
+    session: requests.Session, name: str, url: str, out_path: Path, part: Path,
+    entry: dict, manifest: dict, stats: dict,
+) -> str:
+    """One request; returns 'unchanged' or 'complete', raises on dropped connections."""
+    partial = entry.get("partial") or {}
+    offset = part.stat().st_size if part.exists() and partial.get("url") == url else 0
+    headers = _request_headers(entry, partial, offset)
+    timeout = TIMEOUTS.get(name, DEFAULT_TIMEOUT)
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as r:
         if r.status_code == 401:
             raise RuntimeError(f"401 Unauthorized for {url}. Check secrets.")
+        if r.status_code == 304:
+            part.unlink(missing_ok=True)
+            entry.pop("partial", None)
+            return "unchanged"
+        if r.status_code == 416:
+            part.unlink(missing_ok=True)
+            entry.pop("partial", None)
+            raise RetryableError(f"416 for {url} at offset {offset}; restarting from zero")
+        if r.status_code in RETRY_STATUSES:
+            raise RetryableError(f"{r.status_code} for {url}")
         r.raise_for_status()
-        with out_path.open("wb") as f:
+        if r.status_code == 206 and r.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+            mode = "ab"
+            logging.info(f"Resuming {name} at byte {offset}")
+        else:
+            mode, offset = "wb", 0
+        expected = r.headers.get("Content-Length")
+        expected = offset + int(expected) if expected is not None else None
+        entry["partial"] = {"url": url, **_validators(r)}
+        commit_entry(manifest, name, entry)
+        with part.open(mode) as f:
             for chunk in r.iter_content(1 << 20):  # 1 MiB chunks
                 if chunk:
                     f.write(chunk)
-    logging.info(f"Saved {out_path.name}")
+                    stats["bytes"] += len(chunk)
+        validators = _validators(r)
+    size = part.stat().st_size
+    if expected is not None and size != expected:
+        raise RetryableError(f"Short read for {name}: {size}/{expected} bytes")
+    part.replace(out_path)
+    entry.pop("partial", None)
+    entry.update({
+        "url": url,
+        "size": size,
+        "sha256": sha256_file(out_path),
+        **validators,
+        "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    })
+    return "complete"
+
+def dl_csv(
+    name: str, url: str, manifest: dict | None = None, full: bool = False,
+    session: requests.Session | None = None,
+) -> dict:
+    """Download one export. Unless full, sends the stored ETag/Last-Modified and
+    resumes an interrupted download with Range. Transient failures are retried with
+    exponential backoff; returns {name, status, bytes, seconds, attempts}."""
+    manifest = load_manifest() if manifest is None else manifest
+    session = session or make_session(1)
+    out_path = OUT / f"{name}.csv"
+    part = OUT / f"{name}.csv.part"
+    entry = dict(manifest.get(name) or {})
+    if full or not out_path.exists() or entry.get("url") != url:
+        for k in ("etag", "last_modified"):
+            entry.pop(k, None)
+    if full:
+        part.unlink(missing_ok=True)
+        entry.pop("partial", None)
+    logging.info(f"Downloading {name} from {url} -> {out_path.name}")
+    stats = {"name": name, "bytes": 0}
+    t0 = time.perf_counter()
+    for attempt in range(1, RETRIES + 1):
+        try:
+            status = _fetch(session, name, url, out_path, part, entry, manifest, stats)
+            break
+        except RETRYABLE_ERRORS as e:
+            if attempt == RETRIES:
+                raise
+            delay = BACKOFF * 2 ** (attempt - 1) + random.uniform(0, 1)
+            logging.warning(f"{name}: attempt {attempt} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+    commit_entry(manifest, name, entry)
+    if status == "unchanged":
+        logging.info(f"{out_path.name} unchanged (304), kept local copy")
+    else:
+        logging.info(f"Saved {out_path.name} ({entry['size']} bytes, sha256 {entry['sha256'][:12]})")
+    stats.update(status=status, seconds=time.perf_counter() - t0, attempts=attempt)
+    return stats
+
+#------ingest------
+def ingest(name: str, status: str) -> dict:
+    """Convert <name>.csv to typed zstd Parquet unless an unchanged export already has one."""
+    csv_path = OUT / f"{name}.csv"
+    pq_path = external_parquet(OUT, name)
+    if status == "unchanged" and pq_path.exists() and pq_path.stat().st_mtime >= csv_path.stat().st_mtime:
+        logging.info(f"{pq_path.name} up to date")
+        return {}
+    t0 = time.perf_counter()
+    report = csv_to_parquet(csv_path, pq_path, name)
+    rows = report["rows"]
+    secs = time.perf_counter() - t0
+    for msg in schema_problems(report):
+        logging.warning(f"Schema: {msg}")
+    logging.info(f"Ingested {csv_path.name} -> {pq_path.name} ({rows} rows, {pq_path.stat().st_size} bytes)")
+    return {"rows": rows, "ingest_seconds": secs}
+
+#------snapshots------
+def snapshot(name: str, manifest: dict) -> None:
+    entry = manifest.get(name) or {}
+    snap = put_snapshot(
+        SNAPSHOTS, name, OUT / f"{name}.csv", sha256=entry.get("sha256"),
+        meta={k: entry.get(k) for k in ("etag", "last_modified", "fetched_at")},
+    )
+    logging.info(f"Snapshot {name} {snap['sha256'][:12]} ({snap['stored_size']} bytes in store)")
+
+def replay(which: str, manifest: dict, *, do_ingest: bool) -> None:
+    """Restore a snapshot of every endpoint into OUT instead of downloading.
+    `which` is a position (0 = oldest, -1 = latest) or an ISO date to replay as of."""
+    for name in ENDPOINTS:
+        n = int(which) if which.lstrip("-").isdigit() else snapshot_asof(SNAPSHOTS, name, which)
+        snap = restore_snapshot(SNAPSHOTS, name, OUT / f"{name}.csv", n)
+        # the local file no longer matches the server's validators
+        entry = {k: v for k, v in (manifest.get(name) or {}).items()
+                 if k not in ("etag", "last_modified", "partial")}
+        entry.update(size=snap["size"], sha256=snap["sha256"], replayed_from=snap["taken"])
+        commit_entry(manifest, name, entry)
+        logging.info(f"Replayed {name} snapshot {n} taken {snap['taken']}")
+        if do_ingest:
+            ingest(name, "complete")
+
+def fetch_and_ingest(
+    name: str, url: str, manifest: dict, *, full: bool, session, do_ingest: bool, do_snapshot: bool,
+) -> dict:
+    stats = dl_csv(name, url, manifest, full=full, session=session)
+    if do_snapshot:
+        snapshot(name, manifest)
+    if do_ingest:
+        stats.update(ingest(name, stats["status"]))
+    return stats
+
+def log_summary(results: list[dict]) -> None:
+    for r in results:
+        mib = r["bytes"] / (1 << 20)
+        rate = mib / r["seconds"] if r["seconds"] > 0 else 0.0
+        msg = (f"summary {r['name']}: {r['status']}, {mib:.1f} MiB in {r['seconds']:.1f}s "
+               f"({rate:.2f} MiB/s, {r['attempts']} attempt(s))")
+        if "rows" in r:
+            msg += f", ingested {r['rows']} rows in {r['ingest_seconds']:.1f}s"
+        logging.info(msg)
+
+def fetch_all(
+    manifest: dict, *, full: bool = False, workers: int = 3, do_ingest: bool = True, do_snapshot: bool = True,
+) -> list[dict]:
+    """Fetch every endpoint over one pooled session, at most `workers` at a time.
+    Each worker ingests its export to Parquet as soon as its download finishes."""
+    workers = max(1, min(workers, len(ENDPOINTS)))
+    with make_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = [
+            ex.submit(
+                fetch_and_ingest, name, url, manifest,
+                full=full, session=session, do_ingest=do_ingest, do_snapshot=do_snapshot,
+            )
+            for name, url in ENDPOINTS.items()
+        ]
+        results, errors = [], []
+        for f in futures:
+            try:
+                results.append(f.result())
+            except Exception as e:
+                errors.append(e)
+    log_summary(results)
+    if errors:
+        raise errors[0]
+    return results
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Fetch the Åshild exports into data/external.")
+    p.add_argument("--full", action="store_true",
+                   help="ignore stored validators and partial files; download everything again")
+    p.add_argument("--workers", type=int, default=len(ENDPOINTS),
+                   help="endpoints downloaded concurrently (1 = one after another)")
+    p.add_argument("--no-ingest", action="store_true",
+                   help="only download the CSVs; skip the CSV -> Parquet ingest stage")
+    p.add_argument("--no-snapshot", action="store_true",
+                   help="do not add new exports to the snapshot store")
+    p.add_argument("--replay", default=None, metavar="N|DATE",
+                   help="restore snapshot N (0 = oldest, -1 = latest) or the snapshot as of DATE "
+                        "of every export instead of downloading")
+    return p.parse_args(argv)
 
-def main() -> int:
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    setup_logging()
+    OUT.mkdir(parents=True, exist_ok=True)
     try:
-        for name, url in ENDPOINTS.items():
-            dl_csv(name, url)
+        if args.replay is not None:
+            replay(args.replay, load_manifest(), do_ingest=not args.no_ingest)
+            logging.info("All endpoints replayed successfully.")
+            return 0
+        fetch_all(load_manifest(), full=args.full, workers=args.workers,
+                  do_ingest=not args.no_ingest, do_snapshot=not args.no_snapshot)
         logging.info("All endpoints fetched successfully.")
         return 0
     except Exception as e:
@@ -58,4 +317,4 @@ def main() -> int:
         return 1
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,8 @@
+# tests import the pipeline package and the scripts/ modules directly
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+for p in (ROOT / "python", ROOT / "scripts"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
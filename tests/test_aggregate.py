@@ -0,0 +1,68 @@
+# group_mode (vectorized) must agree with the per-group mode lambdas it replaced
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.aggregate import group_mode
+
+def mode_or_first(s: pd.Series):
+    # the per-group aggregation combine used before group_mode (ties: smallest value)
+    m = s.mode()
+    if not m.empty:
+        return m.iat[0]
+    s = s.dropna()
+    return s.iat[0] if not s.empty else None
+
+def first_of_most_frequent(s: pd.Series):
+    # ties="first": among the most frequent values, the one seen first in the group
+    s = s.dropna()
+    if s.empty:
+        return None
+    counts = s.value_counts(sort=False)
+    best = counts[counts == counts.max()].index
+    return s[s.isin(best)].iat[0]
+
+def _check(df: pd.DataFrame, by, col: str, ties: str, dropna: bool) -> None:
+    ref = first_of_most_frequent if ties == "first" else mode_or_first
+    want = df.groupby(by, dropna=dropna, sort=False)[col].agg(ref)
+    got = group_mode(df, by, col, ties=ties, dropna=dropna)
+    pd.testing.assert_index_equal(got.index, want.index)
+    for g, w in zip(got.tolist(), want.tolist()):
+        assert (pd.isna(g) and pd.isna(w)) or g == w
+
+def _frame(rng, n: int, values: list, na: float) -> pd.DataFrame:
+    vals = pd.Series(rng.choice(np.array(values, dtype=object), n), dtype=object)
+    vals[rng.random(n) < na] = None
+    key = pd.Series(rng.integers(0, max(n // 4, 1), n)).astype(str)
+    key[rng.random(n) < 0.05] = None
+    return pd.DataFrame({"k": key, "k2": rng.integers(0, 3, n), "v": vals})
+
+@pytest.mark.parametrize("ties", ["smallest", "first"])
+@pytest.mark.parametrize("dropna", [True, False])
+@pytest.mark.parametrize("seed", range(30))
+def test_random_groups_match_reference(seed, ties, dropna):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 300))
+    df = _frame(rng, n, ["Stockholm", "Oslo", "Umeå", "Åre", "aarhus"], na=rng.random() * 0.5)
+    _check(df, "k", "v", ties, dropna)
+    _check(df, ["k", "k2"], "v", ties, dropna)
+
+@pytest.mark.parametrize("dtype", ["Int64", "float64", "string", "category"])
+def test_dtypes_are_kept(dtype):
+    rng = np.random.default_rng(1)
+    df = _frame(rng, 200, [1, 2, 3, 10], na=0.2)
+    df["v"] = df["v"].astype("float64").astype(dtype) if dtype != "category" else df["v"].astype("category")
+    got = group_mode(df, "k", "v")
+    assert got.dtype == df["v"].dtype
+    _check(df, "k", "v", "smallest", False)
+
+def test_ties():
+    df = pd.DataFrame({"k": ["a"] * 4 + ["b"] * 3, "v": ["y", "x", "y", "x", "z", None, "z"]})
+    assert group_mode(df, "k", "v").tolist() == ["x", "z"]
+    assert group_mode(df, "k", "v", ties="first").tolist() == ["y", "z"]
+
+def test_groups_without_values_are_na():
+    df = pd.DataFrame({"k": ["a", "a", "b"], "v": pd.Series([None, None, 3.0])})
+    got = group_mode(df, "k", "v")
+    assert got.index.tolist() == ["a", "b"]
+    assert pd.isna(got["a"]) and got["b"] == 3.0
@@ -0,0 +1,111 @@
+# fuzzy duplicate customers (pipeline.customers.fuzzy_match): the vectorized edit distance,
+# block pairing, and the rules that keep wrong merges out of the identity index
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.customers.fuzzy_match import _block_pairs, fuzzy_duplicates, levenshtein, levenshtein_sim
+
+def osa(a: str, b: str) -> int:
+    # scalar optimal string alignment distance (Levenshtein + adjacent transpositions)
+    d = [[i + j if i * j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i, j in itertools.product(range(1, len(a) + 1), range(1, len(b) + 1)):
+        d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+        if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+            d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+EDGES = [("nilsson", "nislson"), ("andersson", "andersn"), ("", ""), ("", "eva"), ("ab", "ba"),
+         ("kristina", "kristna"), ("abc", "ca"), ("åsa", "asa"), ("a", "b"), ("lindqvist", "lindkvist")]
+
+def test_matches_scalar_reference():
+    rng = np.random.default_rng(0)
+    letters = np.array(list("abcdeö"))
+    words = ["".join(rng.choice(letters, rng.integers(0, 9))) for _ in range(600)]
+    a, b = [*words[:300], *(p for p, _ in EDGES)], [*words[300:], *(q for _, q in EDGES)]
+    dist, longest = levenshtein(np.array(a, dtype=object), np.array(b, dtype=object))
+    assert dist.tolist() == [osa(x, y) for x, y in zip(a, b)]
+    assert longest.tolist() == [max(len(x), len(y), 1) for x, y in zip(a, b)]
+    sim = levenshtein_sim(np.array(a, dtype=object), np.array(b, dtype=object))
+    assert np.allclose(sim, [1 - osa(x, y) / max(len(x), len(y), 1) for x, y in zip(a, b)])
+
+def test_transposition_is_one_edit():
+    dist, _ = levenshtein(np.array(["nilsson", "ab"], dtype=object), np.array(["nislson", "ba"], dtype=object))
+    assert dist.tolist() == [1, 1]
+
+def test_strings_are_cut_at_width():
+    a = np.array(["abcdefXYZ", "abc"], dtype=object)
+    b = np.array(["abcdefQQ", "abcdef"], dtype=object)
+    dist, longest = levenshtein(a, b, width=6)
+    assert dist.tolist() == [0, 3] and longest.tolist() == [6, 6]
+    assert levenshtein(np.array([], dtype=object), np.array([], dtype=object))[0].tolist() == []
+
+def _all_pairs(codes: np.ndarray, max_block: int) -> set:
+    out = set()
+    for c in set(codes[codes >= 0].tolist()):
+        rows = np.flatnonzero(codes == c)
+        if len(rows) <= max_block:
+            out |= set(itertools.combinations(rows.tolist(), 2))
+    return out
+
+@pytest.mark.parametrize("chunk_pairs", [1, 2, 7, 50, 10**6])
+def test_block_pairs_are_the_same_for_any_chunk_size(chunk_pairs):
+    rng = np.random.default_rng(1)
+    codes = rng.integers(-1, 12, 150)
+    got = []
+    for a, b in _block_pairs(codes, max_block=20, chunk_pairs=chunk_pairs):
+        assert len(a) <= max(chunk_pairs, 20)  # a row's partners are never split
+        got += list(zip(a.tolist(), b.tolist()))
+    assert len(got) == len(set(got))
+    assert {tuple(sorted(p)) for p in got} == _all_pairs(codes, max_block=20)
+
+def test_blocks_over_max_block_are_skipped():
+    codes = np.array([0] * 5 + [1] * 3 + [-1] * 4 + [2])
+    pairs = {tuple(sorted(p)) for a, b in _block_pairs(codes, max_block=4, chunk_pairs=3)
+             for p in zip(a.tolist(), b.tolist())}
+    assert pairs == {(5, 6), (5, 7), (6, 7)}
+
+def _customers(rows: list[tuple]) -> pd.DataFrame:
+    # (shopUserId, first, last, zip, ssn); all Swedish
+    df = pd.DataFrame(rows, columns=["shopUserId", "invoiceFirstName", "invoiceLastName", "invoiceZip", "invoiceSSN"])
+    df["invoiceCountryId"] = "205"
+    return df.astype("string")
+
+def test_ssn_rules():
+    df = _customers([
+        ("1", "Kristina", "Andersson", "111 22", "19800101-1234"),
+        ("2", "Kristna", "Andersson", "11122", "800101-1234"),     # same person, short SSN form
+        ("3", "Kristina", "Anderson", "111 22", "19800101-9999"),  # different SSN
+        ("4", "Kristina", "Andersson", "111 22", "20800101-1234"),  # same digits, other century
+        ("5", "Kristina", "Andersson", "111 22", ""),              # no SSN
+        ("6", "Kristina", "Andersson", "999 99", "19800101-1234"),  # other zip: never a candidate
+    ])
+    pairs, stats = fuzzy_duplicates(df)
+    assert pairs[["id_a", "id_b"]].apply(sorted, axis=1).tolist() == [["1", "2"]]
+    # 1/3, 2/3: SSN; 1/4, 2/4: birth date; 3/4: SSN; 5 with 1, 2, 3 and 4: no SSN
+    assert stats["conflicts"] == 5 and stats["no_ssn"] == 4 and stats["matches"] == 1
+
+def test_name_rules():
+    ssn = "19800101-1234"
+    df = _customers([("1", "Eva", "Berg", "1", ssn), ("2", "Eva", "Borg", "1", ssn),        # 0.875: a match
+                     ("3", "Per", "Johansson", "2", ssn), ("4", "Per", "Johannsen", "2", ssn),  # two edits
+                     ("5", "Anna", "Lund", "3", ssn), ("6", "Jan", "Lund", "3", ssn)])      # first name 0.25
+    pairs, _ = fuzzy_duplicates(df)
+    assert pairs[["id_a", "id_b"]].values.tolist() == [["1", "2"]] and pairs["score"].tolist() == [0.875]
+    # 0.89 but the last names are two edits apart; 0.625 clears a low threshold, not min_field
+    assert fuzzy_duplicates(df, max_last_edits=2)[0]["id_b"].tolist() == ["2", "4"]
+    assert fuzzy_duplicates(df, threshold=0.6, min_field=0.2)[0]["id_b"].tolist() == ["2", "6"]
+
+def test_only_scores_pairs_with_a_delta_row():
+    rows = [(str(i), "Kristina", "Andersson", "111 22", "19800101-1234") for i in range(6)]
+    df = _customers(rows)
+    everything, full = fuzzy_duplicates(df)
+    assert full["scored"] == 15 and len(everything) == 15
+    only = df["shopUserId"].isin(["4"])
+    pairs, stats = fuzzy_duplicates(df, only=only)
+    assert stats["scored"] == 5 and stats["candidates"] == full["candidates"]
+    assert all("4" in p for p in pairs[["id_a", "id_b"]].itertuples(index=False))
+    _, none = fuzzy_duplicates(df, only=pd.Series(False, index=df.index))
+    assert none["scored"] == 0
@@ -0,0 +1,80 @@
+# exchange-rate store (pipeline.fx): no silent fallback rates, and as-of lookups by line date
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from pipeline import fx
+from pipeline.articles.price import fill_priceSEK_no_decimals
+from pipeline.transactions.currency import unify_price_to_sek
+
+# Fri 3 Jan and Mon 6 Jan 2025 are ECB days; the weekend has no rates
+HIST = pd.DataFrame({"date": pd.to_datetime(["2025-01-02", "2025-01-03", "2025-01-06"]),
+                     "EUR": [11.0, 11.2, 11.4], "NOK": [0.95, 0.96, 0.97], "DKK": [1.5, 1.51, 1.52]})
+
+@pytest.fixture
+def offline(monkeypatch):
+    monkeypatch.setenv("PIPELINE_FX_OFFLINE", "1")
+    monkeypatch.delenv("PIPELINE_FX_ALLOW_FALLBACK", raising=False)
+
+@pytest.fixture
+def store(tmp_path):
+    p = tmp_path / fx.FX_FILE
+    fx._save(p, HIST.assign(fetched=pd.Timestamp.now(tz="UTC")))
+    return p
+
+def _lines(dates: list, currency: list) -> pd.DataFrame:
+    # currencyId 40 DKK, 134 SEK, 103 NOK, 50 EUR
+    return pd.DataFrame({"created": pd.to_datetime(dates), "currencyId": currency, "price": 100.0})
+
+def test_empty_store_raises_without_fallback(tmp_path, offline):
+    empty = tmp_path / fx.FX_FILE
+    with pytest.raises(RuntimeError, match="--allow-fallback-fx"):
+        fx.sek_rates(empty)
+    with pytest.raises(RuntimeError):
+        unify_price_to_sek(_lines(["2025-01-03"], ["50"]), fx_store=empty)
+    with pytest.raises(RuntimeError):
+        fill_priceSEK_no_decimals(pd.DataFrame({"sku": ["a"], "priceEUR": ["10"]}), fx_store=empty)
+    assert not empty.exists()
+
+def test_unreachable_api_raises_without_fallback(tmp_path, monkeypatch):
+    monkeypatch.delenv("PIPELINE_FX_OFFLINE", raising=False)
+    monkeypatch.delenv("PIPELINE_FX_ALLOW_FALLBACK", raising=False)
+
+    def down(path, timeout):
+        raise requests.ConnectionError("down")
+
+    monkeypatch.setattr(fx, "_fetch", down)
+    with pytest.raises(RuntimeError):
+        fx.sek_rates(tmp_path / fx.FX_FILE)
+
+def test_fallback_only_when_allowed(tmp_path, offline, monkeypatch):
+    empty = tmp_path / fx.FX_FILE
+    assert fx.sek_rates(empty, allow_fallback=True) == {**fx.FALLBACK, "asof": "fallback"}
+    got = unify_price_to_sek(_lines(["2025-01-03"], ["50"]), fx_store=empty, allow_fallback_fx=True)
+    assert got["price_sek"].tolist() == [round(100 * fx.FALLBACK["EUR"])]
+    # what cli.main --allow-fallback-fx sets for every stage
+    monkeypatch.setenv("PIPELINE_FX_ALLOW_FALLBACK", "1")
+    assert fx.sek_rates(empty)["asof"] == "fallback"
+
+def test_latest_stored_rates_offline(store, offline):
+    assert fx.sek_rates(store) == {"EUR": 11.4, "NOK": 0.97, "DKK": 1.52, "asof": "2025-01-06"}
+
+def test_asof_uses_the_last_rate_on_or_before_each_date(store, offline):
+    dates = ["2025-01-03 23:59", "2025-01-04", "2025-01-05 12:00", "2025-01-06", "2025-02-01", "2024-12-24", None]
+    got = fx.rates_asof(pd.Series(pd.to_datetime(dates, format="ISO8601")), fx.load_history(store),
+                        pd.Series(["EUR"] * 7, dtype="string"))
+    # before the history: its first rate; unknown date: NaN
+    assert got[:6].tolist() == [11.2, 11.2, 11.2, 11.4, 11.4, 11.0] and np.isnan(got[6])
+    cur = fx.rates_asof(pd.Series(pd.to_datetime(["2025-01-04"] * 4)), fx.load_history(store),
+                        pd.Series(["NOK", "DKK", "SEK", None], dtype="string"))
+    assert cur[:3].tolist() == [0.96, 1.51, 1.0] and np.isnan(cur[3])
+
+def test_unify_prices_each_line_at_its_own_date(store, offline):
+    df = _lines(["2025-01-02", "2025-01-05", "2025-01-07", None], ["50", "50", "103", "40"])
+    got = unify_price_to_sek(df, fx_store=store, created_col="created")
+    # a line without a date gets the latest rate
+    assert got["sek_rate"].tolist() == [11.0, 11.2, 0.97, 1.52]
+    assert got["price_sek"].tolist() == [1100, 1120, 97, 152]
+    latest = unify_price_to_sek(df, fx_store=store)
+    assert latest["sek_rate"].tolist() == [11.4, 11.4, 0.97, 1.52]
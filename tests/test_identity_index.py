@@ -0,0 +1,80 @@
+# persistent union-find identity index (pipeline.customers.shopuserid)
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.customers.shopuserid import (
+    KEY_COLS, build_id_remap, id_index_remap, load_id_index, save_id_index, union_id_pairs, update_id_index,
+)
+
+def _customers(rows: list[tuple]) -> pd.DataFrame:
+    # (shopUserId, first, last, zip)
+    return pd.DataFrame(rows, columns=["shopUserId", *KEY_COLS], dtype="string")
+
+def _remap(index: dict) -> dict:
+    return id_index_remap(index).to_dict()
+
+@pytest.fixture
+def index(tmp_path):
+    return load_id_index(tmp_path / "identity_index.npz")
+
+def test_same_key_merges_into_the_earliest_id(index):
+    update_id_index(index, _customers([("3", "Anna", "Berg", "111"), ("1", "Anna", "Berg", "111"),
+                                       ("2", "Per", "Holm", "222")]))
+    assert _remap(index) == {"3": "3", "1": "3", "2": "2"}
+    # a later id with the same key joins the group under its first id
+    update_id_index(index, _customers([("0", "Anna", "Berg", "111")]))
+    assert _remap(index)["0"] == "3"
+
+def test_merges_chain_across_keys_and_runs(index):
+    update_id_index(index, _customers([("a", "Anna", "Berg", "111"), ("b", "Per", "Holm", "222")]))
+    # c shares a's key in one row and b's in another: all three are one person
+    update_id_index(index, _customers([("c", "Anna", "Berg", "111"), ("c", "Per", "Holm", "222")]))
+    assert set(_remap(index).values()) == {"a"}
+    # d takes c's old key in a later run and joins the same group
+    update_id_index(index, _customers([("d", "Per", "Holm", "222")]))
+    assert _remap(index)["d"] == "a"
+
+def test_roots_are_the_earliest_node_whatever_the_union_order(index):
+    update_id_index(index, _customers([(str(i), f"n{i}", "x", "1") for i in range(6)]))
+    union_id_pairs(index, ["5", "3", "1"], ["4", "5", "3"])
+    assert _remap(index) == {"0": "0", "1": "1", "2": "2", "3": "1", "4": "1", "5": "1"}
+
+def test_agrees_with_build_id_remap_on_one_run(index):
+    rng = np.random.default_rng(0)
+    n = 2_000
+    keys = rng.integers(0, 300, n)
+    df = _customers([(str(i), f"f{k % 17}", f"l{k}", str(k % 11)) for i, k in enumerate(keys)])
+    df.loc[rng.random(n) < 0.1, "invoiceZip"] = pd.NA
+    update_id_index(index, df)
+    want = build_id_remap(df).to_dict()
+    got = _remap(index)
+    assert {k: got[k] for k in want} == want
+    # ids without a full key stay on their own
+    assert all(got[i] == i for i in set(df["shopUserId"]) - set(want))
+
+def test_only_unseen_id_key_pairs_are_a_delta(index):
+    rows = [("a", "Anna", "Berg", "111"), ("a", "Anna", "Berg", "222"), ("b", "Per", "Holm", "333")]
+    first = update_id_index(index, _customers(rows))
+    assert sorted(first["delta_ids"]) == ["a", "b"]
+    # an id with rows under two keys is not a delta again while it keeps both
+    again = update_id_index(index, _customers(rows))
+    assert len(again["delta_ids"]) == 0 and again["changed"] == 0 and again["merged"] == 0
+    moved = update_id_index(index, _customers([*rows[:2], ("b", "Per", "Holm", "444")]))
+    assert list(moved["delta_ids"]) == ["b"] and moved["changed"] == 1
+
+def test_save_and_load_round_trip(index, tmp_path):
+    update_id_index(index, _customers([("a", "Anna", "Berg", "111"), ("b", "Anna", "Berg", "111"),
+                                       ("ö", "Åsa", "Ek", "1")]))
+    path = tmp_path / "identity_index.npz"
+    save_id_index(index, path)
+    loaded = load_id_index(path)
+    assert _remap(loaded) == _remap(index)
+    # the reloaded index continues where the saved one stopped
+    stats = update_id_index(loaded, _customers([("a", "Anna", "Berg", "111"), ("c", "Anna", "Berg", "111")]))
+    assert list(stats["delta_ids"]) == ["c"] and _remap(loaded)["c"] == "a"
+
+def test_union_id_pairs_needs_indexed_ids(index):
+    update_id_index(index, _customers([("a", "Anna", "Berg", "111")]))
+    with pytest.raises(KeyError):
+        union_id_pairs(index, ["a"], ["zz"])
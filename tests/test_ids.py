@@ -0,0 +1,49 @@
+# global id dictionary (pipeline.ids): append-only codes and encode/decode round trips
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from pipeline.ids import decode, encode, load_ids, save_ids, update_ids
+
+@pytest.fixture
+def vocab(tmp_path):
+    v = load_ids(tmp_path)
+    update_ids(v, {"groupId": pd.Series(["g2", "g1", "g2", None]), "shopUserId": pa.array(["u1", "u2"])})
+    return v
+
+def test_codes_are_dense_and_append_only(vocab, tmp_path):
+    assert vocab["groupId"].to_pylist() == ["g2", "g1"]
+    save_ids(tmp_path, vocab)
+    again = load_ids(tmp_path)
+    assert {k: v.to_pylist() for k, v in again.items()} == {"groupId": ["g2", "g1"], "shopUserId": ["u1", "u2"],
+                                                            "orderId": []}
+    new = update_ids(again, {"groupId": ["g3", "g1", "g0"]})
+    assert new == {"groupId": 2}
+    assert again["groupId"].to_pylist() == ["g2", "g1", "g3", "g0"]
+
+@pytest.mark.parametrize("wrap", [
+    lambda v: pd.Series(v, dtype="string[pyarrow]"),
+    lambda v: pd.Series(v, dtype=object),
+    lambda v: pd.Series(v, dtype="category"),
+    lambda v: pa.array(v),
+    lambda v: pa.array(v).dictionary_encode(),
+    lambda v: pa.chunked_array([pa.array(v[:2]), pa.array(v[2:])]),
+], ids=["arrow-string", "object", "category", "arrow", "dictionary", "chunked"])
+def test_round_trip_with_na(vocab, wrap):
+    values = ["g1", None, "g2", "g1", None]
+    codes = encode(wrap(values), vocab["groupId"], "groupId")
+    assert codes.dtype == np.int32
+    assert codes.tolist() == [1, -1, 0, 1, -1]
+    assert decode(codes, vocab["groupId"]).tolist() == values
+
+def test_unknown_ids_raise(vocab):
+    with pytest.raises(KeyError, match="groupId"):
+        encode(pd.Series(["g1", "nope", None]), vocab["groupId"], "groupId")
+    with pytest.raises(KeyError):
+        encode(pa.array(["g1", "nope"]).dictionary_encode(), vocab["groupId"])
+
+def test_empty_and_all_null(vocab):
+    assert encode(pa.array([], pa.string()), vocab["groupId"]).tolist() == []
+    assert encode(pa.nulls(3), vocab["groupId"]).tolist() == [-1, -1, -1]
+    assert decode(np.array([], np.int32), vocab["groupId"]).tolist() == []
@@ -0,0 +1,179 @@
+# cli.customers / cli.transactions --incremental must end where a full rebuild does, after
+# rounds of edits to the raw exports: changed cities, removed and re-registered customers,
+# edited prices, deleted lines, new orders
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from cli import articles, customers, transactions
+from pipeline import sources
+from pipeline.customers import incremental as cinc
+from pipeline.transactions import incremental as tinc
+from gen_synthetic import generate
+
+ARTIFACTS = ("customers_clean", "transactions_canonical", "transactions_clean")
+
+def _cfg(base):
+    base.mkdir(parents=True, exist_ok=True)
+    cfg = base / "cfg.yaml"
+    cfg.write_text("".join(f"{k}: {base / k}\n" for k in ("external", "interim", "processed")))
+    return str(cfg)
+
+def _run(cfg: str, incremental: bool, chunk_rows: int | None = None) -> None:
+    customers.run(cfg, incremental=incremental)
+    transactions.run(cfg, incremental=incremental, chunk_rows=chunk_rows, allow_fallback_fx=True)
+
+def _read(base, name: str) -> pd.DataFrame:
+    df = pd.read_parquet(base / "processed" / f"{name}.parquet")
+    df = df[sorted(df.columns)].astype(str)   # partition columns come back as categories
+    return df.sort_values(list(df.columns), ignore_index=True)
+
+def _edit(ext, rng, new_order: int) -> None:
+    tx = pd.read_csv(ext / "transactions.csv", dtype=str, keep_default_na=False)
+    edit = rng.random(len(tx)) < 0.05
+    tx.loc[edit, "price"] = (tx.loc[edit, "price"].astype(float) * 1.1).round(2).astype(str)
+    tx = tx[rng.random(len(tx)) >= 0.03]
+    # new orders by existing customers, some dated long before the last run
+    new = tx.sample(40, random_state=int(rng.integers(1 << 31))).copy()
+    new["orderId"] = (new_order + np.arange(len(new)) // 3).astype(str)
+    new["orderLineId"] = (new_order * 10 + np.arange(len(new))).astype(str)
+    # another line under an existing (orderId, sku)
+    twin = tx.sample(5, random_state=int(rng.integers(1 << 31))).copy()
+    twin["orderLineId"] = (new_order * 10 + 500 + np.arange(len(twin))).astype(str)
+    twin["quantity"] = "2"
+    pd.concat([tx, new, twin], ignore_index=True).to_csv(ext / "transactions.csv", index=False)
+
+    cust = pd.read_csv(ext / "customers.csv", dtype=str, keep_default_na=False)
+    moved = rng.random(len(cust)) < 0.05
+    cust.loc[moved, "invoiceCity"] = rng.choice(["Umeå", "Bergen", "Odense", "Oulu"], int(moved.sum()))
+    cust = cust[rng.random(len(cust)) >= 0.02]
+    # re-registrations under new ids: same name and zip, so they merge into the old ids
+    again = cust.sample(5, random_state=int(rng.integers(1 << 31))).copy()
+    again["shopUserId"] = (new_order + np.arange(len(again))).astype(str)
+    pd.concat([cust, again], ignore_index=True).to_csv(ext / "customers.csv", index=False)
+
+@pytest.fixture
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("PIPELINE_FX_OFFLINE", "1")
+    monkeypatch.setenv("PIPELINE_LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.delenv("PIPELINE_TEXT_MEMO", raising=False)
+    return tmp_path
+
+# tiny chunks split the lines of one (orderId, sku) across chunks
+@pytest.mark.parametrize("chunk_rows", [None, 7])
+def test_incremental_matches_full_rebuild_after_edits(env, chunk_rows):
+    inc, full = env / "inc", env / "full"
+    generate(inc / "external", scale=0.02, seed=1)
+    cfg_inc, cfg_full = _cfg(inc), _cfg(full)
+    articles.run(cfg_inc, allow_fallback_fx=True)
+    _run(cfg_inc, incremental=True)
+
+    rng = np.random.default_rng(3)
+    for round_ in range(2):
+        _edit(inc / "external", rng, new_order=900_000 + 1_000 * round_)
+        _run(cfg_inc, incremental=True, chunk_rows=chunk_rows)
+
+    (full / "external").mkdir()
+    for name in ("customers.csv", "transactions.csv", "products.csv"):
+        (full / "external" / name).write_bytes((inc / "external" / name).read_bytes())
+    # a full run keeps the persistent identity index too: a removed customer can still be
+    # the canonical id of its group
+    (full / "processed").mkdir()
+    index = "identity_index.npz"
+    (full / "processed" / index).write_bytes((inc / "processed" / index).read_bytes())
+    articles.run(cfg_full, allow_fallback_fx=True)
+    _run(cfg_full, incremental=False)
+
+    for name in ARTIFACTS:
+        pd.testing.assert_frame_equal(_read(inc, name), _read(full, name), obj=name)
+
+def test_incremental_rerun_without_edits_changes_nothing(env, capsys):
+    base = env / "run"
+    generate(base / "external", scale=0.01, seed=2)
+    cfg = _cfg(base)
+    articles.run(cfg, allow_fallback_fx=True)
+    _run(cfg, incremental=True)
+    before = {name: _read(base, name) for name in ARTIFACTS}
+    capsys.readouterr()
+    _run(cfg, incremental=True)
+    out = capsys.readouterr().out
+    assert re.search(r"incremental: 0 of [\d,]+ rows cleaned, 0 of [\d,]+ customers rebuilt", out)
+    assert "incremental: 0 new, edited or changed-customer lines and 0 gone" in out
+    for name in ARTIFACTS:
+        pd.testing.assert_frame_equal(_read(base, name), before[name], obj=name)
+
+#------code versions------
+@pytest.mark.parametrize("state, edited, changes", [
+    (cinc, "pipeline/customers/clean.py", True), (cinc, "pipeline/aggregate.py", True),
+    (cinc, "pipeline/text.py", True), (cinc, "pipeline/customers/ssn.py", True),
+    (cinc, "pipeline/recs/lift.py", False),
+    (tinc, "pipeline/transactions/clean.py", True), (tinc, "pipeline/transactions/currency.py", True),
+    (tinc, "pipeline/io.py", True), (tinc, "pipeline/fx.py", True), (tinc, "pipeline/customers/clean.py", False),
+], ids=lambda v: getattr(v, "__name__", v))
+def test_state_version_follows_the_cleaning_imports(tmp_path, state, edited, changes):
+    root = tmp_path / "python"
+    shutil.copytree(sources.PY_ROOT / "pipeline", root / "pipeline", ignore=shutil.ignore_patterns("__pycache__"))
+    before = sources.code_version(*state.CLEANING, root=root)
+    with (root / edited).open("a") as f:
+        f.write("\n# edited\n")
+    assert (sources.code_version(*state.CLEANING, root=root) != before) == changes
+
+def test_new_customer_code_rebuilds_the_state(env, capsys, monkeypatch):
+    base = env / "run"
+    generate(base / "external", scale=0.01, seed=2)
+    cfg = _cfg(base)
+    customers.run(cfg, incremental=True)
+    assert cinc.load_state(base / "interim") is not None
+    monkeypatch.setattr(cinc, "code_version", lambda: "edited")
+    assert cinc.load_state(base / "interim") is None
+    capsys.readouterr()
+    customers.run(cfg, incremental=True)
+    n = re.search(r"incremental: ([\d,]+) of ([\d,]+) rows cleaned", capsys.readouterr().out)
+    assert n and n[1] == n[2]
+
+#------delta and upsert------
+def _lines(rows: list[tuple]) -> pd.DataFrame:
+    # (orderId, sku, shopUserId, price)
+    return pd.DataFrame(rows, columns=["orderId", "sku", "shopUserId", "price"]).astype({"price": float})
+
+def test_changed_lines_picks_new_edited_gone_and_owned_keys(tmp_path):
+    before = _lines([("1", "a", "u1", 10), ("1", "b", "u1", 20), ("2", "a", "u2", 30),
+                     ("3", "a", "u3", 40), ("3", "a", "u3", 41), ("4", "a", "u4", 50)])
+    tinc.save_lines(tmp_path, before, tinc.line_hashes(before))
+    prev = tinc.load_lines(tmp_path)
+    # (1, b) edited, one of the two (3, a) lines deleted, (5, a) new, u4 is a changed customer
+    now = _lines([("1", "a", "u1", 10), ("1", "b", "u1", 25), ("2", "a", "u2", 30),
+                  ("3", "a", "u3", 40), ("4", "a", "u4", 50), ("5", "a", "u2", 60)])
+    hashes = tinc.line_hashes(now)
+    owned = now["shopUserId"].isin(["u4"]).to_numpy()
+    pick, gone = tinc.changed_lines(now[list(tinc.KEYS)], hashes, prev, owned)
+    assert pick.tolist() == [False, True, False, True, True, True]
+    assert sorted(map(tuple, gone.to_numpy().tolist())) == [("1", "b"), ("3", "a")]
+    # the chunk-wise candidates are a superset of the pick
+    cand = tinc.candidate_lines(now[list(tinc.KEYS)], hashes, prev, owned, tinc.shared_keys(prev))
+    assert (cand | ~pick).all()
+
+def test_upsert_replaces_covered_keys_and_changed_customers():
+    clean = pa.Table.from_pandas(_lines([("1", "a", "u1", 10), ("1", "b", "u1", 20), ("2", "a", "u2", 30),
+                                         ("3", "a", "u3", 40)]), preserve_index=False)
+    # (1, b) is re-cleaned, (3, a) left the source, u2's lines are rebuilt and (2, a) is dropped
+    keys = pd.DataFrame({"orderId": ["1", "3"], "sku": ["b", "a"]})
+    fresh = _lines([("1", "b", "u1", 25)])
+    assert tinc.covered(clean, keys, ["u2"]).to_pylist() == [False, True, True, True]
+    table, st = tinc.upsert(clean, keys, fresh, ["u2"])
+    assert st == {"replaced": 3, "upserted": 1}
+    got = table.to_pandas().sort_values(["orderId", "sku"]).to_numpy().tolist()
+    assert got == [["1", "a", "u1", 10.0], ["1", "b", "u1", 25.0]]
+    # upserting the same delta again changes nothing
+    again, _ = tinc.upsert(table, keys, fresh, ["u2"])
+    assert again.to_pandas().sort_values(["orderId", "sku"]).to_numpy().tolist() == got
+
+def test_run_incremental_asks_for_a_rebuild_without_state(tmp_path):
+    calls = []
+    st = tinc.run_incremental(tmp_path / "transactions_canonical.parquet", tmp_path / "transactions_clean.parquet",
+                              tmp_path / "interim", {"version": "v"}, calls.append)
+    assert st == {"rebuild": "no previous state"} and not calls and not any(tmp_path.iterdir())
@@ -0,0 +1,64 @@
+# partitioned transactions_clean: write_partitions swaps only the partitions it is given
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from pipeline import io
+from pipeline.io import partition_filter, partition_keys, read_parquet, read_table, write_parquet, write_partitions
+
+ARTIFACT = "transactions_clean"
+
+def _frame(rows: list[tuple]) -> pd.DataFrame:
+    # (orderId, sku, country, year_month, price_sek)
+    df = pd.DataFrame(rows, columns=["orderId", "sku", "country", "year_month", "price_sek"])
+    df["shopUserId"] = "u" + df["orderId"]
+    df["created"] = pd.to_datetime(df["year_month"].fillna("2024-01") + "-15")
+    return df
+
+def _table(df: pd.DataFrame) -> pa.Table:
+    return pa.Table.from_pandas(io.conform_types(df, ARTIFACT), preserve_index=False)
+
+def _rows(path) -> list:
+    df = read_parquet(path, columns=["orderId", "sku", "country", "year_month", "price_sek"])
+    df = df.astype(object).where(df.notna(), None)
+    return sorted(map(tuple, df.to_numpy().tolist()), key=str)
+
+BEFORE = [("1", "a", "Sweden", "2024-01", 100), ("2", "a", "Sweden", "2024-02", 200),
+          ("3", "b", "Norway", "2024-01", 300), ("4", "b", "Norway", "2024-02", 400),
+          ("5", "c", None, "2024-01", 500)]
+
+@pytest.fixture(params=["disk", "held"])
+def path(request, tmp_path):
+    if request.param == "held":
+        io.hold_in_memory(checkpoints=())
+        request.addfinalizer(io.release)
+    p = tmp_path / f"{ARTIFACT}.parquet"
+    write_parquet(_frame(BEFORE), p)
+    return p
+
+def test_only_the_given_partitions_change(path):
+    # Sweden/2024-02 gets a new line, Norway/2024-01 is emptied, Denmark/2024-03 is new and
+    # the null-country partition is rewritten; the other partitions are left alone
+    keys = [("Sweden", "2024-02"), ("Norway", "2024-01"), ("Denmark", "2024-03"), (None, "2024-01")]
+    new = _frame([("2", "a", "Sweden", "2024-02", 210), ("6", "a", "Sweden", "2024-02", 600),
+                  ("7", "d", "Denmark", "2024-03", 700), ("5", "c", None, "2024-01", 510)])
+    # held artifacts have no files
+    untouched = {p: p.stat().st_mtime_ns for p in path.glob("country=Sweden/year_month=2024-01/*.parquet")}
+    write_partitions(_table(new), path, keys)
+    assert _rows(path) == sorted([
+        ("1", "a", "Sweden", "2024-01", 100), ("2", "a", "Sweden", "2024-02", 210),
+        ("6", "a", "Sweden", "2024-02", 600), ("4", "b", "Norway", "2024-02", 400),
+        ("7", "d", "Denmark", "2024-03", 700), ("5", "c", None, "2024-01", 510),
+    ], key=str)
+    if path.is_dir():
+        assert untouched and {p: p.stat().st_mtime_ns for p in untouched} == untouched
+        assert not (path / "country=Norway" / "year_month=2024-01").exists()
+
+def test_partition_keys_and_filter_round_trip(path):
+    table = read_table(path)
+    keys = sorted(partition_keys(table, ARTIFACT), key=str)
+    assert keys == sorted([("Sweden", "2024-01"), ("Sweden", "2024-02"), ("Norway", "2024-01"),
+                           ("Norway", "2024-02"), (None, "2024-01")], key=str)
+    picked = read_table(path, filters=partition_filter(ARTIFACT, [("Norway", "2024-02"), (None, "2024-01")]))
+    assert sorted(picked["orderId"].to_pylist()) == ["4", "5"]
+    assert read_table(path, filters=partition_filter(ARTIFACT, [])).num_rows == 0
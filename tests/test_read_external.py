@@ -0,0 +1,47 @@
+# read_external: the ingested Parquet and the CSV fallback give the same frame and report
+import os
+
+import pandas as pd
+import pytest
+
+from pipeline.io import csv_to_parquet, external_parquet, read_external, schema_problems
+
+CSV = """shopUserId,invoiceFirstName,invoiceLastName,invoiceSSN,invoiceZip,invoiceCity,invoiceCountryId,extra
+1,Anna,Berg,,111 22,Umeå,1,x
+2,Per,,19800101-1234,,Oslo,2,
+"""
+
+@pytest.fixture(params=["parquet", "csv"])
+def external(request, tmp_path):
+    (tmp_path / "customers.csv").write_text(CSV)
+    if request.param == "parquet":
+        csv_to_parquet(tmp_path / "customers.csv", external_parquet(tmp_path, "customers"), "customers")
+    return tmp_path
+
+def test_both_sources_agree(external, tmp_path_factory):
+    other = tmp_path_factory.mktemp("csv_only")
+    (other / "customers.csv").write_text(CSV)
+    got, report = read_external(external, "customers")
+    want, want_report = read_external(other, "customers")
+    pd.testing.assert_frame_equal(got, want)
+    assert report == want_report
+    assert schema_problems(report) == [
+        "customers: missing columns ['invoiceEmail']",
+        "customers: undeclared columns read as strings ['extra']",
+    ]
+
+def test_columns_the_export_lacks_are_left_out(external):
+    df, report = read_external(external, "customers", columns=["shopUserId", "invoiceEmail", "invoiceCity"])
+    assert list(df.columns) == ["shopUserId", "invoiceCity"]
+    assert report["rows"] == 2 and report["missing"] == ["invoiceEmail"]
+
+def test_stale_parquet_falls_back_to_the_csv(tmp_path):
+    csv = tmp_path / "customers.csv"
+    csv.write_text(CSV)
+    pq_path = external_parquet(tmp_path, "customers")
+    csv_to_parquet(csv, pq_path, "customers")
+    csv.write_text(CSV + "3,Eva,Ek,,,,1,\n")
+    st = pq_path.stat()
+    os.utime(csv, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    df, _ = read_external(tmp_path, "customers")
+    assert df["shopUserId"].tolist() == ["1", "2", "3"]
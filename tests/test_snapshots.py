@@ -0,0 +1,142 @@
+# snapshot store (pipeline.snapshots): content-addressed dedupe, byte-exact restores and
+# as-of lookups, and update_data's fetch -> snapshot -> --replay path against a local server
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import update_data
+from pipeline import snapshots
+from pipeline.snapshots import (
+    list_snapshots, put_snapshot, restore_snapshot, sha256_file, snapshot_asof,
+)
+
+V1 = b"orderId,sku\n" + b"".join(b"%d,a\n" % i for i in range(200_000))
+V2 = V1 + b"200000,b\n"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # put_snapshot stamps entries with datetime.now(timezone.utc); the test sets the time
+    now = {"t": datetime(2025, 10, 1, 6, 0, tzinfo=timezone.utc)}
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now["t"]
+
+    monkeypatch.setattr(snapshots, "datetime", Clock)
+    return now
+
+
+def _put(root, tmp_path, name, data: bytes, **kw) -> dict:
+    src = tmp_path / f"{name}.csv"
+    src.write_bytes(data)
+    return put_snapshot(root, name, src, **kw)
+
+
+def _objects(root) -> list:
+    return sorted((root / "objects").rglob("*.zst"))
+
+
+def test_same_content_is_stored_once(tmp_path):
+    root = tmp_path / "snapshots"
+    a = _put(root, tmp_path, "transactions", V1, meta={"etag": '"v1"'})
+    b = _put(root, tmp_path, "transactions", V1)
+    c = _put(root, tmp_path, "customers", V1)  # same bytes under another export
+    assert a["sha256"] == b["sha256"] == c["sha256"] == sha256_file(tmp_path / "customers.csv")
+    assert len(_objects(root)) == 1
+    assert a["size"] == len(V1) and a["stored_size"] < len(V1) and a["etag"] == '"v1"'
+    # every fetch is still listed
+    assert len(list_snapshots(root, "transactions")) == 2 and len(list_snapshots(root, "customers")) == 1
+    _put(root, tmp_path, "transactions", V2)
+    assert len(_objects(root)) == 2
+
+
+def test_restore_is_byte_for_byte(tmp_path):
+    root = tmp_path / "snapshots"
+    _put(root, tmp_path, "transactions", V1)
+    _put(root, tmp_path, "transactions", V2)
+    dest = tmp_path / "out.csv"
+    for n, want in [(0, V1), (1, V2), (-1, V2), (-2, V1)]:
+        entry = restore_snapshot(root, "transactions", dest, n)
+        assert dest.read_bytes() == want and entry["size"] == len(want)
+    assert not list(tmp_path.glob("*.tmp"))
+    with pytest.raises(IndexError):
+        restore_snapshot(root, "transactions", dest, 2)
+    with pytest.raises(FileNotFoundError):
+        restore_snapshot(root, "customers", dest)
+
+
+def test_asof_picks_the_latest_on_or_before(tmp_path, clock):
+    root = tmp_path / "snapshots"
+    for day, hour in [(1, 6), (1, 18), (3, 6), (5, 6)]:
+        clock["t"] = datetime(2025, 10, day, hour, tzinfo=timezone.utc)
+        _put(root, tmp_path, "transactions", b"%d-%d" % (day, hour))
+    assert snapshot_asof(root, "transactions", "2025-10-01") == 1  # the day's last fetch
+    assert snapshot_asof(root, "transactions", "2025-10-02") == 1
+    assert snapshot_asof(root, "transactions", "2025-10-03") == 2
+    assert snapshot_asof(root, "transactions", "2025-10-01T12:00") == 0
+    assert snapshot_asof(root, "transactions", "2026-01-01") == 3
+    with pytest.raises(FileNotFoundError):
+        snapshot_asof(root, "transactions", "2025-09-30")
+
+
+class Export(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body = V1
+
+    def do_GET(self):
+        body = type(self).body
+        self.send_response(200)
+        self.send_header("ETag", f'"{len(body)}"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(Export, "body", V1)
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Export)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{srv.server_address[1]}/Transactions"
+    monkeypatch.setattr(update_data, "ENDPOINTS", {"transactions": url})
+    yield url
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def out(tmp_path, monkeypatch):
+    monkeypatch.setattr(update_data, "OUT", tmp_path / "external")
+    monkeypatch.setattr(update_data, "MANIFEST", tmp_path / "external" / "manifest.json")
+    monkeypatch.setattr(update_data, "SNAPSHOTS", tmp_path / "snapshots")
+    (tmp_path / "external").mkdir()
+    return tmp_path / "external"
+
+
+def test_fetches_are_snapshotted_and_replayed(server, out, clock):
+    manifest = {}
+    with requests.Session() as s:
+        for day, body in [(1, V1), (2, V1), (3, V2)]:
+            clock["t"] = datetime(2025, 10, day, 6, tzinfo=timezone.utc)
+            Export.body = body
+            update_data.fetch_and_ingest("transactions", server, manifest, full=True, session=s,
+                                         do_ingest=False, do_snapshot=True)
+    entries = list_snapshots(update_data.SNAPSHOTS, "transactions")
+    assert [e["size"] for e in entries] == [len(V1), len(V1), len(V2)]
+    assert len(_objects(update_data.SNAPSHOTS)) == 2
+    assert (out / "transactions.csv").read_bytes() == V2
+
+    update_data.replay("2025-10-02", manifest, do_ingest=False)
+    assert (out / "transactions.csv").read_bytes() == V1
+    # the replayed file no longer matches the server's validators
+    assert "etag" not in manifest["transactions"] and manifest["transactions"]["sha256"] == entries[1]["sha256"]
+    update_data.replay("-1", manifest, do_ingest=False)
+    assert (out / "transactions.csv").read_bytes() == V2
@@ -0,0 +1,51 @@
+# derive_gender_age (vectorized) must agree with derive_gender_age_rowwise (the scalar rules)
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.customers.ssn import COUNTRY_MAP, derive_gender_age, derive_gender_age_rowwise
+from gen_synthetic import _ssn
+
+COUNTRIES = list(COUNTRY_MAP)   # "58" DK, "160" NO, "205" SE, "72" FI
+
+# rule edges: century signs, D-numbers, Norwegian individual-number ranges, invalid and
+# leap dates, whitespace, separators in odd places, non-ASCII digits and plain junk
+EDGES = [
+    "19121212-1212", "121212-1212", "121212+1212", "1212121212", "191212121212", "19000229-1234",
+    "20000229-1234", "000229-1234", "010101+0000", "990101-0000", "20240230-1234",
+    "41017012345", "01017049912", "01017050012", "01015475012", "01013950012", "01014095012",
+    "01019999912", "3101701234", "010170-1234", "290224-4321", "300224-4321",
+    "010170-123A", "010170+123B", "010105A123C", "010105a123c", "010170-12", "0101701234",
+    " 010170-1234 ", "\t19121212-1212\n", "1912-1212-1212", "12 12 12 12 12",
+    "１２１２１２-１２１２", "010170–1234", "", "temp", "-", "A", "abcdefghijkl", "000000-0000",
+    "99999999-9999", None,
+]
+
+def _frame(ssn: list, country: list) -> pd.DataFrame:
+    return pd.DataFrame({"invoiceSSN": pd.Series(ssn, dtype=object), "invoiceCountryId": country})
+
+def _check(df: pd.DataFrame) -> None:
+    fast = derive_gender_age(df)
+    slow = derive_gender_age_rowwise(df)
+    pd.testing.assert_series_equal(fast["Gender"], slow["Gender"])
+    pd.testing.assert_series_equal(fast["Age"], slow["Age"])
+
+@pytest.mark.parametrize("country", COUNTRIES)
+def test_generated_ssns_match_rowwise(country):
+    rng = np.random.default_rng(int(country))
+    n = 2_000
+    born = pd.to_datetime("1905-01-01") + pd.to_timedelta(rng.integers(0, 365 * 118, n), unit="D")
+    # _ssn writes every country's format; also feed each format under the other countries' rules
+    fmt = rng.choice(COUNTRIES, n)
+    _check(_frame(list(_ssn(fmt, born, rng)), [country] * n))
+
+@pytest.mark.parametrize("country", COUNTRIES + ["999"])
+def test_edge_and_junk_ssns_match_rowwise(country):
+    rng = np.random.default_rng(7)
+    alphabet = list("0123456789-+Aa ")
+    junk = ["".join(rng.choice(alphabet, rng.integers(0, 15))) for _ in range(1_000)]
+    _check(_frame(EDGES + junk, [country] * (len(EDGES) + len(junk))))
+
+def test_all_unknown_and_all_known_ages_keep_rowwise_dtypes():
+    _check(_frame(["temp", "", None], ["205", "58", "72"]))
+    _check(_frame(["19121212-1212", "010170-1234"], ["205", "58"]))
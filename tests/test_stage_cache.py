@@ -0,0 +1,55 @@
+# stage cache in cli.main: --dry-run's size/mtime check agrees with the fingerprint check
+import os
+
+import pytest
+
+from cli import main
+
+STAGE = "articles"
+
+@pytest.fixture
+def cfg(tmp_path):
+    cfg = {k: str(tmp_path / k) for k in ("external", "interim", "processed")}
+    for a in [*main.STAGES[STAGE]["inputs"], *main.STAGES[STAGE]["outputs"]]:
+        p = main.resolve(cfg, a)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(a.encode())
+    return cfg
+
+def _ran(cfg) -> dict:
+    cache = main.load_cache(cfg)
+    stamps = {}
+    fp = main.fingerprint(STAGE, cfg, cache, stamps)
+    main.record(STAGE, fp, cfg, cache, stamps)
+    main.save_cache(cfg, cache)
+    return main.load_cache(cfg)
+
+def _touch(p, data: bytes) -> None:
+    st = p.stat()
+    p.write_bytes(data)
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+def test_fresh_after_a_run(cfg):
+    cache = _ran(cfg)
+    assert main.looks_fresh(STAGE, cfg, cache)
+    assert main.is_fresh(STAGE, main.fingerprint(STAGE, cfg, cache), cache)
+
+@pytest.mark.parametrize("what", ["input", "output", "cfg"])
+def test_changes_make_it_stale(cfg, what):
+    cache = _ran(cfg)
+    if what == "input":
+        _touch(main.resolve(cfg, "external/products.csv"), b"new")
+    elif what == "output":
+        _touch(main.resolve(cfg, "processed/articles_clean.parquet"), b"new")
+    else:
+        cfg = {**cfg, "extra": 1}
+    assert not main.looks_fresh(STAGE, cfg, cache)
+    assert not main.is_fresh(STAGE, main.fingerprint(STAGE, cfg, cache), cache)
+
+def test_source_files_are_covered(cfg):
+    cache = _ran(cfg)
+    sources = cache["stages"][STAGE]["sources"]
+    assert {str(f) for f in main.source_files(f"cli.{STAGE}")} <= set(sources)
+    # a manifest written before sources were kept is stale for --dry-run only
+    del cache["stages"][STAGE]["sources"]
+    assert not main.looks_fresh(STAGE, cfg, cache)
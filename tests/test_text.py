@@ -0,0 +1,65 @@
+# map_unique must give what the cleaner gives row by row, calling it once per distinct value
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline import text
+from pipeline.text import map_unique
+from pipeline.customers.city_names import _clean_city
+from pipeline.customers.name_last_name import clean_series
+
+RAW = ["  stockholm ", "GÖTEBORG", None, "Umeå", "  stockholm ", "", "st. olof", pd.NA, "GÖTEBORG", "ÅRE-"]
+
+def _series(dtype) -> pd.Series:
+    rng = np.random.default_rng(0)
+    return pd.Series(rng.choice(np.array(RAW, dtype=object), 500), dtype=dtype, name="city",
+                     index=pd.RangeIndex(100, 600))
+
+class Counting:
+    def __init__(self, fn):
+        self.fn, self.calls = fn, []
+
+    def __call__(self, v):
+        self.calls.append(v)
+        return self.fn(v)
+
+def _scalar(v):
+    return None if pd.isna(v) else str(v).strip().title()
+
+@pytest.mark.parametrize("dtype", [object, "string", "string[pyarrow]", "category"])
+def test_scalar_cleaner_matches_series_map(dtype):
+    s = _series(dtype)
+    fn = Counting(_scalar)
+    got = map_unique(s, fn)
+    want = s.astype(object).map(_scalar)
+    pd.testing.assert_series_equal(got.astype(object), want, check_dtype=False)
+    assert got.index.equals(s.index) and got.name == "city"
+    # each distinct value once, NA once
+    assert len(fn.calls) == s.nunique() + 1
+
+@pytest.mark.parametrize("dtype", ["string", "string[pyarrow]"])
+@pytest.mark.parametrize("cleaner", [_clean_city, clean_series], ids=["city", "name"])
+def test_vectorized_cleaner_matches_whole_column(dtype, cleaner):
+    s = _series(dtype)
+    pd.testing.assert_series_equal(map_unique(s, cleaner, vectorized=True), cleaner(s), check_dtype=False)
+
+CALLS = []
+
+def _memoized(v):
+    # the memo is keyed on a real function and its source file
+    CALLS.append(v)
+    return _scalar(v)
+
+def test_memo_only_cleans_new_values(monkeypatch, tmp_path):
+    monkeypatch.setattr(text, "MEMO_DIR", str(tmp_path))
+    monkeypatch.setattr(text, "_memos", {})
+    CALLS.clear()
+    first = map_unique(pd.Series(["a ", "b", None], dtype="string"), _memoized, memo=True)
+    assert sorted(map(str, CALLS)) == ["<NA>", "a ", "b"]
+    # a new process: the memo comes back from disk
+    monkeypatch.setattr(text, "_memos", {})
+    CALLS.clear()
+    second = map_unique(pd.Series(["b", "c", "a ", None], dtype="string"), _memoized, memo=True)
+    assert sorted(map(str, CALLS)) == ["<NA>", "c"]
+    assert second.tolist()[:3] == ["B", "C", "A"] and pd.isna(second.iat[3])
+    assert first.tolist()[:2] == ["A", "B"]
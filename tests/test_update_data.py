@@ -0,0 +1,137 @@
+# dl_csv against a local stand-in for the export API: 304s, Range resume and dropped connections
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import update_data
+
+BODY = bytes(range(256)) * 4096 * 3  # 3 MiB
+CHUNK = 1 << 20  # dl_csv writes whole 1 MiB chunks; a cut-off chunk is fetched again
+ETAG = '"v1"'
+
+
+class Export(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body = BODY
+    etag = ETAG
+    drop_after: int | None = None  # bytes sent before the next response is cut off
+    seen: list[dict] = []
+
+    def do_GET(self):
+        cls = type(self)
+        cls.seen.append({k: self.headers.get(k) for k in ("If-None-Match", "Range", "If-Range")})
+        if self.headers.get("If-None-Match") == cls.etag:
+            self.send_response(304)
+            self.send_header("ETag", cls.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start = 0
+        rng = self.headers.get("Range")
+        if rng and self.headers.get("If-Range", cls.etag) == cls.etag:
+            start = int(rng.removeprefix("bytes=").rstrip("-"))
+        payload = cls.body[start:]
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(cls.body) - 1}/{len(cls.body)}")
+        self.send_header("ETag", cls.etag)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if cls.drop_after is not None:
+            payload, cls.drop_after = payload[: cls.drop_after], None
+            self.wfile.write(payload)
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Export.seen, Export.drop_after = [], None
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Export)
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}/Transactions"
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def out(tmp_path, monkeypatch):
+    monkeypatch.setattr(update_data, "OUT", tmp_path)
+    monkeypatch.setattr(update_data, "MANIFEST", tmp_path / "manifest.json")
+    monkeypatch.setattr(update_data, "BACKOFF", 0.0)
+    monkeypatch.setattr(update_data.random, "uniform", lambda a, b: 0.0)
+    return tmp_path
+
+
+def fetch(url, **kw):
+    with requests.Session() as s:
+        return update_data.dl_csv("transactions", url, session=s, **kw)
+
+
+def test_download_then_304(server, out):
+    first = fetch(server)
+    assert first["status"] == "complete" and first["bytes"] == len(BODY)
+    assert (out / "transactions.csv").read_bytes() == BODY
+    entry = json.loads((out / "manifest.json").read_text())["transactions"]
+    assert entry["etag"] == ETAG and entry["size"] == len(BODY) and "partial" not in entry
+
+    second = fetch(server)
+    assert second["status"] == "unchanged" and second["bytes"] == 0 and second["attempts"] == 1
+    assert Export.seen[-1]["If-None-Match"] == ETAG
+    assert (out / "transactions.csv").read_bytes() == BODY
+
+
+def test_dropped_connection_resumes_with_range(server, out):
+    Export.drop_after = CHUNK + 300_000
+    stats = fetch(server)
+    assert stats["status"] == "complete" and stats["attempts"] == 2
+    assert (out / "transactions.csv").read_bytes() == BODY
+    assert [r["Range"] for r in Export.seen] == [None, f"bytes={CHUNK}-"]
+    assert Export.seen[1]["If-Range"] == ETAG
+    assert stats["bytes"] == len(BODY)  # nothing downloaded twice
+    assert not (out / "transactions.csv.part").exists()
+
+
+def test_resume_across_runs(server, out, monkeypatch):
+    # the first run gives up mid-stream; the next run picks up its .part file
+    monkeypatch.setattr(update_data, "RETRIES", 1)
+    Export.drop_after = 2 * CHUNK + 400_000
+    with pytest.raises(update_data.RETRYABLE_ERRORS):
+        fetch(server)
+    assert (out / "transactions.csv.part").stat().st_size == 2 * CHUNK
+    assert json.loads((out / "manifest.json").read_text())["transactions"]["partial"]["etag"] == ETAG
+
+    stats = fetch(server)
+    assert stats["status"] == "complete" and stats["bytes"] == len(BODY) - 2 * CHUNK
+    assert Export.seen[-1]["Range"] == f"bytes={2 * CHUNK}-"
+    assert (out / "transactions.csv").read_bytes() == BODY
+
+
+def test_changed_export_restarts_instead_of_appending(server, out, monkeypatch):
+    monkeypatch.setattr(update_data, "RETRIES", 1)
+    Export.drop_after = CHUNK + 200_000
+    with pytest.raises(update_data.RETRYABLE_ERRORS):
+        fetch(server)
+    # the export changes on the server: If-Range no longer matches, so it answers 200 with
+    # the whole new body, which replaces the stale .part instead of being appended to it
+    monkeypatch.setattr(Export, "body", BODY[::-1])
+    monkeypatch.setattr(Export, "etag", '"v2"')
+    stats = fetch(server)
+    assert stats["status"] == "complete" and Export.seen[-1]["Range"] == f"bytes={CHUNK}-"
+    assert (out / "transactions.csv").read_bytes() == BODY[::-1]
+    assert json.loads((out / "manifest.json").read_text())["transactions"]["etag"] == '"v2"'
+
+
+def test_full_ignores_validators(server, out):
+    fetch(server)
+    stats = fetch(server, full=True)
+    assert stats["status"] == "complete" and Export.seen[-1]["If-None-Match"] is None